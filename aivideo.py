@@ -6,19 +6,28 @@ from dotenv import load_dotenv
 from flask import Flask, request, jsonify
 from threading import Thread, Event
 import json
+from rate_limiter import check_response, rate_limited
 
 load_dotenv()
 API_KEY = os.getenv("HEYGEN_API_KEY")
 WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "5000"))
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", None)  
 
-DEFAULT_AVATAR_ID = "Marcus_expressive_2024120201"  # HeyGen's public avatar
+DEFAULT_AVATAR_ID = os.getenv("HEYGEN_AVATAR_ID", "Marcus_expressive_2024120201")  # HeyGen's public avatar
 
 
 VIDEO_WIDTH = int(os.getenv("VIDEO_WIDTH", "1280"))
 VIDEO_HEIGHT = int(os.getenv("VIDEO_HEIGHT", "720"))
 USE_TEST_MODE = os.getenv("USE_TEST_MODE", "true").lower() == "true"
 
+# Everything besides the audio that changes the avatar video (for cache keys)
+AVATAR_SETTINGS = {
+    "avatar_id": DEFAULT_AVATAR_ID,
+    "width": VIDEO_WIDTH,
+    "height": VIDEO_HEIGHT,
+    "test": USE_TEST_MODE,
+}
+
 # API Endpoints
 BASE_URL = "https://api.heygen.com"
 GENERATE_ENDPOINT = f"{BASE_URL}/v2/video/generate"
@@ -26,6 +35,16 @@ STATUS_ENDPOINT = f"{BASE_URL}/v1/video_status.get"
 UPLOAD_ASSET_ENDPOINT = "https://upload.heygen.com/v1/asset"
 
 # --- HELPER FUNCTIONS ---
+def heygen_request(method, url, **kwargs):
+    """Send a HeyGen API request within the shared HeyGen limits, retrying it on HTTP 429."""
+    def send():
+        # A retried upload sends the file again from the start
+        if hasattr(kwargs.get("data"), "seek"):
+            kwargs["data"].seek(0)
+        return check_response(requests.request(method, url, **kwargs))
+    return rate_limited("heygen", send)
+
+
 def upload_audio_file(api_key, audio_file_path):
     """Upload a local audio file to HeyGen and return the asset URL."""
     if not os.path.exists(audio_file_path):
@@ -40,7 +59,7 @@ def upload_audio_file(api_key, audio_file_path):
     
     try:
         with open(audio_file_path, 'rb') as audio_file:       
-            response = requests.post(UPLOAD_ASSET_ENDPOINT, headers=headers, data=audio_file)
+            response = heygen_request("POST", UPLOAD_ASSET_ENDPOINT, headers=headers, data=audio_file)
             
             # Print response for debugging
             print(f"   Response status: {response.status_code}")
@@ -169,7 +188,7 @@ def generate_video(api_key, avatar_id, audio_url, title="AI Cricket Commentary",
     
     print("Starting video generation...")
     try:
-        response = requests.post(GENERATE_ENDPOINT, headers=headers, json=payload)
+        response = heygen_request("POST", GENERATE_ENDPOINT, headers=headers, json=payload)
         response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
         
         data = response.json()
@@ -197,7 +216,7 @@ def poll_video_status(api_key, video_id):
     
     while True:
         try:
-            response = requests.get(STATUS_ENDPOINT, headers=headers, params=params)
+            response = heygen_request("GET", STATUS_ENDPOINT, headers=headers, params=params)
             response.raise_for_status()
             
             data = response.json()['data']
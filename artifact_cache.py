@@ -0,0 +1,235 @@
+"""
+Artifact Cache - Content-addressed cache of highlight pipeline outputs
+
+Every stage of the highlight pipeline (commentary, audio, avatar video,
+scoreboards, final video) makes files from a set of inputs: the match data,
+prompts, voice and avatar settings, render options, and the outputs of the
+stages before it. An artifact's key is the SHA-256 of its stage name and all
+of those inputs, with earlier stages represented by their keys, so changing
+a prompt or a voice changes the key of that stage and of every stage after
+it.
+
+Two things are kept:
+    store     - the files of each artifact under <key[:2]>/<key>/ in
+                ARTIFACT_CACHE_DIR, shared by all matches, so identical
+                inputs for two matches make one artifact
+    manifest  - manifest.json in each match folder, recording the key every
+                output in the folder was made from
+
+ArtifactCache.restore() tells whether a match folder's output is current
+and, if it is not, links a cached copy into place when there is one.
+Artifacts are evicted least recently used first once the store grows past
+ARTIFACT_CACHE_MAX_MB, and when unused for ARTIFACT_CACHE_TTL_DAYS.
+
+Match folders made before manifests existed have no entries; their outputs
+are adopted under the current keys the first time they are seen, rather
+than being generated (and paid for) again.
+
+Settings:
+    ARTIFACT_CACHE_DIR       - Store folder (default: commentaries/.artifact_cache)
+    ARTIFACT_CACHE_MAX_MB    - Maximum total size in MB (default: 5000, 0 disables
+                               the store; manifests are still kept)
+    ARTIFACT_CACHE_TTL_DAYS  - Evict artifacts unused for this many days (default: 30, 0: never)
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from file_utils import atomic_write, temp_path_for
+
+
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", "commentaries/.artifact_cache")
+ARTIFACT_CACHE_MAX_MB = float(os.getenv("ARTIFACT_CACHE_MAX_MB", "5000"))
+ARTIFACT_CACHE_TTL_DAYS = float(os.getenv("ARTIFACT_CACHE_TTL_DAYS", "30"))
+
+MANIFEST_NAME = "manifest.json"
+
+# Stages of one job run on several threads and share its manifest
+_manifest_lock = threading.Lock()
+
+
+def artifact_key(stage, **inputs):
+    """
+    Build the key of a stage's output.
+
+    Args:
+        stage: Stage name
+        **inputs: Everything that affects the output (JSON-serializable);
+            outputs of earlier stages are passed as their artifact keys
+
+    Returns:
+        Hex key
+    """
+    payload = json.dumps({"stage": stage, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_manifest(match_folder):
+    """Get a match folder's manifest: {stage: {"key", "files", "updated"}}."""
+    try:
+        with open(Path(match_folder) / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def record_artifact(match_folder, stage, key, files):
+    """Record in a match folder's manifest that a stage's files were made from key."""
+    with _manifest_lock:
+        manifest = load_manifest(match_folder)
+        manifest[stage] = {"key": key, "files": sorted(files), "updated": datetime.now().isoformat()}
+        with atomic_write(Path(match_folder) / MANIFEST_NAME) as f:
+            json.dump(manifest, f, indent=2)
+
+
+def _link_into_place(source, destination):
+    # Readers of destination see the old file or the new one, never a missing one
+    source_stat = os.stat(source)
+    try:
+        destination_stat = os.stat(destination)
+        if (source_stat.st_dev, source_stat.st_ino) == (destination_stat.st_dev, destination_stat.st_ino):
+            return  # Already linked (renaming over a link to the same file would leave temp_path behind)
+    except FileNotFoundError:
+        pass
+    temp_path = temp_path_for(destination)
+    try:
+        os.link(source, temp_path)
+    except FileNotFoundError:
+        raise  # Evicted meanwhile
+    except OSError:
+        # Another file system (or no hard links): copy instead
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
+
+
+class ArtifactCache:
+    """Size- and age-bounded store of pipeline artifacts, plus per-match manifests."""
+
+    def __init__(self, directory=ARTIFACT_CACHE_DIR, max_mb=ARTIFACT_CACHE_MAX_MB, ttl_days=ARTIFACT_CACHE_TTL_DAYS):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_days * 24 * 3600
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _entry(self, key):
+        return Path(self.directory) / key[:2] / key
+
+    def fetch(self, key, folder):
+        """
+        Link a cached artifact's files into folder.
+
+        Returns:
+            List of the file names placed, or None if the artifact is not cached
+        """
+        if not self.enabled:
+            return None
+        entry = self._entry(key)
+        try:
+            names = sorted(os.listdir(entry))
+            os.utime(entry)  # Mark as recently used (the files keep their own times)
+            for name in names:
+                _link_into_place(entry / name, Path(folder) / name)
+        except FileNotFoundError:
+            return None
+        return names
+
+    def store(self, key, folder, files):
+        """Add a stage's output files to the store, then evict if over the limits."""
+        if not self.enabled:
+            return
+        entry = self._entry(key)
+        if entry.exists():
+            os.utime(entry)
+            return
+        temp_entry = entry.with_name(f".{key}.tmp-{os.getpid()}-{threading.get_ident()}")
+        shutil.rmtree(temp_entry, ignore_errors=True)
+        try:
+            temp_entry.mkdir(parents=True)
+            for name in files:
+                try:
+                    os.link(Path(folder) / name, temp_entry / name)
+                except OSError:
+                    shutil.copyfile(Path(folder) / name, temp_entry / name)
+            os.rename(temp_entry, entry)
+        except OSError as e:
+            # Another process may have stored the same artifact first
+            if not entry.exists():
+                print(f"[ARTIFACT CACHE] Could not store {key[:12]}: {e}")
+        finally:
+            shutil.rmtree(temp_entry, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """Delete expired artifacts, then the least recently used ones until the store fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for prefix in Path(self.directory).glob("??"):
+                for entry in prefix.iterdir():
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        used = entry.stat().st_mtime
+                        size = sum(f.stat().st_size for f in entry.iterdir())
+                    except FileNotFoundError:
+                        continue
+                    entries.append((used, size, entry))
+
+            total = sum(size for _, size, _ in entries)
+            now = time.time()
+            for used, size, entry in sorted(entries):
+                expired = self.ttl_seconds and now - used > self.ttl_seconds
+                if not expired and total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                print(f"[ARTIFACT CACHE] Evicted {entry.name[:12]} ({'expired' if expired else 'size limit'})")
+
+    def restore(self, match_folder, stage, key, files=None):
+        """
+        Make a match folder's output of a stage match key, if possible without running the stage.
+
+        Args:
+            match_folder: Match folder
+            stage: Stage name
+            key: artifact_key() of the stage's current inputs
+            files: Output file names, used to adopt the outputs of a folder
+                whose manifest has no entry for the stage yet
+
+        Returns:
+            "current" if the folder's output was made from key, "cached" if a
+            cached copy was linked into the folder, None if the stage must run
+        """
+        entry = load_manifest(match_folder).get(stage)
+        if entry is None and files and all((Path(match_folder) / name).exists() for name in files):
+            print(f"[ARTIFACT CACHE] Adopting existing {stage} output in {match_folder}")
+            self.save(match_folder, stage, key, files)
+            return "current"
+        if entry and entry["key"] == key and all((Path(match_folder) / name).exists() for name in entry["files"]):
+            return "current"
+
+        names = self.fetch(key, match_folder)
+        if names is None:
+            return None
+        record_artifact(match_folder, stage, key, names)
+        print(f"[ARTIFACT CACHE] Restored {stage} output {key[:12]} into {match_folder}")
+        return "cached"
+
+    def save(self, match_folder, stage, key, files):
+        """Record a stage's new output in the match folder's manifest and add it to the store."""
+        files = [name for name in files if (Path(match_folder) / name).exists()]
+        if not files:
+            return
+        record_artifact(match_folder, stage, key, files)
+        self.store(key, match_folder, files)
+
+
+# Shared instance used by the web app's highlight pipeline
+artifact_cache = ArtifactCache()
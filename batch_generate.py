@@ -0,0 +1,387 @@
+"""
+Batch Generate - Generate highlight videos for many matches from the command line
+
+Runs the web app's highlight pipeline (see web_app.highlight_pipeline()) for
+every selected match, several matches at a time, without the web server.
+Matches are selected by season, match number range and team.
+
+Each external API and local rendering gets its own limit (see
+pipeline.py), shared by all matches in the batch: --concurrency sets how many
+matches are in progress, and --limit how many of them may be calling Gemini,
+ElevenLabs or HeyGen, or rendering, at the same moment.
+
+Jobs are recorded in the web app's job store under the same IDs as jobs
+started from the browser, and a job is claimed in the store before it
+starts, so a running web app shows their progress and neither side starts a
+second copy. An interrupted batch is resumed by running it again with
+--resume: matches the report lists as complete (with their final video still
+on disk) are skipped, finished stages of the others are restored from the
+artifact cache, and a HeyGen render that was in progress is waited for
+instead of paid for again. A match whose job finished without a final video
+(the optional final video stage failed) is reported as "incomplete" and is
+run again.
+
+The report (JSON) is rewritten after every match, with per-match status,
+errors and stage timings, totals for the whole batch, and the API rate
+limiters' counters (see rate_limiter.py).
+
+Settings:
+    BATCH_CONCURRENCY  - Matches in progress at the same time (default: 4)
+    BATCH_LIMITS       - Default --limit values (default: "gemini=4,elevenlabs=2,heygen=2,cpu=2");
+                         PIPELINE_LIMITS and --limit override them
+
+Usage: python batch_generate.py --season <year> [--matches 1-10,15] [--team KKR] [options]
+Example: python batch_generate.py --season 2008 --season 2009 --team CSK --concurrency 6
+         python batch_generate.py --season 2008 --matches 1-20 --limit heygen=1 --resume
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from file_utils import atomic_write
+from pipeline import PIPELINE_LIMITS, parse_limits, resource_limits, set_resource_limit
+from rate_limiter import rate_limit_metrics
+from video_combining import RENDER_PROFILES, VIDEO_RENDITIONS
+from web_app import (catalog, final_video_paths, final_videos_current, generate_highlight_async,
+                     highlight_job_id, job_store, match_folder_path, new_job_record, start_job_record)
+
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_LIMITS = parse_limits(os.getenv("BATCH_LIMITS", "gemini=4,elevenlabs=2,heygen=2,cpu=2"))
+DEFAULT_REPORT = "commentaries/batch_report.json"
+
+
+def parse_match_numbers(text):
+    """
+    Parse match numbers written as "1-10,15".
+
+    Returns:
+        Set of match numbers, or None for every match if text is empty
+
+    Raises:
+        ValueError: If an entry is not a number or a range
+    """
+    if not text:
+        return None
+    numbers = set()
+    for entry in text.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        first, _, last = entry.partition("-")
+        try:
+            first, last = int(first), int(last or first)
+        except ValueError:
+            raise ValueError(f"Invalid match number or range: {entry}")
+        numbers.update(range(first, last + 1))
+    return numbers
+
+
+def select_matches(seasons, match_numbers=None, teams=None):
+    """
+    Get the matches of some seasons, filtered by match number and team.
+
+    Args:
+        seasons: List of years
+        match_numbers: Set of match numbers to keep (None keeps all)
+        teams: Team abbreviations; a match is kept if either side is one of them
+
+    Returns:
+        List of (year, match_number, match_data)
+    """
+    teams = {team.upper() for team in teams or []}
+    selected = []
+    for year in seasons:
+        matches = catalog.get_matches(year)
+        if not matches:
+            raise ValueError(f"No matches found for IPL {year}")
+        for match_number, match in enumerate(matches, 1):
+            if match_numbers is not None and match_number not in match_numbers:
+                continue
+            if teams and not teams & {team.upper() for team in match.get('teams', [])}:
+                continue
+            selected.append((str(year), match_number, match))
+    return selected
+
+
+def load_report(path):
+    """Get a previous batch report's match entries keyed by job ID (empty if there is none)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {entry["job_id"]: entry for entry in json.load(f).get("matches", [])}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def is_done(entry):
+    """Check whether a previous report entry needs no rerun: complete, with its final video still on disk."""
+    return (entry is not None and entry.get("status") == "complete"
+            and os.path.exists(entry.get("final_video") or ""))
+
+
+def new_entry(year, match_number, match_data, profile="standard"):
+    """Start a match's report entry."""
+    return {
+        "job_id": highlight_job_id(year, match_number, profile),
+        "year": year,
+        "match_number": match_number,
+        "teams": match_data.get('teams', ['Unknown', 'Unknown']),
+        "status": None,
+        "up_to_date": False,
+        "seconds": 0.0,
+        "error": None,
+        "warnings": [],
+        "stages": {},
+        "final_video": None,
+    }
+
+
+def generate_match(year, match_number, match_data, profile="standard", force=False):
+    """
+    Generate one match's highlight through the web app's pipeline.
+
+    Args:
+        year: Season
+        match_number: Match number in the season (1-based)
+        match_data: Match from the catalog
+        profile: Render profile name
+        force: Run the pipeline even if the final video is up to date (its
+            stages still restore whatever is current)
+
+    Returns:
+        Report entry: job_id, year, match_number, teams, status ("complete",
+        "incomplete" if the job finished without its final video, "failed" or
+        "busy" if another process is running the job), seconds, error,
+        warnings, stages {name: timings} and final_video
+    """
+    entry = new_entry(year, match_number, match_data, profile)
+    job_id = entry["job_id"]
+    started = time.time()
+
+    match_folder = match_folder_path(year, match_number, match_data)
+    final_video = final_video_paths(match_folder, profile)[VIDEO_RENDITIONS[0]]
+    if not force and final_videos_current(year, match_number, match_data, profile):
+        entry.update(status="complete", up_to_date=True, final_video=final_video)
+        return entry
+
+    # Claimed atomically, so a web worker cannot start the same job meanwhile
+    record = new_job_record(year, match_number, message="Starting batch job...", profile=profile)
+    if start_job_record(job_id, record) is None:
+        current = job_store.get(job_id) or {}
+        entry.update(status="busy", error=f"Job is being run by {current.get('owner')}")
+        return entry
+
+    generate_highlight_async(year, match_number, match_data, profile)
+
+    job = job_store.get(job_id) or {}
+    stages = job.get("stages") or {}
+    final_video = job.get("final_video") if os.path.exists(job.get("final_video") or "") else None
+    warnings = [f"{name}: {report.get('error')}" for name, report in stages.items()
+                if report.get("status") == "failed" and job.get("status") == "complete"]
+    if job.get("status") != "complete":
+        status, error = "failed", job.get("error")
+    elif final_video is None:
+        # An optional stage (final_video) failed: the job finished, but there is no video
+        status, error = "incomplete", "Final video was not generated" + (f" ({warnings[0]})" if warnings else "")
+    else:
+        status, error = "complete", None
+    entry.update(
+        status=status,
+        seconds=round(time.time() - started, 2),
+        error=error,
+        warnings=warnings,
+        stages={name: {key: report.get(key) for key in ("status", "attempts", "seconds", "waited")}
+                for name, report in stages.items()},
+        final_video=final_video,
+    )
+    return entry
+
+
+def summarize(entries, started):
+    """
+    Total up a batch.
+
+    Returns:
+        {matches, complete, up_to_date, incomplete, failed, busy, seconds, stages}, where
+        stages is {name: {runs, failed, seconds, max_seconds, waited}} over
+        every match that ran the stage
+    """
+    summary = {
+        "matches": len(entries),
+        "complete": sum(1 for entry in entries if entry["status"] == "complete"),
+        "up_to_date": sum(1 for entry in entries if entry["up_to_date"]),
+        "incomplete": sum(1 for entry in entries if entry["status"] == "incomplete"),
+        "failed": sum(1 for entry in entries if entry["status"] == "failed"),
+        "busy": sum(1 for entry in entries if entry["status"] == "busy"),
+        "seconds": round(time.time() - started, 2),
+        "stages": {},
+    }
+    for entry in entries:
+        for name, report in entry["stages"].items():
+            totals = summary["stages"].setdefault(name, {"runs": 0, "failed": 0, "seconds": 0.0,
+                                                         "max_seconds": 0.0, "waited": 0.0})
+            seconds = report.get("seconds") or 0.0
+            totals["runs"] += 1
+            totals["failed"] += report.get("status") == "failed"
+            totals["seconds"] = round(totals["seconds"] + seconds, 2)
+            totals["max_seconds"] = max(totals["max_seconds"], seconds)
+            totals["waited"] = round(totals["waited"] + (report.get("waited") or 0.0), 2)
+    return summary
+
+
+def run_batch(args):
+    match_numbers = parse_match_numbers(args.matches)
+    matches = select_matches(args.season, match_numbers, args.team)
+    if not matches:
+        print("❌ No matches selected")
+        sys.exit(1)
+
+    limits = dict(BATCH_LIMITS, **PIPELINE_LIMITS)
+    for entry in args.limit:
+        limits.update(parse_limits(entry))
+    for resource, limit in limits.items():
+        set_resource_limit(resource, limit)
+
+    previous = load_report(args.report) if args.resume else {}
+    entries = {}
+    todo = []
+    for year, match_number, match_data in matches:
+        job_id = highlight_job_id(year, match_number, args.profile)
+        if not args.force and is_done(previous.get(job_id)):
+            entries[job_id] = previous[job_id]
+        else:
+            todo.append((year, match_number, match_data))
+
+    started = time.time()
+    report = {
+        "started": datetime.now().isoformat(),
+        "finished": None,
+        "seasons": [str(year) for year in args.season],
+        "profile": args.profile,
+        "concurrency": args.concurrency,
+        "limits": resource_limits(),
+        "summary": None,
+        "rate_limits": None,
+        "matches": [],
+    }
+    report_lock = threading.Lock()
+
+    def write_report(finished=False):
+        with report_lock:
+            ordered = [entries[highlight_job_id(year, number, args.profile)] for year, number, _ in matches
+                       if highlight_job_id(year, number, args.profile) in entries]
+            report.update(matches=ordered, summary=summarize(ordered, started), rate_limits=rate_limit_metrics(),
+                          finished=datetime.now().isoformat() if finished else None)
+            Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+            with atomic_write(args.report) as f:
+                json.dump(report, f, indent=2)
+
+    print(f"🎯 Generating highlights for {len(todo)} match(es) "
+          f"({len(matches) - len(todo)} already complete), {args.concurrency} at a time")
+    print(f"   Limits: {', '.join(f'{name}={limit}' for name, limit in resource_limits().items()) or 'none'}\n")
+
+    # First Ctrl+C: start no more matches, let the running ones finish; second: quit now
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        if stopping.is_set():
+            # Unfinished jobs keep their HeyGen render IDs, so --resume picks them up
+            print("\n⏹️  Quitting")
+            os._exit(130)
+        stopping.set()
+        print("\n⏸️  Stopping after the matches in progress (press Ctrl+C again to quit now; "
+              "run again with --resume to continue)")
+
+    signal.signal(signal.SIGINT, stop)
+
+    def run_match(year, match_number, match_data):
+        if stopping.is_set():
+            return None
+        try:
+            return generate_match(year, match_number, match_data, args.profile, args.force)
+        except Exception as e:
+            return dict(new_entry(year, match_number, match_data, args.profile), status="failed", error=str(e))
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(run_match, *match) for match in todo]
+        for done, future in enumerate(as_completed(futures), 1):
+            entry = future.result()
+            if entry is None:
+                continue
+            entries[entry["job_id"]] = entry
+            label = f"IPL {entry['year']} match {entry['match_number']} ({' vs '.join(entry['teams'])})"
+            if entry["status"] == "complete":
+                note = "up to date" if entry["up_to_date"] else f"{entry['seconds']:.1f}s"
+                print(f"✅ [{done}/{len(todo)}] {label}: {note}")
+                for warning in entry["warnings"]:
+                    print(f"   ⚠️  {warning}")
+            elif entry["status"] == "incomplete":
+                print(f"⚠️  [{done}/{len(todo)}] {label}: {entry['error']}")
+            elif entry["status"] == "busy":
+                print(f"⏭️  [{done}/{len(todo)}] {label}: {entry['error']}")
+            else:
+                print(f"❌ [{done}/{len(todo)}] {label}: {entry['error']}")
+            write_report()
+
+    write_report(finished=not stopping.is_set())
+    summary = report["summary"]
+    print(f"\n📊 {summary['complete']}/{summary['matches']} complete "
+          f"({summary['up_to_date']} already up to date), {summary['incomplete']} incomplete, "
+          f"{summary['failed']} failed, "
+          f"{summary['busy']} busy in {summary['seconds']:.1f}s")
+    for name, totals in summary["stages"].items():
+        print(f"   {name}: {totals['runs']} run(s), {totals['seconds']:.1f}s total, "
+              f"{totals['max_seconds']:.1f}s max, {totals['waited']:.1f}s waiting")
+    for provider, metrics in report["rate_limits"].items():
+        if metrics["calls"]:
+            print(f"   {provider} API: {metrics['calls']} call(s), {metrics['rate_limited']} rate limited, "
+                  f"{metrics['wait_seconds']:.1f}s waiting")
+    print(f"📝 Report written to {args.report}")
+
+    if summary["failed"] or summary["incomplete"] or stopping.is_set():
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate highlight videos for many matches")
+    parser.add_argument("--season", action="append", default=[],
+                        help="Season to generate (can be repeated)")
+    parser.add_argument("--matches", help="Match numbers and ranges, e.g. 1-10,15 (default: all)")
+    parser.add_argument("--team", action="append", default=[],
+                        help="Only matches played by this team, e.g. KKR (can be repeated)")
+    parser.add_argument("--profile", choices=list(RENDER_PROFILES), default="standard",
+                        help="Render profile (default: standard)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help=f"Matches in progress at the same time (default: {BATCH_CONCURRENCY})")
+    parser.add_argument("--limit", action="append", default=[],
+                        help="Stages at the same time per resource (gemini, elevenlabs, heygen, cpu), "
+                             "e.g. heygen=1 (can be repeated)")
+    parser.add_argument("--report", default=DEFAULT_REPORT, help=f"JSON report (default: {DEFAULT_REPORT})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip matches the existing report lists as complete")
+    parser.add_argument("--force", action="store_true",
+                        help="Run every match's pipeline, even if its final video is up to date")
+    args = parser.parse_args()
+
+    if not args.season:
+        parser.print_help()
+        print("\nExample:")
+        print("  python batch_generate.py --season 2008 --matches 1-10 --team KKR")
+        sys.exit(1)
+
+    try:
+        run_batch(args)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,10 @@ echo "📦 Installing Python packages..."
 pip install --upgrade pip
 pip install -r requirements.txt
 
+echo "🗂️  Building season index..."
+# Precompile data/ipl_*.json into the mmap'd season index
+python season_index.py
+
 echo "🔧 Installing system dependencies..."
 # Update package list
 apt-get update
@@ -0,0 +1,143 @@
+"""
+Clip Cache - Content-addressed cache of pre-encoded video clips
+
+Encoding a scoreboard still into a video clip gives the same result every
+time the image, duration and output format are the same, so the encoded
+clip is stored under a key derived from the image's SHA-256 hash and those
+parameters. Re-cutting a match with different video timings then reuses
+the scoreboard clips instead of encoding them again.
+
+The cache is bounded by total size. Using a clip refreshes its mtime, and
+the least recently used clips are deleted once the cache grows past
+CLIP_CACHE_MAX_MB.
+
+Settings:
+    CLIP_CACHE_DIR     - Cache folder (default: commentaries/.clip_cache)
+    CLIP_CACHE_MAX_MB  - Maximum total size in MB (default: 500, 0 disables the cache)
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from file_utils import atomic_output
+
+
+CLIP_CACHE_DIR = os.getenv("CLIP_CACHE_DIR", "commentaries/.clip_cache")
+CLIP_CACHE_MAX_MB = float(os.getenv("CLIP_CACHE_MAX_MB", "500"))
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Get the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(source, destination):
+    """
+    Hard-link source to destination, copying if linking is not possible.
+
+    A hard link keeps the data alive even if the cache evicts source later.
+    """
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        with atomic_output(destination) as temp_path:
+            shutil.copyfile(source, temp_path)
+
+
+class ClipCache:
+    """Size-bounded LRU cache of encoded clips, keyed by content hash."""
+
+    def __init__(self, directory=CLIP_CACHE_DIR, max_mb=CLIP_CACHE_MAX_MB, extension=".mp4"):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.extension = extension
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, source_path, **params):
+        """
+        Build a cache key for a clip made from a source file.
+
+        Args:
+            source_path: Input file (its contents are hashed, not its name)
+            **params: Everything else that affects the clip (duration,
+                resolution, fps, encoder settings...)
+
+        Returns:
+            Hex key
+        """
+        payload = json.dumps({"source": file_digest(source_path), **params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.extension)
+
+    def fetch(self, key, destination):
+        """
+        Place a cached clip at destination.
+
+        Returns:
+            True on a cache hit, False if the clip is not cached
+        """
+        if not self.enabled:
+            return False
+        path = self._path(key)
+        try:
+            os.utime(path)  # Mark as recently used
+            link_or_copy(path, destination)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store(self, key, source):
+        """Add an encoded clip to the cache, then evict old clips if over the size limit."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            link_or_copy(source, path)
+        except OSError as e:
+            print(f"[CLIP CACHE] Could not store {source}: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used clips until the cache fits in max_bytes."""
+        with self._lock:
+            clips = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if not name.endswith(self.extension):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    clips.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in clips)
+            for _, size, path in sorted(clips):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    print(f"[CLIP CACHE] Evicted {os.path.basename(path)}")
+                except FileNotFoundError:
+                    pass
+
+
+# Shared instance used by video_combining
+clip_cache = ClipCache()
@@ -2,15 +2,37 @@ import os
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
+from rate_limiter import rate_limited
 
 
 load_dotenv()
+
+COMMENTARY_MODEL = os.getenv("COMMENTARY_MODEL", "gemini-2.0-flash-exp")
+COMMENTARY_TEMPERATURE = 0.7
+COMMENTARY_MAX_TOKENS = 1000
+
+SYSTEM_PROMPT = """You are a friendly commentary generator who gives <30 seconds of match summary based on the JSON file given to it as the human input. Keep your responses:
+    - very short so that it is lesss than 30 seconds, technical and enthusiastic
+    - Engaging and conversational 
+    - Helpful and concise and very short"""
+
+# Everything besides the prompt that changes the commentary (for cache keys)
+COMMENTARY_SETTINGS = {
+    "model": COMMENTARY_MODEL,
+    "temperature": COMMENTARY_TEMPERATURE,
+    "max_tokens": COMMENTARY_MAX_TOKENS,
+    "system_prompt": SYSTEM_PROMPT,
+}
+
+# Returned instead of a commentary when the model call fails
+FALLBACK_RESPONSE = "Sorry, I'm having trouble processing your message right now. Please try again!"
+
 try:
     llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash-exp",
+        model=COMMENTARY_MODEL,
         google_api_key=os.getenv('GOOGLE_API_KEY'),
-        temperature=0.7,
-        max_tokens=1000
+        temperature=COMMENTARY_TEMPERATURE,
+        max_tokens=COMMENTARY_MAX_TOKENS
     )
 
 except Exception as e:
@@ -18,10 +40,7 @@ except Exception as e:
     prompt_template = None
 
 prompt_template = ChatPromptTemplate.from_messages([
-    ("system", """You are a friendly commentary generator who gives <30 seconds of match summary based on the JSON file given to it as the human input. Keep your responses:
-    - very short so that it is lesss than 30 seconds, technical and enthusiastic
-    - Engaging and conversational 
-    - Helpful and concise and very short"""),
+    ("system", SYSTEM_PROMPT),
     ("human", "{input}"),    
 ])
 
@@ -30,11 +49,11 @@ chain = prompt_template | llm
 
 def get_langchain_response(message):
     try:
-        # Get response from LangChain
-        response = chain.invoke({"input": message})
+        # Get response from LangChain (within the shared Gemini limits, retried on HTTP 429)
+        response = rate_limited("gemini", chain.invoke, {"input": message})
         return response.content
         
     except Exception as e:
-        return "Sorry, I'm having trouble processing your message right now. Please try again!"
+        return FALLBACK_RESPONSE
     
 
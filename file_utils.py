@@ -0,0 +1,279 @@
+"""
+File Utilities - Atomic writes and per-match locking for pipeline outputs
+
+Pipeline stages decide whether to run by checking if their output file
+exists, so a half-written file must never appear under its final name.
+atomic_write() writes to a temporary file next to the target and renames
+it into place only once the write has succeeded.
+
+match_lock() serialises work on one match folder across threads and
+processes (gunicorn workers), so two jobs for the same match never call the
+external APIs twice or write into the same folder at the same time.
+
+partial_output() and follow_file() let another process read a file that an
+atomic_output() block is still writing (fragmented MP4 renders).
+
+scratch_directory() gives each run its own folder for intermediate files
+and always removes it; remove_stale_scratch() clears what a killed process
+left behind.
+"""
+import glob
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+def temp_path_for(path):
+    """Get a unique temporary path in the same folder as path, keeping its extension."""
+    directory, name = os.path.split(str(path))
+    stem, ext = os.path.splitext(name)
+    return os.path.join(directory, f".{stem}.{os.getpid()}.{threading.get_ident()}.tmp{ext}")
+
+
+@contextmanager
+def atomic_write(path, mode='w', encoding=None):
+    """
+    Open a file for writing so that it only appears at path once complete.
+
+    Args:
+        path: Final file path
+        mode: 'w' for text or 'wb' for binary
+        encoding: Text encoding (default: utf-8 for text mode)
+
+    Yields:
+        Open file object to write to
+    """
+    if 'b' not in mode and encoding is None:
+        encoding = 'utf-8'
+    temp_path = temp_path_for(path)
+    try:
+        with open(temp_path, mode, encoding=encoding) as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+@contextmanager
+def atomic_output(path):
+    """
+    Get a temporary path for a tool that writes its own output file (ffmpeg,
+    Chromium screenshots) and move it to path once the block succeeds.
+
+    Yields:
+        Temporary path to pass to the tool
+    """
+    temp_path = temp_path_for(path)
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def partial_output(path):
+    """
+    Find the temporary file an unfinished atomic_output() block is writing for path.
+
+    Returns:
+        Path of the most recently modified temporary file, or None
+    """
+    directory, name = os.path.split(str(path))
+    stem, ext = os.path.splitext(name)
+    pattern = os.path.join(glob.escape(directory or "."), f".{glob.escape(stem)}.*.tmp{ext}")
+    candidates = []
+    for candidate in glob.glob(pattern):
+        try:
+            candidates.append((os.path.getmtime(candidate), candidate))
+        except FileNotFoundError:
+            continue  # Finished or abandoned since the glob
+    return max(candidates)[1] if candidates else None
+
+
+def follow_file(path, chunk_size=256 * 1024, poll_interval=0.5):
+    """
+    Yield the contents of a file that is still being written.
+
+    Reading continues as the file grows, and stops once the writer has
+    renamed the file into place (or removed it) and everything written has
+    been sent.
+
+    Args:
+        path: Temporary file from partial_output()
+    """
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if chunk:
+                yield chunk
+            elif os.path.exists(path):
+                time.sleep(poll_interval)
+            else:
+                # The open handle still reads the renamed file; send the rest
+                for rest in iter(lambda: f.read(chunk_size), b''):
+                    yield rest
+                return
+
+
+# Leftovers untouched for this long are removed even if their owner's
+# liveness cannot be checked (another host on a shared volume)
+STALE_SCRATCH_SECONDS = 600
+
+_TEMP_FILE_PATTERN = re.compile(r"^\..+\.(\d+)\.\d+\.tmp(\.[^.]*)?$")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def directory_size(path):
+    """Get the total size in bytes of the files under path (0 if it does not exist)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+    return total
+
+
+def _last_modified(path):
+    latest = os.path.getmtime(path)
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+            except FileNotFoundError:
+                continue
+    return latest
+
+
+@contextmanager
+def scratch_directory(base, prefix="scratch"):
+    """
+    Create a unique folder for intermediate files and always remove it afterwards.
+
+    The folder is named .<prefix>-<host>-<pid>-<random>, so runs never share
+    one and remove_stale_scratch() can tell whose it is.
+
+    Args:
+        base: Parent folder (created if missing), e.g. the match folder or /dev/shm
+        prefix: Name prefix
+
+    Yields:
+        Path of the new, empty folder
+    """
+    os.makedirs(base, exist_ok=True)
+    path = tempfile.mkdtemp(prefix=f".{prefix}-{socket.gethostname()}-{os.getpid()}-", dir=base)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def remove_stale_scratch(base, prefix="scratch", temp_files=True):
+    """
+    Delete scratch folders and atomic_output() temporary files in base that
+    were left by processes that no longer run (killed mid-render).
+
+    Leftovers of other hosts are only removed once they have not been
+    modified for STALE_SCRATCH_SECONDS.
+
+    Args:
+        base: Folder to clean
+        prefix: Prefix of the scratch folders (see scratch_directory())
+        temp_files: Also remove temporary files; pass False for a folder
+            shared with other programs (e.g. /dev/shm), where only names
+            with the prefix are ours
+
+    Returns:
+        Bytes freed
+    """
+    scratch_pattern = re.compile(rf"^\.{re.escape(prefix)}-(.+)-(\d+)-[^-]+$")
+    hostname = socket.gethostname()
+    freed = 0
+    try:
+        names = os.listdir(base)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(base, name)
+        scratch = scratch_pattern.match(name)
+        temp_file = _TEMP_FILE_PATTERN.match(name)
+        if scratch and os.path.isdir(path):
+            host, pid = scratch.group(1), int(scratch.group(2))
+        elif temp_files and temp_file and os.path.isfile(path):
+            # Temporary file names carry no host: they are written next to
+            # their target, by a process of this host
+            host, pid = hostname, int(temp_file.group(1))
+        else:
+            continue
+        try:
+            if host == hostname and pid == os.getpid():
+                continue
+            if host == hostname and _pid_alive(pid):
+                continue
+            if host != hostname and time.time() - _last_modified(path) < STALE_SCRATCH_SECONDS:
+                continue
+            size = directory_size(path) if os.path.isdir(path) else os.path.getsize(path)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        freed += size
+        print(f"[SCRATCH] Removed stale {name} ({size / 1024 / 1024:.1f} MB)")
+    return freed
+
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def match_lock(match_folder):
+    """
+    Hold an exclusive lock on a match folder.
+
+    Blocks until any other thread or process holding the lock releases it.
+
+    Args:
+        match_folder: Path to the match folder (created if missing)
+    """
+    os.makedirs(match_folder, exist_ok=True)
+    lock_path = os.path.abspath(os.path.join(match_folder, ".lock"))
+
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(lock_path, threading.Lock())
+
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
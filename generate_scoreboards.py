@@ -1,8 +1,12 @@
 """
-Generate Scoreboards - Wrapper script to generate scoreboard images for a match
-Usage: python generate_scoreboards.py <match_folder_path>
+Generate Scoreboards - Wrapper script to generate scoreboard images for matches
+Usage: python generate_scoreboards.py <match_folder_path> [<match_folder_path> ...]
+       python generate_scoreboards.py --season <year> [--concurrency N]
 Example: python generate_scoreboards.py commentaries/match_22_KXIP_vs_KKR
+         python generate_scoreboards.py --season 2008 --season 2009 --concurrency 8
 """
+import argparse
+import json
 import sys
 import os
 from pathlib import Path
@@ -10,32 +14,44 @@ from pathlib import Path
 # Add graphs_gen to Python path
 sys.path.insert(0, str(Path(__file__).parent / "graphs_gen"))
 
-from img_generator import generate_scoreboards_sync
+from img_generator import (BATCH_CONCURRENCY, ENGINES, generate_scoreboards_batch_sync,
+                           generate_scoreboards_sync)
+from match_catalog import catalog, match_folder_path
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python generate_scoreboards.py <match_folder_path>")
-        print("\nExample:")
-        print("  python generate_scoreboards.py commentaries/match_22_KXIP_vs_KKR")
-        sys.exit(1)
-    
-    match_folder = sys.argv[1]
-    
+def season_matches(year):
+    """
+    Get batch entries for every match in a season.
+
+    Returns:
+        List of (match_folder_path, match_data) pairs in match_data.json format
+    """
+    entries = []
+    for match_number, match in enumerate(catalog.get_matches(year), 1):
+        entries.append((match_folder_path(year, match_number, match), {
+            "match_number": match_number,
+            "year": str(year),
+            "teams": match.get('teams', ['Unknown', 'Unknown']),
+            "match_data": match
+        }))
+    return entries
+
+
+def generate_single(match_folder, engine=None):
     if not os.path.exists(match_folder):
         print(f"❌ Folder not found: {match_folder}")
         sys.exit(1)
-    
+
     # Check if match_data.json exists
     match_data_file = Path(match_folder) / "match_data.json"
     if not match_data_file.exists():
         print(f"❌ match_data.json not found in {match_folder}")
         sys.exit(1)
-    
+
     print(f"🎯 Generating scoreboards for {match_folder}...\n")
-    
-    generated_images = generate_scoreboards_sync(match_folder)
-    
+
+    generated_images = generate_scoreboards_sync(match_folder, engine)
+
     if generated_images:
         print(f"\n✅ Success! Generated {len(generated_images)} scoreboard image(s)")
         print("\n📁 Files created:")
@@ -46,5 +62,58 @@ def main():
         sys.exit(1)
 
 
+def generate_batch(args):
+    matches = list(args.match_folders)
+    for year in args.season:
+        entries = season_matches(year)
+        if not entries:
+            print(f"❌ No matches found for IPL {year}")
+            sys.exit(1)
+        matches.extend(entries)
+
+    print(f"🎯 Generating scoreboards for {len(matches)} match(es)...\n")
+
+    report = generate_scoreboards_batch_sync(matches, concurrency=args.concurrency, overwrite=args.overwrite,
+                                             engine=args.engine)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.report}")
+
+    failures = [image for image in report["images"] if image["status"] == "failed"]
+    if failures:
+        print(f"\n❌ {len(failures)} scoreboard(s) failed:")
+        for image in failures:
+            print(f"   {image['path'] or image['match_folder']}: {image['error']}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate scoreboard images for one or more matches")
+    parser.add_argument("match_folders", nargs="*", help="Match folders containing match_data.json")
+    parser.add_argument("--season", action="append", default=[],
+                        help="Render every match of an IPL season (can be repeated)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help=f"Scoreboards rendered at the same time (default: {BATCH_CONCURRENCY})")
+    parser.add_argument("--engine", choices=ENGINES,
+                        help="Rendering engine (default: SCOREBOARD_ENGINE or browser)")
+    parser.add_argument("--overwrite", action="store_true", help="Re-render images that already exist")
+    parser.add_argument("--report", help="Write a JSON report with per-image timings and failures")
+    args = parser.parse_args()
+
+    if not args.match_folders and not args.season:
+        parser.print_help()
+        print("\nExample:")
+        print("  python generate_scoreboards.py commentaries/match_22_KXIP_vs_KKR")
+        print("  python generate_scoreboards.py --season 2008 --concurrency 8")
+        sys.exit(1)
+
+    if len(args.match_folders) == 1 and not (args.season or args.overwrite or args.report):
+        generate_single(args.match_folders[0], args.engine)
+    else:
+        generate_batch(args)
+
+
 if __name__ == "__main__":
     main()
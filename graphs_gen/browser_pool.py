@@ -0,0 +1,217 @@
+"""
+Browser Pool - Long-lived headless Chromium instances for scoreboard rendering
+
+Launching Chromium is the largest fixed cost of rendering a scoreboard, so
+instead of starting a browser per image, a small pool of browsers is kept
+running and hands out fresh pages. A browser that has crashed or lost its
+connection is relaunched the next time a page is requested from it.
+
+pyppeteer objects are tied to the event loop they were created on, so the
+pool runs its own event loop on a background thread. Synchronous code calls
+run(); coroutines running on any other event loop await call().
+
+Settings:
+    SCOREBOARD_BROWSERS           - Browsers kept running per process (default: 1)
+    SCOREBOARD_PAGES_PER_BROWSER  - Pages open at once in each browser (default: 4)
+"""
+import asyncio
+import atexit
+import os
+import threading
+from contextlib import asynccontextmanager
+
+try:
+    from pyppeteer2 import launch
+except ImportError:  # Only the Pillow scoreboard engine can be used
+    launch = None
+
+
+BROWSER_COUNT = int(os.getenv("SCOREBOARD_BROWSERS", "1"))
+PAGES_PER_BROWSER = int(os.getenv("SCOREBOARD_PAGES_PER_BROWSER", "4"))
+
+LAUNCH_OPTIONS = {
+    'headless': True,
+    'handleSIGINT': False,  # Don't handle signals (fixes thread issue)
+    'handleSIGTERM': False,
+    'handleSIGHUP': False,
+    'args': [
+        '--no-sandbox',
+        '--disable-setuid-sandbox',
+        '--disable-dev-shm-usage',
+        '--disable-gpu'
+    ]
+}
+
+
+def browser_alive(browser):
+    """Check whether a browser's process is running and still connected."""
+    process = getattr(browser, 'process', None)
+    if process is not None and process.poll() is not None:
+        return False
+    connection = getattr(browser, '_connection', None)
+    return connection is None or getattr(connection, '_connected', True)
+
+
+class _BrowserSlot:
+    """One pooled browser and the pages currently open in it."""
+
+    def __init__(self, max_pages):
+        self.browser = None
+        self.open_pages = 0
+        self.launch_lock = asyncio.Lock()
+        self.page_slots = asyncio.Semaphore(max_pages)
+
+
+class BrowserPool:
+    """Pool of headless browsers handing out pages on a dedicated event loop."""
+
+    def __init__(self, browsers=BROWSER_COUNT, pages_per_browser=PAGES_PER_BROWSER,
+                 launch_options=None):
+        self.browsers = max(1, browsers)
+        self.pages_per_browser = max(1, pages_per_browser)
+        self.launch_options = launch_options or LAUNCH_OPTIONS
+        self._loop = None
+        self._loop_thread = None
+        self._loop_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        # Like the job scheduler, the loop thread is started lazily so that a
+        # process forked from the gunicorn master starts its own
+        with self._lock:
+            if self._loop is None or self._loop_pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._loop_pid = os.getpid()
+                self._slots = None
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="browser-pool", daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    def run(self, coro, timeout=None):
+        """
+        Run a coroutine on the pool's event loop and wait for its result.
+
+        Args:
+            coro: Coroutine that uses page()
+            timeout: Maximum seconds to wait (default: no limit)
+
+        Returns:
+            The coroutine's result
+        """
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._loop_thread:
+            coro.close()
+            raise RuntimeError("BrowserPool.run() called from the pool's own event loop; await it instead")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    async def call(self, coro):
+        """Await a coroutine on the pool's event loop from any event loop."""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Open a new page in the least busy browser and close it afterwards.
+
+        Must be used on the pool's event loop (see run() and call()).
+
+        Yields:
+            pyppeteer Page
+        """
+        if self._slots is None:
+            self._slots = [_BrowserSlot(self.pages_per_browser) for _ in range(self.browsers)]
+        slot = min(self._slots, key=lambda s: s.open_pages)
+
+        slot.open_pages += 1
+        try:
+            async with slot.page_slots:
+                page = await self._new_page(slot)
+                try:
+                    yield page
+                finally:
+                    try:
+                        await page.close()
+                    except Exception:
+                        pass  # Browser died while the page was in use
+        finally:
+            slot.open_pages -= 1
+
+    async def _new_page(self, slot):
+        browser = await self._browser(slot)
+        try:
+            return await browser.newPage()
+        except Exception as e:
+            print(f"[BROWSER] Could not open a page ({e}), relaunching browser")
+            browser = await self._browser(slot, replace=browser)
+            return await browser.newPage()
+
+    async def _browser(self, slot, replace=None):
+        async with slot.launch_lock:
+            # Another page request may already have relaunched it
+            if slot.browser is not None and slot.browser is not replace and browser_alive(slot.browser):
+                return slot.browser
+
+            if slot.browser is not None:
+                print("[BROWSER] Browser is no longer running, relaunching")
+                await self._close_browser(slot.browser)
+                slot.browser = None
+
+            if launch is None:
+                raise RuntimeError("pyppeteer2 is not installed; use the pil scoreboard engine")
+            slot.browser = await launch(**self.launch_options)
+            process = getattr(slot.browser, 'process', None)
+            print(f"[BROWSER] Launched Chromium (pid {getattr(process, 'pid', '?')})")
+            return slot.browser
+
+    @staticmethod
+    async def _close_browser(browser):
+        try:
+            await browser.close()
+        except Exception:
+            pass
+
+    async def close_all(self):
+        """Close every browser in the pool (run on the pool's event loop)."""
+        for slot in self._slots or []:
+            if slot.browser is not None:
+                await self._close_browser(slot.browser)
+                slot.browser = None
+
+    def close(self):
+        """Close every browser started by this process."""
+        with self._lock:
+            loop = self._loop if self._loop_pid == os.getpid() else None
+        if loop is None or not loop.is_running() or not self._slots:
+            return
+        try:
+            self.run(self.close_all(), timeout=10)
+        except Exception as e:
+            print(f"[BROWSER] Error closing browsers: {e}")
+
+    def shutdown(self, timeout=10):
+        """
+        Close every browser, then stop the pool's event loop and wait for its thread.
+
+        For pools made for one job; the pool starts a new loop if it is used again.
+        """
+        self.close()
+        with self._lock:
+            if self._loop is None or self._loop_pid != os.getpid():
+                return
+            loop, thread = self._loop, self._loop_thread
+            self._loop = self._loop_thread = self._loop_pid = self._slots = None
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
+
+
+# Shared instance used by img_generator (scripts and the web app)
+browser_pool = BrowserPool()
+atexit.register(browser_pool.close)
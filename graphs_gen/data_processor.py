@@ -4,6 +4,110 @@ Data Processor - Extract scoreboard data from match_data.json
 import json
 import re
 
+try:
+    # Precompiled season index (repo root); optional when run standalone
+    from season_index import load_season_index
+except ImportError:
+    load_season_index = None
+
+
+def clean_team_name(raw_name):
+    """Clean team name - remove non-breaking spaces and extra info."""
+    team_name = raw_name.split('(')[0].strip()
+    return team_name.replace("\u00a0", " ").strip()
+
+
+def parse_extras(extras_text):
+    """
+    Parse an extras entry into a label and value.
+
+    Format: "Extras(b 4, lb 5, nb 1, w 4)14(b 4, lb 5, nb 1, w 4)"
+
+    Returns:
+        Tuple of (label, value)
+    """
+    match = re.search(r'Extras\((.*?)\)(\d+)', extras_text)
+    if match:
+        breakdown = match.group(1)
+        return f"Extras ({breakdown})", int(match.group(2))
+    # Fallback
+    return "Extras", 0
+
+
+def new_scoreboard(team_name):
+    """Create an empty scoreboard dictionary for an innings."""
+    return {
+        "name": team_name,
+        "batting_entries": [],
+        "extras": {
+            "label": "",  # e.g., "Extras (lb 8, w 11)"
+            "value": 0    # e.g., 19
+        },
+        "total_score": "",
+        "overs": "20.0"  # Default for T20
+    }
+
+
+def extract_scoreboard_data_from_index(match_data_json):
+    """
+    Build scoreboards from the precompiled season index instead of the JSON.
+
+    Only used when match_data.json records the year and match number and the
+    indexed season is still up to date with its source file.
+
+    Args:
+        match_data_json: Dictionary containing match data
+
+    Returns:
+        List of scoreboard dictionaries, or None if the index cannot be used
+    """
+    if load_season_index is None:
+        return None
+
+    year = match_data_json.get("year")
+    match_number = match_data_json.get("match_number")
+    if year is None or match_number is None:
+        return None
+
+    index = load_season_index()
+    if index is None or not index.is_fresh(year):
+        return None
+    if index.teams(year, match_number) != match_data_json.get("teams"):
+        return None
+
+    innings_list = index.innings_columns(year, match_number)
+    if innings_list is None:
+        return None
+
+    all_innings_scoreboards = []
+    for innings in innings_list:
+        # Let the JSON path report rows with non-numeric values
+        if any(-1 in innings[field] for field in ("runs", "balls", "fours", "sixes")):
+            return None
+
+        scoreboard = new_scoreboard(clean_team_name(innings["name"]))
+        for row, player_name in enumerate(innings["player"]):
+            scoreboard["batting_entries"].append({
+                "player": player_name,
+                "dismissal_status": "not out",
+                "dismissal_bowler": "",
+                "runs": innings["runs"][row],
+                "balls": innings["balls"][row],
+                "fours": innings["fours"][row],
+                "sixes": innings["sixes"][row],
+                "strike_rate": innings["strike_rate"][row]
+            })
+
+        if innings["extras"] is not None:
+            label, value = parse_extras(innings["extras"])
+            scoreboard["extras"]["label"] = label
+            scoreboard["extras"]["value"] = value
+
+        scoreboard["total_score"] = str(sum(innings["runs"]) + scoreboard["extras"]["value"])
+        all_innings_scoreboards.append(scoreboard)
+
+    return all_innings_scoreboards
+
 
 def extract_scoreboard_data(match_data_json):
     """
@@ -15,26 +119,17 @@ def extract_scoreboard_data(match_data_json):
     Returns:
         List of scoreboard dictionaries (one per innings)
     """
+    indexed = extract_scoreboard_data_from_index(match_data_json)
+    if indexed is not None:
+        return indexed
+
     all_innings_scoreboards = []
     
     # Get innings from the nested structure
     innings_list = match_data_json.get("match_data", {}).get("innings", [])
     
     for inning_raw in innings_list:
-        # Clean team name - remove non-breaking spaces and extra info
-        team_name = inning_raw['name'].split('(')[0].strip()
-        team_name = team_name.replace("\u00a0", " ").strip()
-        
-        scoreboard = {
-            "name": team_name,
-            "batting_entries": [],
-            "extras": {
-                "label": "",  # e.g., "Extras (lb 8, w 11)"
-                "value": 0    # e.g., 19
-            },
-            "total_score": "",
-            "overs": "20.0"  # Default for T20
-        }
+        scoreboard = new_scoreboard(clean_team_name(inning_raw['name']))
 
         total_runs_from_players = 0
 
@@ -61,20 +156,9 @@ def extract_scoreboard_data(match_data_json):
                 total_runs_from_players += player_runs
                 
             elif "Extras" in entry:
-                # Format: "Extras(b 4, lb 5, nb 1, w 4)14(b 4, lb 5, nb 1, w 4)"
-                extras_text = entry['Extras']
-                
-                # Extract the breakdown and total
-                match = re.search(r'Extras\((.*?)\)(\d+)', extras_text)
-                if match:
-                    breakdown = match.group(1)
-                    extras_value = int(match.group(2))
-                    scoreboard["extras"]["label"] = f"Extras ({breakdown})"
-                    scoreboard["extras"]["value"] = extras_value
-                else:
-                    # Fallback
-                    scoreboard["extras"]["label"] = "Extras"
-                    scoreboard["extras"]["value"] = 0
+                label, value = parse_extras(entry['Extras'])
+                scoreboard["extras"]["label"] = label
+                scoreboard["extras"]["value"] = value
 
         # Calculate total score
         total_extras = scoreboard["extras"]["value"]
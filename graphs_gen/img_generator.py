@@ -1,105 +1,159 @@
 """
 Image Generator - Generate scoreboard images using pyppeteer2
+
+Two rendering engines are available, selected per call or with
+SCOREBOARD_ENGINE (default: browser):
+    browser - Chromium renders scoreboard_processor.html. Pages are taken
+              from the shared browser pool (see browser_pool.py), so Chromium
+              is launched once per process rather than once per image.
+    pil     - Pillow draws the same layout directly (see pil_renderer.py);
+              no browser is needed at all.
+
+generate_scoreboards_batch() renders many matches at once on the pages of
+a single browser.
 """
 import json
 import os
+import sys
 import asyncio
+import time
 from pathlib import Path
-from pyppeteer2 import launch
+
+# file_utils lives in the project root (also when this script is run from graphs_gen/)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from file_utils import atomic_output
+from browser_pool import BrowserPool, browser_pool
 from data_processor import extract_scoreboard_data
 
+try:
+    from pil_renderer import save_scoreboard_image
+except ImportError:  # Pillow not installed: only the browser engine is available
+    save_scoreboard_image = None
+
+
+ENGINES = ("browser", "pil")
+SCOREBOARD_ENGINE = os.getenv("SCOREBOARD_ENGINE", "browser").lower()
+
+
+# Maximum time to wait for the page to report that the scoreboard is drawn
+RENDER_TIMEOUT_MS = int(float(os.getenv("SCOREBOARD_RENDER_TIMEOUT", "10")) * 1000)
+
+# Scoreboards rendered at the same time by generate_scoreboards_batch()
+BATCH_CONCURRENCY = 4
+
+HTML_TEMPLATE = Path(__file__).parent / "scoreboard_processor.html"
+
 
-async def capture_scoreboard_image(scoreboard_data, output_path, html_template_path):
+def resolve_engine(engine=None):
     """
-    Generate a scoreboard image using pyppeteer.
+    Get the rendering engine to use.
+    
+    Args:
+        engine: "browser", "pil" or None for SCOREBOARD_ENGINE
+        
+    Returns:
+        Engine name
+        
+    Raises:
+        ValueError: If the engine is unknown or Pillow is missing for "pil"
+    """
+    engine = (engine or SCOREBOARD_ENGINE).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown scoreboard engine: {engine} (expected one of {', '.join(ENGINES)})")
+    if engine == "pil" and save_scoreboard_image is None:
+        raise ValueError("The pil scoreboard engine needs Pillow (pip install Pillow)")
+    return engine
+
+
+async def capture_scoreboard_image(scoreboard_data, output_path, html_template_path, pool=None, engine=None):
+    """
+    Generate a scoreboard image using pyppeteer or Pillow.
+    
+    Can be awaited from any event loop; browser rendering runs on the browser
+    pool's loop and Pillow rendering on a worker thread.
     
     Args:
         scoreboard_data: Dictionary containing scoreboard information
         output_path: Path where the PNG image should be saved
-        html_template_path: Path to the HTML template file
+        html_template_path: Path to the HTML template file (browser engine)
+        pool: BrowserPool to render with (default: the shared pool)
+        engine: "browser" or "pil" (default: SCOREBOARD_ENGINE)
+        
+    Returns:
+        True if the image was generated, False otherwise
     """
-    browser = None
+    engine = resolve_engine(engine)
     try:
-        # Read the HTML template
-        with open(html_template_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
-        # Inject the scoreboard data into the HTML
-        scoreboard_json = json.dumps(scoreboard_data, indent=2)
-        injection_script = f"""
-        <script>
-            // Injected scoreboard data
-            const scoreboardData = {scoreboard_json};
-            console.log('Scoreboard data loaded:', scoreboardData);
-            
-            // Execute immediately when DOM is ready
-            if (document.readyState === 'loading') {{
-                document.addEventListener('DOMContentLoaded', () => {{
-                    console.log('DOM loaded, rendering scoreboard');
-                    renderScoreboard(scoreboardData);
-                }});
-            }} else {{
-                console.log('DOM already loaded, rendering scoreboard immediately');
-                renderScoreboard(scoreboardData);
-            }}
-        </script>
-        """
-        
-        # Insert before closing body tag
-        html_content = html_content.replace('</body>', f'{injection_script}</body>')
-        
-        # Launch browser
-        browser = await launch(
-            headless=True,
-            handleSIGINT=False,  # Don't handle signals (fixes thread issue)
-            handleSIGTERM=False,
-            handleSIGHUP=False,
-            args=[
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-gpu'
-            ]
-        )
+        await _render_with_engine(engine, scoreboard_data, output_path, html_template_path, pool or browser_pool)
+    except Exception as e:
+        print(f"❌ Error capturing scoreboard: {e}")
+        return False
+    print(f"✓ Generated: {output_path}")
+    return True
+
+
+async def _render_with_engine(engine, scoreboard_data, output_path, html_template_path, pool):
+    if engine == "pil":
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, save_scoreboard_image, scoreboard_data, str(output_path))
+    else:
+        await pool.call(_render_scoreboard_image(scoreboard_data, output_path, html_template_path, pool))
+
+
+async def _render_scoreboard_image(scoreboard_data, output_path, html_template_path, pool):
+    # Read the HTML template
+    with open(html_template_path, 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    
+    # Inject the scoreboard data into the HTML
+    # Escape "</" so player names can never close the script tag early
+    scoreboard_json = json.dumps(scoreboard_data).replace('</', '<\\/')
+    injection_script = f"""
+    <script>
+        // Injected scoreboard data
+        const scoreboardData = {scoreboard_json};
         
-        page = await browser.newPage()
+        // Execute immediately when DOM is ready
+        if (document.readyState === 'loading') {{
+            document.addEventListener('DOMContentLoaded', () => renderScoreboard(scoreboardData));
+        }} else {{
+            renderScoreboard(scoreboardData);
+        }}
+    </script>
+    """
+    
+    # Insert before closing body tag
+    html_content = html_content.replace('</body>', f'{injection_script}</body>')
+    
+    async with pool.page() as page:
         await page.setViewport({'width': 1920, 'height': 1080})
-        
-        # Set content directly
+    
+        # Set content directly; the injected script renders the scoreboard
         await page.setContent(html_content)
-        
-        # Wait for the page to load
-        await asyncio.sleep(1)
-        
-        # Execute the renderScoreboard function directly with the data
-        scoreboard_json_str = json.dumps(scoreboard_data)
-        await page.evaluate(f'''() => {{
-            const data = {scoreboard_json_str};
-            console.log('Calling renderScoreboard with:', data);
-            renderScoreboard(data);
-        }}''')
-        
-        # Wait a bit more for rendering to complete
-        await asyncio.sleep(1)
-        
+    
+        # Wait for the page to signal that rendering is done
+        await page.waitForFunction(
+            '() => window.scoreboardRendered === true || !!window.scoreboardRenderError',
+            {'timeout': RENDER_TIMEOUT_MS}
+        )
+        render_error = await page.evaluate('() => window.scoreboardRenderError')
+        if render_error:
+            raise RuntimeError(f"Scoreboard template failed to render: {render_error}")
+    
         # Take screenshot - use a specific element or fullPage
-        await page.screenshot({'path': output_path, 'fullPage': True})
-        
-        print(f"✓ Generated: {output_path}")
-        
-    except Exception as e:
-        print(f"❌ Error capturing scoreboard: {e}")
-    finally:
-        if browser:
-            await browser.close()
+        # Write to a unique temp file first so a failed capture never leaves a partial PNG
+        # and concurrent renders of the same folder never share one
+        with atomic_output(output_path) as temp_output_path:
+            await page.screenshot({'path': temp_output_path, 'fullPage': True})
 
 
-async def generate_scoreboards_for_match(match_folder_path):
+async def generate_scoreboards_for_match(match_folder_path, engine=None):
     """
     Generate scoreboard images for a match.
     
     Args:
         match_folder_path: Path to the match folder containing match_data.json
+        engine: "browser" or "pil" (default: SCOREBOARD_ENGINE)
         
     Returns:
         List of generated image paths
@@ -126,8 +180,7 @@ async def generate_scoreboards_for_match(match_folder_path):
         return []
     
     # Get HTML template path
-    script_dir = Path(__file__).parent
-    html_template = script_dir / "scoreboard_processor.html"
+    html_template = HTML_TEMPLATE
     
     if not html_template.exists():
         print(f"❌ HTML template not found: {html_template}")
@@ -140,46 +193,150 @@ async def generate_scoreboards_for_match(match_folder_path):
         team_name = scoreboard.get('name', f'Inning {idx}')
         
         print(f"  Generating scoreboard for {team_name}...")
-        await capture_scoreboard_image(scoreboard, str(output_path), str(html_template))
-        generated_paths.append(str(output_path))
+        if await capture_scoreboard_image(scoreboard, str(output_path), str(html_template), engine=engine):
+            generated_paths.append(str(output_path))
     
-    print(f"✅ Generated {len(scoreboards)} scoreboard image(s)")
+    print(f"✅ Generated {len(generated_paths)} scoreboard image(s)")
     return generated_paths
 
 
-def generate_scoreboards_sync(match_folder_path):
+def generate_scoreboards_sync(match_folder_path, engine=None):
     """
     Synchronous wrapper for generating scoreboards.
-    Thread-safe version that works from background threads.
+    Thread-safe: can be called from any thread, including background job
+    workers. The work runs on the browser pool's event loop.
     
     Args:
         match_folder_path: Path to the match folder containing match_data.json
+        engine: "browser" or "pil" (default: SCOREBOARD_ENGINE)
         
     Returns:
         List of generated image paths
     """
     import threading
     
-    # Check if we're in the main thread
-    is_main_thread = threading.current_thread() is threading.main_thread()
-    current_thread_name = threading.current_thread().name
+    print(f"[SCOREBOARD] Running in thread: {threading.current_thread().name}")
+    return browser_pool.run(generate_scoreboards_for_match(match_folder_path, engine))
+
+def _load_match_data(match):
+    # Batch entries are either a folder with match_data.json or (folder, data)
+    if isinstance(match, (tuple, list)):
+        match_folder, match_data = match
+        return Path(match_folder), match_data
+    match_folder = Path(match)
+    with open(match_folder / "match_data.json", 'r', encoding='utf-8') as f:
+        return match_folder, json.load(f)
+
+
+async def generate_scoreboards_batch(matches, concurrency=BATCH_CONCURRENCY, overwrite=False, pool=None,
+                                     engine=None):
+    """
+    Generate scoreboard images for many matches concurrently.
     
-    print(f"[SCOREBOARD] Running in thread: {current_thread_name} (main={is_main_thread})")
+    All images are rendered on the pages of one browser, at most concurrency
+    at a time. A failed image does not stop the batch.
     
-    if is_main_thread:
-        # We're in main thread, can use asyncio.run() normally
-        return asyncio.run(generate_scoreboards_for_match(match_folder_path))
-    else:
-        # We're in a background thread, need to create a new event loop
-        print("[SCOREBOARD] Creating new event loop for background thread...")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    Args:
+        matches: Iterable of match folder paths (containing match_data.json),
+            or (match_folder_path, match_data) pairs where match_data has the
+            match_data.json structure; folders are created as needed
+        concurrency: Maximum number of scoreboards rendered at the same time
+        overwrite: Re-render images that already exist
+        pool: BrowserPool to use (default: a new single-browser pool that is
+            shut down, with its event loop thread, when the batch finishes)
+        engine: "browser" or "pil" (default: SCOREBOARD_ENGINE)
+        
+    Returns:
+        Report dictionary:
+            images: List of {"match_folder", "inning", "path", "status",
+                "seconds", "error"} with status "generated", "skipped" or "failed"
+            generated, skipped, failed: Image counts by status
+            seconds: Wall-clock time of the whole batch
+    """
+    engine = resolve_engine(engine)
+    if engine == "pil":
+        return await _render_batch(matches, max(1, concurrency), overwrite, engine, None)
+    
+    own_pool = pool is None
+    if own_pool:
+        pool = BrowserPool(browsers=1, pages_per_browser=concurrency)
+    try:
+        return await pool.call(_render_batch(matches, max(1, concurrency), overwrite, engine, pool))
+    finally:
+        if own_pool:
+            await pool.call(pool.close_all())
+            pool.shutdown()
+
+
+async def _render_batch(matches, concurrency, overwrite, engine, pool):
+    batch_start = time.perf_counter()
+    limit = asyncio.Semaphore(concurrency)
+    results = []
+    
+    async def render(match_folder, inning, scoreboard, output_path):
+        result = {"match_folder": str(match_folder), "inning": inning, "path": str(output_path),
+                  "status": "generated", "seconds": 0.0, "error": None}
+        results.append(result)
+        async with limit:
+            start = time.perf_counter()
+            try:
+                await _render_with_engine(engine, scoreboard, str(output_path), str(HTML_TEMPLATE), pool)
+                print(f"  ✓ {output_path} ({time.perf_counter() - start:.2f}s)")
+            except Exception as e:
+                result.update(status="failed", error=str(e) or type(e).__name__)
+                print(f"  ❌ {output_path}: {result['error']}")
+            result["seconds"] = round(time.perf_counter() - start, 3)
+    
+    tasks = []
+    for match in matches:
         try:
-            result = loop.run_until_complete(generate_scoreboards_for_match(match_folder_path))
-            return result
-        finally:
-            loop.close()
-            asyncio.set_event_loop(None)
+            match_folder, match_data = _load_match_data(match)
+            scoreboards = extract_scoreboard_data(match_data)
+        except Exception as e:
+            folder = match[0] if isinstance(match, (tuple, list)) else match
+            results.append({"match_folder": str(folder), "inning": None, "path": None,
+                            "status": "failed", "seconds": 0.0, "error": str(e)})
+            print(f"  ❌ {folder}: {e}")
+            continue
+        
+        if not scoreboards:
+            # Abandoned matches have no innings to draw
+            results.append({"match_folder": str(match_folder), "inning": None, "path": None,
+                            "status": "skipped", "seconds": 0.0, "error": "No innings data found"})
+            continue
+        
+        match_folder.mkdir(parents=True, exist_ok=True)
+        for idx, scoreboard in enumerate(scoreboards, 1):
+            output_path = match_folder / f"scoreboard_inning{idx}.png"
+            if output_path.exists() and not overwrite:
+                results.append({"match_folder": str(match_folder), "inning": idx, "path": str(output_path),
+                                "status": "skipped", "seconds": 0.0, "error": None})
+                continue
+            tasks.append(render(match_folder, idx, scoreboard, output_path))
+    
+    print(f"📊 Rendering {len(tasks)} scoreboard image(s) with the {engine} engine, {concurrency} at a time...")
+    await asyncio.gather(*tasks)
+    
+    report = {"images": results, "seconds": round(time.perf_counter() - batch_start, 3)}
+    for status in ("generated", "skipped", "failed"):
+        report[status] = sum(1 for r in results if r["status"] == status)
+    
+    rendered = [r["seconds"] for r in results if r["status"] == "generated"]
+    average = f", {sum(rendered) / len(rendered):.2f}s per image" if rendered else ""
+    print(f"✅ Batch finished in {report['seconds']:.1f}s: {report['generated']} generated, "
+          f"{report['skipped']} skipped, {report['failed']} failed{average}")
+    return report
+
+
+def generate_scoreboards_batch_sync(matches, concurrency=BATCH_CONCURRENCY, overwrite=False, engine=None):
+    """
+    Synchronous wrapper for generate_scoreboards_batch().
+    
+    Returns:
+        Report dictionary (see generate_scoreboards_batch)
+    """
+    return asyncio.run(generate_scoreboards_batch(matches, concurrency, overwrite, engine=engine))
+
 
 async def main():
     """Example usage"""
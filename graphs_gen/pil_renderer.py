@@ -0,0 +1,272 @@
+"""
+PIL Renderer - Draw scoreboard images with Pillow, without a browser
+
+Reproduces the layout of scoreboard_processor.html (a 1200px wide dark
+panel centred on a 1920x1080 light blue page, with a batting table, extras
+and totals) directly with Pillow. This is much faster than Chromium and
+needs no browser, at the cost of slightly different font rendering.
+
+Fonts are looked up by name in the system font folders: Segoe UI, then
+Arial, Liberation Sans and DejaVu Sans, falling back to Pillow's built-in
+font. Set SCOREBOARD_FONT to a .ttf path to use a specific font (its bold and
+italic variants are not looked up).
+"""
+import os
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from file_utils import atomic_output
+
+
+WIDTH, HEIGHT = 1920, 1080
+
+FONT_CANDIDATES = {
+    "regular": ["segoeui.ttf", "arial.ttf", "LiberationSans-Regular.ttf", "DejaVuSans.ttf"],
+    "bold": ["segoeuib.ttf", "arialbd.ttf", "LiberationSans-Bold.ttf", "DejaVuSans-Bold.ttf"],
+    "italic": ["segoeuii.ttf", "ariali.ttf", "LiberationSans-Italic.ttf", "DejaVuSans-Oblique.ttf"],
+}
+
+# Colours and sizes from scoreboard_processor.html (1em = 16px)
+PAGE_BACKGROUND = (169, 240, 250)
+GREEN = (0, 255, 0)
+WHITE = (255, 255, 255)
+LIGHT_GREY = (238, 238, 238)    # #eee
+MID_GREY = (204, 204, 204)      # #ccc
+DARK_GREY = (170, 170, 170)     # #aaa
+
+CONTAINER_WIDTH = 1200
+CONTAINER_PADDING = 30
+CONTAINER_RADIUS = 10
+CELL_PADDING_X, CELL_PADDING_Y = 15, 12
+LINE_HEIGHT = 1.2
+
+TEAM_NAME_SIZE = 44.8   # 2.8em
+INNING_TITLE_SIZE = 22.4  # 1.4em
+TABLE_SIZE = 17.6       # 1.1em
+SUMMARY_SIZE = 21.12    # 1.2em of the table font
+
+# Column widths as fractions of the table width
+COLUMNS = [0.30, 0.35, 0.07, 0.07, 0.07, 0.07, 0.07]
+HEADINGS = ["BATSMAN", "DISMISSAL", "R", "B", "4S", "6S", "SR"]
+
+
+def blend(color, alpha, background):
+    """Composite an RGB colour with the given opacity over a background colour."""
+    return tuple(round(c * alpha + b * (1 - alpha)) for c, b in zip(color, background))
+
+
+CONTAINER_BACKGROUND = blend((0, 0, 0), 0.85, PAGE_BACKGROUND)
+HEADER_BACKGROUND = blend(GREEN, 0.1, CONTAINER_BACKGROUND)
+SUMMARY_BACKGROUND = blend(GREEN, 0.15, CONTAINER_BACKGROUND)
+ROW_BORDER = blend(WHITE, 0.1, CONTAINER_BACKGROUND)
+
+
+@lru_cache(maxsize=None)
+def get_font(style, size):
+    """
+    Load a font by style ("regular", "bold" or "italic") and pixel size.
+
+    Returns:
+        ImageFont instance (Pillow's built-in font if no TrueType font is found)
+    """
+    size = round(size)
+    override = os.getenv("SCOREBOARD_FONT")
+    candidates = [override] if override else []
+    candidates += FONT_CANDIDATES[style] + FONT_CANDIDATES["regular"]
+    for name in candidates:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def line_height(size):
+    return round(size * LINE_HEIGHT)
+
+
+def draw_text(draw, xy, text, font, fill, anchor="lm", spacing=0):
+    """Draw text, optionally with CSS-style letter spacing."""
+    if not spacing:
+        draw.text(xy, text, font=font, fill=fill, anchor=anchor)
+        return
+    width = sum(font.getlength(ch) for ch in text) + spacing * (len(text) - 1)
+    x, y = xy
+    if anchor[0] == "m":
+        x -= width / 2
+    elif anchor[0] == "r":
+        x -= width
+    for ch in text:
+        draw.text((x, y), ch, font=font, fill=fill, anchor="l" + anchor[1])
+        x += font.getlength(ch) + spacing
+
+
+def _dismissal_text(player):
+    text = player.get('dismissal_status') or 'not out'
+    bowler = player.get('dismissal_bowler')
+    if bowler and str(bowler).strip():
+        text += ' ' + str(bowler)
+    return text
+
+
+def _text(value):
+    # Like JS string conversion: whole-number floats have no ".0" (125.0 -> "125")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _cell(value):
+    # Mirror the template's `value || 0`
+    return _text(value) if value not in (None, '', 0) else '0'
+
+
+GLOW_MARGIN = 30
+
+
+@lru_cache(maxsize=32)
+def _glow(container_width, container_height):
+    # Only the area around the panel is blurred, and the result is reused for
+    # every scoreboard with the same number of rows
+    glow = Image.new("RGBA", (container_width + 2 * GLOW_MARGIN, container_height + 2 * GLOW_MARGIN), (0, 0, 0, 0))
+    ImageDraw.Draw(glow).rounded_rectangle(
+        (GLOW_MARGIN, GLOW_MARGIN, GLOW_MARGIN + container_width, GLOW_MARGIN + container_height),
+        CONTAINER_RADIUS, fill=GREEN + (102,)
+    )
+    return glow.filter(ImageFilter.GaussianBlur(10))
+
+
+def render_scoreboard(scoreboard_data, width=WIDTH, height=HEIGHT):
+    """
+    Draw a scoreboard.
+
+    Args:
+        scoreboard_data: Scoreboard dictionary from extract_scoreboard_data()
+        width, height: Page size; the page grows taller if the scoreboard
+            does not fit, like the browser's full-page screenshot
+
+    Returns:
+        RGB PIL Image
+    """
+    entries = scoreboard_data.get('batting_entries') or []
+    extras = scoreboard_data.get('extras') or {}
+
+    row_height = line_height(TABLE_SIZE) + 2 * CELL_PADDING_Y + 1
+    summary_height = line_height(SUMMARY_SIZE) + 2 * CELL_PADDING_Y + 2
+    header_height = (line_height(TEAM_NAME_SIZE) + 5 + line_height(INNING_TITLE_SIZE) + 15 + 25)
+    table_height = row_height * (1 + len(entries)) + summary_height * 2
+    container_height = CONTAINER_PADDING * 2 + header_height + table_height + 20
+
+    container_width = min(CONTAINER_WIDTH, round(width * 0.9))
+    height = max(height, container_height)
+    left = (width - container_width) // 2
+    top = (height - container_height) // 2
+    right, bottom = left + container_width, top + container_height
+
+    image = Image.new("RGB", (width, height), PAGE_BACKGROUND)
+
+    # Green glow (box-shadow: 0 0 20px rgba(0, 255, 0, 0.4))
+    glow = _glow(container_width, container_height)
+    image.paste(glow, (left - GLOW_MARGIN, top - GLOW_MARGIN), glow)
+
+    draw = ImageDraw.Draw(image)
+    draw.rounded_rectangle((left, top, right, bottom), CONTAINER_RADIUS, fill=CONTAINER_BACKGROUND)
+
+    # Header
+    center_x = width / 2
+    y = top + CONTAINER_PADDING
+    draw_text(draw, (center_x, y + line_height(TEAM_NAME_SIZE) / 2), scoreboard_data.get('name') or "Unknown Team",
+              get_font("bold", TEAM_NAME_SIZE), GREEN, anchor="mm", spacing=1.5)
+    y += line_height(TEAM_NAME_SIZE) + 5
+    draw_text(draw, (center_x, y + line_height(INNING_TITLE_SIZE) / 2), "(20 ovs maximum)",
+              get_font("regular", INNING_TITLE_SIZE), MID_GREY, anchor="mm")
+    y += line_height(INNING_TITLE_SIZE) + 15 + 25
+
+    # Column edges
+    table_left = left + CONTAINER_PADDING
+    table_width = container_width - 2 * CONTAINER_PADDING
+    edges = [table_left]
+    for fraction in COLUMNS:
+        edges.append(edges[-1] + fraction * table_width)
+    table_right = edges[-1]
+
+    def span(first, last):
+        return edges[first], edges[last + 1]
+
+    def cell_text(first, last, row_mid, text, font, fill, align="left", spacing=0):
+        x0, x1 = span(first, last)
+        if align == "center":
+            draw_text(draw, ((x0 + x1) / 2, row_mid), text, font, fill, anchor="mm", spacing=spacing)
+        elif align == "right":
+            draw_text(draw, (x1 - CELL_PADDING_X, row_mid), text, font, fill, anchor="rm", spacing=spacing)
+        else:
+            draw_text(draw, (x0 + CELL_PADDING_X, row_mid), text, font, fill, anchor="lm", spacing=spacing)
+
+    # Table heading
+    heading_font = get_font("bold", TABLE_SIZE)
+    draw.rectangle((table_left, y, table_right, y + row_height - 1), fill=HEADER_BACKGROUND)
+    draw.line((table_left, y + row_height - 1, table_right, y + row_height - 1), fill=ROW_BORDER)
+    for column, heading in enumerate(HEADINGS):
+        cell_text(column, column, y + row_height / 2, heading, heading_font, GREEN,
+                  align="left" if column < 2 else "center", spacing=0.5)
+    y += row_height
+
+    # Batting rows
+    player_font = get_font("bold", TABLE_SIZE)
+    dismissal_font = get_font("italic", TABLE_SIZE)
+    stat_font = get_font("regular", TABLE_SIZE)
+    for player in entries:
+        mid = y + row_height / 2
+        cell_text(0, 0, mid, str(player.get('player') or ''), player_font, LIGHT_GREY)
+        cell_text(1, 1, mid, _dismissal_text(player), dismissal_font, DARK_GREY)
+        cell_text(2, 2, mid, _cell(player.get('runs')), player_font, GREEN, align="center")
+        for column, key in enumerate(('balls', 'fours', 'sixes', 'strike_rate'), 3):
+            cell_text(column, column, mid, _cell(player.get(key)), stat_font, WHITE, align="center")
+        draw.line((table_left, y + row_height - 1, table_right, y + row_height - 1), fill=ROW_BORDER)
+        y += row_height
+
+    # Extras and totals rows
+    summary_font = get_font("bold", SUMMARY_SIZE)
+    for row in ("extras", "totals"):
+        draw.rectangle((table_left, y, table_right, y + summary_height - 1), fill=SUMMARY_BACKGROUND)
+        draw.rectangle((table_left, y, table_right, y + 1), fill=GREEN)
+        mid = y + 2 + (summary_height - 2) / 2
+        if row == "extras":
+            cell_text(0, 1, mid, str(extras.get('label') or 'Extras'), summary_font, GREEN)
+            cell_text(2, 6, mid, _cell(extras.get('value')), summary_font, LIGHT_GREY, align="center")
+        else:
+            cell_text(0, 1, mid, "TOTAL", summary_font, GREEN, align="right")
+            cell_text(2, 4, mid, _text(scoreboard_data.get('total_score') or '0'), summary_font, GREEN, align="center")
+            cell_text(5, 6, mid, f"({_text(scoreboard_data.get('overs') or '0')} ov)", summary_font, GREEN, align="center")
+        y += summary_height
+
+    return image
+
+
+def save_scoreboard_image(scoreboard_data, output_path):
+    """
+    Draw a scoreboard and save it as a PNG.
+
+    The image is written to a unique temporary file first, so a failed render
+    never leaves a partial PNG at output_path.
+
+    Args:
+        scoreboard_data: Scoreboard dictionary from extract_scoreboard_data()
+        output_path: Path where the PNG image should be saved
+    """
+    with atomic_output(output_path) as temp_output_path:
+        render_scoreboard(scoreboard_data).save(temp_output_path, "PNG", compress_level=1)
+
+
+def render_scoreboard_frame(scoreboard_data, width=WIDTH, height=HEIGHT):
+    """
+    Draw a scoreboard as a raw video frame.
+
+    Returns:
+        rgb24 pixel bytes (for ffmpeg -f rawvideo -pix_fmt rgb24); the frame
+        is exactly width x height, cropped if the scoreboard is taller
+    """
+    image = render_scoreboard(scoreboard_data, width, height)
+    if image.height != height:
+        offset = (image.height - height) // 2
+        image = image.crop((0, offset, width, offset + height))
+    return image.tobytes()
@@ -0,0 +1,177 @@
+"""
+Job Queue - Bounded worker pool for highlight generation jobs
+
+Jobs are kept in a priority FIFO queue (lower priority number runs first,
+equal priorities run in submission order) and executed by a fixed number
+of worker threads. When the queue is full, submit() raises QueueFullError
+so the caller can push back on the client instead of starting yet another
+pipeline.
+
+Each gunicorn worker process has its own scheduler, so the total number of
+concurrent pipelines is MAX_CONCURRENT_JOBS x the number of gunicorn workers.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+import traceback
+
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+PRIORITIES = {
+    "high": PRIORITY_HIGH,
+    "normal": PRIORITY_NORMAL,
+    "low": PRIORITY_LOW,
+}
+
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "20"))
+
+# Used for Retry-After until a job has actually finished
+DEFAULT_JOB_SECONDS = 300
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """Fixed-size worker pool fed by a bounded priority FIFO queue."""
+
+    def __init__(self, workers=MAX_CONCURRENT_JOBS, max_queued=MAX_QUEUED_JOBS):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self._heap = []     # (priority, sequence, job_id)
+        self._jobs = {}     # job_id -> (target, args, kwargs) for queued jobs
+        self._running = set()
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._avg_job_seconds = None
+        self._workers_pid = None
+
+    def _ensure_workers(self):
+        # Threads do not survive fork(), so workers are started lazily in the
+        # process that actually submits jobs (gunicorn --preload imports the
+        # app in the master before forking)
+        if self._workers_pid == os.getpid():
+            return
+        self._workers_pid = os.getpid()
+        self._running.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i + 1}", daemon=True)
+            thread.start()
+
+    def submit(self, job_id, target, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """
+        Queue a job for execution.
+
+        Submitting a job_id that is already queued or running does not queue
+        it again (single-flight); the existing job's position is returned.
+
+        Args:
+            job_id: Unique job identifier
+            target: Callable to run on a worker thread
+            *args, **kwargs: Arguments for target
+            priority: Lower numbers run first (default: PRIORITY_NORMAL)
+
+        Returns:
+            1-based position of the job in the queue, or None if it is
+            already running
+
+        Raises:
+            QueueFullError: If max_queued jobs are already waiting
+        """
+        with self._cond:
+            self._ensure_workers()
+            if job_id in self._jobs or job_id in self._running:
+                return self._position_locked(job_id)
+
+            if len(self._jobs) >= self.max_queued:
+                raise QueueFullError(self._retry_after_locked())
+
+            self._jobs[job_id] = (target, args, kwargs)
+            heapq.heappush(self._heap, (priority, next(self._sequence), job_id))
+            self._cond.notify()
+            return self._position_locked(job_id)
+
+    def position(self, job_id):
+        """Get the 1-based queue position of a job, or None if it is not waiting."""
+        with self._cond:
+            return self._position_locked(job_id)
+
+    def is_active(self, job_id):
+        """Check whether a job is queued or currently executing."""
+        with self._cond:
+            return job_id in self._jobs or job_id in self._running
+
+    def is_running(self, job_id):
+        """Check whether a job is currently executing on a worker."""
+        with self._cond:
+            return job_id in self._running
+
+    def retry_after(self):
+        """Estimate how many seconds until a queue slot frees up."""
+        with self._cond:
+            return self._retry_after_locked()
+
+    def stats(self):
+        """Get a snapshot of the scheduler state."""
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "running": len(self._running),
+                "queued": len(self._jobs),
+                "max_queued": self.max_queued,
+            }
+
+    def _position_locked(self, job_id):
+        if job_id not in self._jobs:
+            return None
+        ordered = sorted(entry for entry in self._heap if entry[2] in self._jobs)
+        for position, entry in enumerate(ordered, 1):
+            if entry[2] == job_id:
+                return position
+        return None
+
+    def _retry_after_locked(self):
+        job_seconds = self._avg_job_seconds or DEFAULT_JOB_SECONDS
+        # A slot frees up when one of the running jobs finishes
+        return max(1, int(job_seconds / self.workers))
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs.pop(job_id, None)
+                if job is None:
+                    continue
+                self._running.add(job_id)
+
+            target, args, kwargs = job
+            start_time = time.time()
+            print(f"[QUEUE] Starting job {job_id} on {threading.current_thread().name}")
+            try:
+                target(*args, **kwargs)
+            except Exception as e:
+                print(f"[QUEUE] Job {job_id} raised: {e}")
+                traceback.print_exc()
+            finally:
+                elapsed = time.time() - start_time
+                with self._cond:
+                    self._running.discard(job_id)
+                    if self._avg_job_seconds is None:
+                        self._avg_job_seconds = elapsed
+                    else:
+                        # Exponential moving average of job durations
+                        self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+                print(f"[QUEUE] Finished job {job_id} in {elapsed:.1f}s")
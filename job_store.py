@@ -0,0 +1,423 @@
+"""
+Job Store - Pluggable storage for highlight generation job status
+
+Backends:
+    MemoryJobStore  - in-process dict (single worker, development)
+    SQLiteJobStore  - SQLite database in WAL mode, shared by every gunicorn
+                      worker on the host and kept across restarts
+
+Select the backend with JOB_STORE=memory|sqlite (default: sqlite) and the
+database location with JOB_STORE_PATH (default: commentaries/jobs.db, which
+lives on the persistent disk in render.yaml).
+
+Each job is a JSON-serialisable dictionary. Every record carries the
+"owner" process that is executing it, so a restarted server can tell which
+unfinished jobs were orphaned by a crash and resume them, and a "version"
+that is bumped on every write, so wait_for_change() can push updates to
+listeners (the /api/events stream) as they happen.
+
+Stores written by other processes (SQLite) are watched by one thread per
+process, which reads every watched job in a single query each
+poll_interval and wakes the listeners whose job changed, so the number of
+open streams does not multiply the database reads.
+"""
+import json
+import os
+import socket
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+
+
+TERMINAL_STATUSES = ("complete", "error")
+
+JOB_STORE = os.getenv("JOB_STORE", "sqlite").lower()
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "commentaries/jobs.db")
+
+_process_tokens = {}  # pid -> start token, so a forked worker gets its own
+
+
+def process_id():
+    """
+    Identify the current process as 'hostname:pid:token'.
+
+    The token tells a restarted server apart from a crashed one that happened
+    to have the same PID (common in containers).
+    """
+    pid = os.getpid()
+    token = _process_tokens.setdefault(pid, f"{time.time():.6f}")
+    return f"{socket.gethostname()}:{pid}:{token}"
+
+
+def owner_alive(owner):
+    """
+    Check whether the process that owns a job is still running.
+
+    Owners on other hosts cannot be checked and are assumed to be alive.
+    """
+    if not owner:
+        return False
+    try:
+        host, pid, _ = owner.rsplit(":", 2)
+        pid = int(pid)
+    except ValueError:
+        return False
+    if host != socket.gethostname():
+        return True
+    if pid == os.getpid():
+        return owner == process_id()
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_active(job):
+    """Check whether a job is unfinished and its owner is still running it."""
+    return (job is not None and job.get("status") not in TERMINAL_STATUSES
+            and owner_alive(job.get("owner")))
+
+
+class JobStore(ABC):
+    """Interface shared by the job store backends."""
+
+    # How often wait_for_change() re-reads the store to see writes made by
+    # other processes (None: all writes happen in this process)
+    poll_interval = None
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._watched = {}   # job_id -> number of waiting listeners
+        self._latest = {}    # job_id -> record last read by the watcher thread
+        self._watcher = None
+        self._watcher_pid = None
+
+    def _notify(self, job_id=None, job=None):
+        with self._changed:
+            if job_id in self._watched:
+                self._latest[job_id] = dict(job) if job is not None else None
+            self._changed.notify_all()
+
+    def _start_watcher(self):
+        # Called with self._changed held; a forked worker starts its own thread
+        if self._watcher is not None and self._watcher_pid == os.getpid():
+            return
+        self._watcher_pid = os.getpid()
+        self._watcher = threading.Thread(target=self._watch, name="job-store-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while True:
+            with self._changed:
+                job_ids = list(self._watched)
+                if not job_ids:
+                    self._watcher = None
+                    return
+            try:
+                jobs = self.get_many(job_ids)
+            except Exception as e:
+                print(f"[JOB STORE] Could not read watched jobs: {e}")
+                jobs = None
+            if jobs is not None:
+                with self._changed:
+                    changed = False
+                    for job_id in job_ids:
+                        job = jobs.get(job_id)
+                        previous = self._latest.get(job_id)
+                        if (job or {}).get("version") != (previous or {}).get("version"):
+                            changed = True
+                        self._latest[job_id] = job
+                    if changed:
+                        self._changed.notify_all()
+            time.sleep(self.poll_interval)
+
+    def wait_for_change(self, job_id, version, timeout):
+        """
+        Block until a job's version differs from version, or timeout expires.
+
+        Args:
+            job_id: Job to watch
+            version: Last version the caller has seen
+            timeout: Maximum seconds to wait
+
+        Returns:
+            The current job record (unchanged if the wait timed out), or None
+            if the job does not exist
+        """
+        deadline = time.time() + timeout
+        if self.poll_interval is None:
+            with self._changed:
+                while True:
+                    job = self.get(job_id)
+                    if job is None or job.get("version") != version:
+                        return job
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return job
+                    self._changed.wait(remaining)
+
+        # Other processes write too: wait on the records read by the watcher thread
+        with self._changed:
+            if job_id not in self._latest:
+                self._latest[job_id] = self.get(job_id)
+            self._watched[job_id] = self._watched.get(job_id, 0) + 1
+            self._start_watcher()
+            try:
+                while True:
+                    job = self._latest.get(job_id)
+                    if job is None or job.get("version") != version:
+                        return dict(job) if job is not None else None
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return dict(job)
+                    self._changed.wait(remaining)
+            finally:
+                self._watched[job_id] -= 1
+                if not self._watched[job_id]:
+                    del self._watched[job_id]
+                    self._latest.pop(job_id, None)
+
+    @abstractmethod
+    def get(self, job_id):
+        """Get a copy of a job record, or None if it does not exist."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create(self, job_id, fields):
+        """Create (or replace) a job record."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, job_id, **fields):
+        """Merge fields into an existing job record and return the new record."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, job_id):
+        """Remove a job record."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def jobs(self):
+        """Get copies of all job records as a {job_id: record} dictionary."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, job_id, owner, can_claim, record=None):
+        """
+        Atomically take ownership of a job.
+
+        Args:
+            job_id: Job to claim
+            owner: New owner (see process_id())
+            can_claim: Callable receiving the current record; ownership is
+                only taken if it returns True
+            record: Optional callable receiving the current record (None if
+                there is none) and returning a new record to start the job
+                with; a job without a record can then be claimed too
+
+        Returns:
+            The updated record, or None if the job could not be claimed
+        """
+        raise NotImplementedError
+
+    def get_many(self, job_ids):
+        """Get copies of several job records as {job_id: record or None}."""
+        return {job_id: self.get(job_id) for job_id in job_ids}
+
+    def unfinished(self):
+        """Get all jobs that have not reached a terminal status."""
+        return {job_id: job for job_id, job in self.jobs().items()
+                if job.get("status") not in TERMINAL_STATUSES}
+
+    def __contains__(self, job_id):
+        return self.get(job_id) is not None
+
+
+class MemoryJobStore(JobStore):
+    """Job store kept in a dictionary of the current process."""
+
+    def __init__(self):
+        super().__init__()
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def create(self, job_id, fields):
+        with self._lock:
+            previous = self._jobs.get(job_id) or {}
+            self._jobs[job_id] = dict(fields, updated_at=time.time(), version=previous.get("version", 0) + 1)
+        self._notify()
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.setdefault(job_id, {})
+            job.update(fields, updated_at=time.time(), version=job.get("version", 0) + 1)
+            job = dict(job)
+        self._notify()
+        return job
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        self._notify()
+
+    def jobs(self):
+        with self._lock:
+            return {job_id: dict(job) for job_id, job in self._jobs.items()}
+
+    def claim(self, job_id, owner, can_claim, record=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if (job is None and record is None) or (job is not None and not can_claim(dict(job))):
+                return None
+            version = (job or {}).get("version", 0)
+            if record is not None:
+                job = self._jobs[job_id] = dict(record(dict(job) if job is not None else None))
+            job.update(owner=owner, updated_at=time.time(), version=version + 1)
+            job = dict(job)
+        self._notify()
+        return job
+
+
+class SQLiteJobStore(JobStore):
+    """Job store in a SQLite database (WAL mode), shared across processes."""
+
+    poll_interval = 0.5
+
+    def __init__(self, path=JOB_STORE_PATH):
+        super().__init__()
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " status TEXT,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _read(self, conn, job_id):
+        row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, conn, job_id, job, version):
+        job["updated_at"] = time.time()
+        job["version"] = version + 1
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+            (job_id, job.get("status"), json.dumps(job), job["updated_at"])
+        )
+
+    def _transaction(self, job_id, change):
+        # BEGIN IMMEDIATE takes the write lock up front, so the
+        # read-modify-write below is atomic across processes
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = change(conn, self._read(conn, job_id))
+            # Hand the new record straight to this process's listeners
+            watched = job_id in self._watched
+            job = self._read(conn, job_id) if watched else None
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._notify(job_id if watched else None, job)
+        return result
+
+    def get(self, job_id):
+        return self._read(self._conn(), job_id)
+
+    def create(self, job_id, fields):
+        def change(conn, job):
+            self._write(conn, job_id, dict(fields), (job or {}).get("version", 0))
+        self._transaction(job_id, change)
+
+    def update(self, job_id, **fields):
+        def change(conn, job):
+            job = job or {}
+            job.update(fields)
+            self._write(conn, job_id, job, job.get("version", 0))
+            return job
+        return self._transaction(job_id, change)
+
+    def delete(self, job_id):
+        self._conn().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        self._notify(job_id, None)
+
+    def jobs(self):
+        rows = self._conn().execute("SELECT job_id, data FROM jobs").fetchall()
+        return {job_id: json.loads(data) for job_id, data in rows}
+
+    def get_many(self, job_ids):
+        job_ids = list(job_ids)
+        placeholders = ", ".join("?" for _ in job_ids)
+        rows = self._conn().execute(
+            f"SELECT job_id, data FROM jobs WHERE job_id IN ({placeholders})", job_ids
+        ).fetchall() if job_ids else []
+        found = {job_id: json.loads(data) for job_id, data in rows}
+        return {job_id: found.get(job_id) for job_id in job_ids}
+
+    def unfinished(self):
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        rows = self._conn().execute(
+            f"SELECT job_id, data FROM jobs WHERE status IS NULL OR status NOT IN ({placeholders})",
+            TERMINAL_STATUSES
+        ).fetchall()
+        return {job_id: json.loads(data) for job_id, data in rows}
+
+    def claim(self, job_id, owner, can_claim, record=None):
+        def change(conn, job):
+            if (job is None and record is None) or (job is not None and not can_claim(dict(job))):
+                return None
+            version = (job or {}).get("version", 0)
+            if record is not None:
+                job = dict(record(dict(job) if job is not None else None))
+            job["owner"] = owner
+            self._write(conn, job_id, job, version)
+            return job
+        return self._transaction(job_id, change)
+
+
+def create_job_store(backend=JOB_STORE, path=JOB_STORE_PATH):
+    """
+    Create the configured job store backend.
+
+    Args:
+        backend: "memory" or "sqlite"
+        path: Database path for the SQLite backend
+
+    Returns:
+        JobStore instance
+    """
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend == "sqlite":
+        return SQLiteJobStore(path)
+    raise ValueError(f"Unknown JOB_STORE backend: {backend}")
@@ -0,0 +1,157 @@
+"""
+Match Catalog - Process-wide cache of IPL season data
+
+Each data/ipl_<year>.json season file is parsed once and kept in memory.
+Every lookup compares the file's mtime with the one recorded at parse time,
+so editing a season file on disk is picked up on the next request without a
+restart.
+
+If a precompiled season index (see season_index.py) is present and still
+matches a season's JSON file, the season is served straight from the
+mmap'd index and no JSON is parsed at all.
+
+When gunicorn runs with --preload, preload() is called in the master before
+the workers fork, and all workers share the parsed seasons copy-on-write
+instead of each parsing its own copy.
+"""
+import glob
+import json
+import os
+import threading
+from season_index import load_season_index
+
+
+DATA_DIR = "data"
+OUTPUT_DIR = "commentaries"
+
+
+def match_folder_path(year, match_number, match, output_dir=OUTPUT_DIR):
+    """
+    Get the folder a match's generated files are written to.
+
+    Args:
+        year: Season year
+        match_number: 1-based match number
+        match: Match dictionary (for the team names)
+        output_dir: Root output folder (default: commentaries)
+
+    Returns:
+        Path like commentaries/<year>/match_<number>_<TEAM1>_vs_<TEAM2>
+    """
+    team_names = "_vs_".join(match.get('teams', ['Unknown', 'Unknown']))
+    # "01" and 1 are the same match (see MatchCatalog.get_match())
+    return f"{output_dir}/{year}/match_{int(match_number)}_{team_names}"
+
+
+class MatchCatalog:
+    """Thread-safe, mtime-validated cache of season match lists."""
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self._seasons = {}  # year -> (mtime_ns or None when served from the index, matches)
+        self._lock = threading.Lock()
+
+    def _season_path(self, year):
+        return os.path.join(self.data_dir, f"ipl_{year}.json")
+
+    def _season_index(self):
+        return load_season_index(os.path.join(self.data_dir, "seasons.idx"))
+
+    def get_matches(self, year):
+        """
+        Get all matches for a season.
+
+        The returned list is shared between callers and must not be modified.
+
+        Args:
+            year: Season year (str or int)
+
+        Returns:
+            List of match dictionaries, or an empty list if the season is
+            missing or its file cannot be parsed
+        """
+        year = str(year).strip()
+        path = self._season_path(year)
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if mtime is None:
+            # The index may be deployed without the JSON source files
+            cached = self._seasons.get(year)
+            if cached and cached[0] is None:
+                return cached[1]
+            index = self._season_index()
+            matches = index.matches(year) if index else None
+            if matches is None:
+                self._seasons.pop(year, None)
+                return []
+            self._seasons[year] = (None, matches)
+            return matches
+
+        cached = self._seasons.get(year)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with self._lock:
+            # Another thread may have reloaded the season while we waited
+            cached = self._seasons.get(year)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+            index = self._season_index()
+            if index and index.is_fresh(year):
+                self._seasons[year] = (mtime, index.matches(year))
+                return self._seasons[year][1]
+
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    matches = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[CATALOG] Could not load {path}: {e}")
+                matches = []
+
+            # Cache failures too, so a broken file is not re-parsed on every hit
+            self._seasons[year] = (mtime, matches)
+            print(f"[CATALOG] Loaded {len(matches)} matches for IPL {year}")
+            return matches
+
+    def get_match(self, year, match_number):
+        """
+        Get a single match by its 1-based number within a season.
+
+        Args:
+            year: Season year (str or int)
+            match_number: 1-based match number
+
+        Returns:
+            Match dictionary, or None if it does not exist
+        """
+        matches = self.get_matches(year)
+        try:
+            match_number = int(match_number)
+        except (TypeError, ValueError):
+            return None
+        if 1 <= match_number <= len(matches):
+            return matches[match_number - 1]
+        return None
+
+    def available_years(self):
+        """Get sorted list of season years present in the data folder or index."""
+        index = self._season_index()
+        years = set(index.years()) if index else set()
+        for file in glob.glob(os.path.join(self.data_dir, "ipl_*.json")):
+            year = os.path.basename(file).split('_')[1].split('.')[0]
+            years.add(year)
+        return sorted(years)
+
+    def preload(self):
+        """Parse every available season up front."""
+        for year in self.available_years():
+            self.get_matches(year)
+
+
+# Shared instance used by the web app
+catalog = MatchCatalog()
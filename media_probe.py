@@ -0,0 +1,187 @@
+"""
+Media Probe - Cached ffprobe metadata for media files
+
+Every lookup used to start an ffprobe process. probe() runs ffprobe once per
+file version and keeps the result (duration, resolution, frame rate and the
+stream list) keyed by the file's path, size and modification time, so a
+changed file is probed again and an unchanged one never is.
+
+Results are kept in memory and in a SQLite database shared by every process
+(the web app's gunicorn workers, the combiner and batch scripts), so they
+survive restarts.
+
+Settings:
+    PROBE_CACHE_PATH  - Database file (default: commentaries/probe_cache.db,
+                        empty to keep the cache in memory only)
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+
+
+PROBE_CACHE_PATH = os.getenv("PROBE_CACHE_PATH", "commentaries/probe_cache.db")
+
+
+def run_ffprobe(path):
+    """
+    Read a media file's format and streams with ffprobe.
+
+    Returns:
+        Metadata dictionary:
+            duration  - seconds (0.0 if unknown)
+            width, height, fps - of the first video stream (None without video)
+            streams   - list of {index, type, codec, ...} per stream
+
+    Raises:
+        RuntimeError: If ffprobe is not installed (kept apart from a missing
+            media file, which callers treat as empty)
+    """
+    cmd = [
+        'ffprobe', '-v', 'error', '-show_entries',
+        'format=duration:stream=index,codec_type,codec_name,width,height,avg_frame_rate,sample_rate,channels',
+        '-of', 'json', str(path)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffprobe not found; install ffmpeg and make sure ffprobe is on PATH")
+    try:
+        data = json.loads(result.stdout or "{}")
+    except json.JSONDecodeError:
+        data = {}
+
+    streams = []
+    for stream in data.get("streams", []):
+        entry = {"index": stream.get("index"), "type": stream.get("codec_type"), "codec": stream.get("codec_name")}
+        for key in ("width", "height", "channels"):
+            if key in stream:
+                entry[key] = stream[key]
+        if "sample_rate" in stream:
+            entry["sample_rate"] = int(stream["sample_rate"])
+        if stream.get("codec_type") == "video":
+            entry["fps"] = _frame_rate(stream.get("avg_frame_rate"))
+        streams.append(entry)
+
+    try:
+        duration = float(data.get("format", {}).get("duration", 0.0))
+    except (TypeError, ValueError):
+        duration = 0.0
+    video = next((s for s in streams if s["type"] == "video"), {})
+    return {
+        "duration": duration,
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": video.get("fps"),
+        "streams": streams,
+    }
+
+
+def _frame_rate(rate):
+    # ffprobe reports rates as fractions such as "25/1" or "30000/1001"
+    try:
+        numerator, denominator = (rate or "0/0").split("/")
+        return round(int(numerator) / int(denominator), 3) if int(denominator) else None
+    except ValueError:
+        return None
+
+
+class ProbeCache:
+    """ffprobe results keyed by (path, size, mtime), in memory and optionally in SQLite."""
+
+    def __init__(self, path=PROBE_CACHE_PATH):
+        self.path = path
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = self._conn()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS probes ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork (like SQLiteJobStore)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def probe(self, path):
+        """
+        Get a media file's metadata (see run_ffprobe()), probing it only if
+        it is new or has changed.
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+            RuntimeError: If ffprobe is not installed
+        """
+        path = os.path.abspath(str(path))
+        stat = os.stat(path)
+        version = (stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            cached = self._memory.get(path)
+        if cached and cached[0] == version:
+            return dict(cached[1])
+
+        info = None
+        if self.path:
+            row = self._conn().execute(
+                "SELECT size, mtime_ns, data FROM probes WHERE path = ?", (path,)
+            ).fetchone()
+            if row and (row[0], row[1]) == version:
+                info = json.loads(row[2])
+
+        if info is None:
+            info = run_ffprobe(path)
+            if self.path and info["streams"]:
+                # Unreadable files (e.g. still being written) are not cached
+                self._conn().execute(
+                    "INSERT OR REPLACE INTO probes (path, size, mtime_ns, data) VALUES (?, ?, ?, ?)",
+                    (path, version[0], version[1], json.dumps(info))
+                )
+
+        with self._lock:
+            self._memory[path] = (version, info)
+        return dict(info)
+
+
+# Shared instance used by video_combining, stream_packaging and the web app
+probe_cache = ProbeCache()
+
+
+def probe(path):
+    """Get a media file's cached metadata (see ProbeCache.probe())."""
+    return probe_cache.probe(path)
+
+
+def get_duration(path):
+    """Get the duration of a media file in seconds (0.0 if it is missing or unreadable)."""
+    try:
+        return probe(path)["duration"]
+    except FileNotFoundError:
+        return 0.0
+
+
+def get_video_size(path):
+    """Get (width, height) of a media file's first video stream, or None."""
+    try:
+        info = probe(path)
+    except FileNotFoundError:
+        return None
+    if not info["width"] or not info["height"]:
+        return None
+    return info["width"], info["height"]
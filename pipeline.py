@@ -0,0 +1,288 @@
+"""
+Pipeline - Run a graph of stages, starting independent stages concurrently
+
+A pipeline is a set of stages that declare the named values they need
+(inputs) and the ones they make (outputs). The graph is taken from those
+declarations: a stage starts as soon as every input is available, either
+given when the pipeline is run or made by another stage, so stages that do
+not depend on each other run at the same time on a thread pool.
+
+Each stage can be retried with exponential backoff, and is timed. A stage
+marked optional may fail without failing the pipeline; its outputs are then
+None and the stages that need them still run.
+
+A stage may also name the resource it uses (an external API, or "cpu" for
+local rendering). Every pipeline in the process shares one limit per
+resource, so many pipelines running at once (a batch of matches, or several
+web app jobs) never call one API more often than it allows, while stages
+using other resources carry on.
+
+Settings:
+    PIPELINE_MAX_WORKERS   - Stages run at the same time per pipeline (default: 4)
+    PIPELINE_RETRY_DELAY   - Seconds before the first retry of a stage, doubled
+                             for every further retry (default: 2)
+    PIPELINE_LIMITS        - Stages run at the same time per resource, across
+                             all pipelines, e.g. "gemini=4,heygen=2,cpu=2"
+                             (default: empty, no limits)
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+PIPELINE_RETRY_DELAY = float(os.getenv("PIPELINE_RETRY_DELAY", "2"))
+
+
+def parse_limits(text):
+    """
+    Parse resource limits written as "name=N,name=N".
+
+    Raises:
+        ValueError: If an entry is not name=N with N >= 1
+    """
+    limits = {}
+    for entry in (text or "").split(","):
+        if not entry.strip():
+            continue
+        name, _, value = entry.partition("=")
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if not name.strip() or limit < 1:
+            raise ValueError(f"Invalid resource limit: {entry.strip()} (expected name=N with N >= 1)")
+        limits[name.strip()] = limit
+    return limits
+
+
+PIPELINE_LIMITS = parse_limits(os.getenv("PIPELINE_LIMITS", ""))
+
+# One semaphore per limited resource, shared by every pipeline in the process
+_resource_slots = {}
+_resource_limits = {}
+_resource_lock = threading.Lock()
+
+
+def set_resource_limit(resource, limit):
+    """
+    Limit how many stages using a resource run at the same time, across all pipelines.
+
+    Stages already holding a slot keep it; the new limit applies to stages
+    that start afterwards.
+
+    Args:
+        resource: Resource name (see Stage)
+        limit: Stages at the same time, or None for no limit
+    """
+    with _resource_lock:
+        if limit is None:
+            _resource_slots.pop(resource, None)
+            _resource_limits.pop(resource, None)
+        else:
+            _resource_slots[resource] = threading.BoundedSemaphore(limit)
+            _resource_limits[resource] = limit
+
+
+def resource_limits():
+    """Get {resource: limit} for every limited resource."""
+    with _resource_lock:
+        return dict(_resource_limits)
+
+
+def resource_slot(resource):
+    """Get a context manager holding one of a resource's slots (a no-op if it is not limited)."""
+    with _resource_lock:
+        slots = _resource_slots.get(resource)
+    return slots or nullcontext()
+
+
+for _resource, _limit in PIPELINE_LIMITS.items():
+    set_resource_limit(_resource, _limit)
+
+
+class Stage:
+    """One step of a pipeline: a function from named inputs to named outputs."""
+
+    def __init__(self, name, run, inputs=(), outputs=(), retries=0, retry_delay=None, optional=False,
+                 resource=None):
+        """
+        Args:
+            name: Stage name (unique in its pipeline)
+            run: Function called with {input name: value}, returning
+                {output name: value} for every declared output (or None if
+                there are no outputs)
+            inputs: Names of the values the stage needs
+            outputs: Names of the values the stage makes
+            retries: Extra attempts after a failure
+            retry_delay: Seconds before the first retry (default: PIPELINE_RETRY_DELAY)
+            optional: If True, a failure sets the outputs to None instead of
+                failing the pipeline
+            resource: Name of the limited resource the stage uses (see
+                set_resource_limit()); each attempt waits for a free slot
+        """
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.retries = retries
+        self.retry_delay = PIPELINE_RETRY_DELAY if retry_delay is None else retry_delay
+        self.optional = optional
+        self.resource = resource
+
+
+class Pipeline:
+    """A validated graph of stages."""
+
+    def __init__(self, stages, provided=()):
+        """
+        Args:
+            stages: List of Stage
+            provided: Names of the values given to run() instead of made by a stage
+
+        Raises:
+            ValueError: If a name is made twice, an input is never made, or
+                the stages depend on each other in a cycle
+        """
+        self.stages = {}
+        producers = {name: None for name in provided}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            self.stages[stage.name] = stage
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"{output} is made by both {producers[output] or 'the caller'} and {stage.name}")
+                producers[output] = stage.name
+
+        self.dependencies = {}
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in producers]
+            if missing:
+                raise ValueError(f"Stage {stage.name} needs {', '.join(missing)}, which no stage makes")
+            self.dependencies[stage.name] = {producers[name] for name in stage.inputs if producers[name]}
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        done, visiting = set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stages depend on each other in a cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dependency in self.dependencies[name]:
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name, [])
+
+    def run(self, values=None, max_workers=None, on_update=None):
+        """
+        Run every stage, each as soon as its inputs are available.
+
+        Args:
+            values: {name: value} for the names given as provided
+            max_workers: Stages run at the same time (default: PIPELINE_MAX_WORKERS)
+            on_update: Optional callback(stage name, report) called when a
+                stage waits for its resource, starts, retries, finishes or fails
+
+        Returns:
+            (values, reports): the given values plus every stage's outputs,
+            and {stage name: report} with status ("done" or "failed"),
+            attempts, start and end in seconds from the start of the
+            pipeline, seconds taken, seconds waited for the stage's
+            resource before it started, and error
+
+        Raises:
+            The exception of the first required stage that fails (after its
+            retries); stages already running are allowed to finish first
+        """
+        values = dict(values or {})
+        reports = {}
+        stage_starts = {}
+        lock = threading.Lock()
+        started = time.time()
+
+        def update(name, **fields):
+            with lock:
+                reports.setdefault(name, {}).update(fields)
+                report = dict(reports[name])
+            if on_update:
+                on_update(name, report)
+
+        def execute(stage):
+            with lock:
+                inputs = {name: values[name] for name in stage.inputs}
+            ready = time.time()
+            if stage.resource in resource_limits():
+                update(stage.name, status="waiting", resource=stage.resource)
+            for attempt in range(stage.retries + 1):
+                # The slot is given back while waiting to retry
+                with resource_slot(stage.resource):
+                    if attempt == 0:
+                        stage_starts[stage.name] = time.time()
+                        update(stage.name, status="running", attempts=1,
+                               start=round(stage_starts[stage.name] - started, 2),
+                               waited=round(stage_starts[stage.name] - ready, 2))
+                    else:
+                        update(stage.name, status="running", attempts=attempt + 1)
+                    try:
+                        outputs = stage.run(inputs) or {}
+                        break
+                    except Exception as e:
+                        if attempt == stage.retries:
+                            raise
+                        error = e
+                delay = stage.retry_delay * 2 ** attempt
+                print(f"[PIPELINE] {stage.name} failed ({error}), retrying in {delay:.1f}s")
+                update(stage.name, status="retrying", error=str(error))
+                time.sleep(delay)
+            missing = [name for name in stage.outputs if name not in outputs]
+            if missing:
+                raise ValueError(f"Stage {stage.name} did not return {', '.join(missing)}")
+            return outputs
+
+        pending = dict(self.stages)
+        finished = set()
+        failure = None
+        with ThreadPoolExecutor(max_workers=max_workers or PIPELINE_MAX_WORKERS) as executor:
+            running = {}
+            while pending or running:
+                if failure is None:
+                    for name, stage in list(pending.items()):
+                        if self.dependencies[name] <= finished:
+                            running[executor.submit(execute, stage)] = stage
+                            del pending[name]
+                if not running:
+                    break
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    stage = running.pop(future)
+                    now = time.time()
+                    end = now - started
+                    seconds = round(now - stage_starts[stage.name], 2)
+                    try:
+                        outputs = future.result()
+                    except Exception as e:
+                        update(stage.name, status="failed", end=round(end, 2), seconds=seconds, error=str(e))
+                        print(f"[PIPELINE] {stage.name} failed after {seconds:.1f}s: {e}")
+                        if not stage.optional:
+                            failure = failure or e
+                            continue
+                        outputs = {name: None for name in stage.outputs}
+                    else:
+                        update(stage.name, status="done", end=round(end, 2), seconds=seconds, error=None)
+                        print(f"[PIPELINE] {stage.name} done in {seconds:.1f}s")
+                    with lock:
+                        values.update({name: outputs[name] for name in stage.outputs})
+                    finished.add(stage.name)
+
+        if failure is not None:
+            raise failure
+        return values, reports
@@ -0,0 +1,278 @@
+"""
+Rate Limiter - Shared per-provider rate and concurrency limits for API calls
+
+Every call to Gemini, ElevenLabs and HeyGen goes through the provider's
+RateLimiter, shared by all threads of the process (web app jobs, batch
+matches, pipeline stages). A call waits for:
+    a slot    - at most <PROVIDER>_MAX_CONCURRENT calls at the same time
+    a token   - a token bucket refilled at <PROVIDER>_REQUESTS_PER_MINUTE,
+                so bursts are smoothed out instead of rejected upstream
+
+When the provider answers HTTP 429 the call is retried (up to
+RATE_LIMIT_MAX_RETRIES times). Every call to that provider then pauses for
+its Retry-After (or RATE_LIMIT_BACKOFF seconds if there is none), and the
+request rate is halved; it climbs back to the configured rate by a tenth
+for every call that succeeds. Throughput then stays near the quota instead
+of collapsing into errors and retries.
+
+The limits apply per process: with several gunicorn workers, divide the
+quota between them.
+
+rate_limit_metrics() reports, per provider, the calls queued, in flight and
+held back by a Retry-After pause, and counters of calls, 429s and retries
+(served by the web app at /api/rate_limits).
+
+Settings (0 disables a limit):
+    GEMINI_REQUESTS_PER_MINUTE      - default: 15
+    GEMINI_MAX_CONCURRENT           - default: 4
+    ELEVENLABS_REQUESTS_PER_MINUTE  - default: 60
+    ELEVENLABS_MAX_CONCURRENT       - default: 2
+    HEYGEN_REQUESTS_PER_MINUTE      - default: 60
+    HEYGEN_MAX_CONCURRENT           - default: 3
+    RATE_LIMIT_MAX_RETRIES          - Retries of a call answered with HTTP 429 (default: 5)
+    RATE_LIMIT_BACKOFF              - Seconds to pause after a 429 without Retry-After (default: 5)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+RATE_LIMIT_BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", "5"))
+
+# The request rate is never slowed below this fraction of the configured rate
+MIN_RATE_FRACTION = 0.1
+
+PROVIDERS = {
+    "gemini": {
+        "requests_per_minute": float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "15")),
+        "max_concurrent": int(os.getenv("GEMINI_MAX_CONCURRENT", "4")),
+    },
+    "elevenlabs": {
+        "requests_per_minute": float(os.getenv("ELEVENLABS_REQUESTS_PER_MINUTE", "60")),
+        "max_concurrent": int(os.getenv("ELEVENLABS_MAX_CONCURRENT", "2")),
+    },
+    "heygen": {
+        "requests_per_minute": float(os.getenv("HEYGEN_REQUESTS_PER_MINUTE", "60")),
+        "max_concurrent": int(os.getenv("HEYGEN_MAX_CONCURRENT", "3")),
+    },
+}
+
+
+class RateLimitedError(Exception):
+    """A provider rejected a call with HTTP 429."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Get the seconds to wait from a Retry-After header (seconds or an HTTP date), or None."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(str(value)) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def check_response(response):
+    """
+    Raise RateLimitedError if an HTTP response is a 429.
+
+    Returns:
+        response, for chaining
+    """
+    if response.status_code == 429:
+        raise RateLimitedError(f"HTTP 429 from {response.url}",
+                               parse_retry_after(response.headers.get("Retry-After")))
+    return response
+
+
+def rate_limit_info(error):
+    """
+    Tell whether an exception from a provider's client is a rate limit rejection.
+
+    Understands RateLimitedError, requests' HTTPError, the ElevenLabs SDK's
+    ApiError and Google's ResourceExhausted, also when wrapped in another
+    exception (as langchain does).
+
+    Returns:
+        (rate limited, Retry-After seconds or None)
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, RateLimitedError):
+            return True, error.retry_after
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None) \
+            or getattr(error, "code", None)
+        if status == 429 or "RESOURCE_EXHAUSTED" in str(error):
+            headers = getattr(error, "headers", None) or getattr(response, "headers", None) or {}
+            return True, parse_retry_after(headers.get("Retry-After") or headers.get("retry-after"))
+        error = error.__cause__ or error.__context__
+    return False, None
+
+
+class RateLimiter:
+    """Token bucket plus concurrency limit for one provider, slowed down adaptively on 429s."""
+
+    def __init__(self, name, requests_per_minute=0, max_concurrent=0):
+        """
+        Args:
+            name: Provider name (for logs and metrics)
+            requests_per_minute: Sustained request rate (0: unlimited)
+            max_concurrent: Calls at the same time (0: unlimited); also the
+                largest burst the bucket allows
+        """
+        self.name = name
+        self.rate = requests_per_minute / 60
+        self.current_rate = self.rate
+        self.max_concurrent = max_concurrent
+        self.capacity = max(1, max_concurrent)
+        self.tokens = float(self.capacity)
+        self.refilled = time.monotonic()
+        self.paused_until = 0.0
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self._condition = threading.Condition()
+        self.queued = 0
+        self.in_flight = 0
+        self.throttled = 0
+        self.calls = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+
+    def _take_token(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                pause = self.paused_until - now
+                if pause > 0:
+                    self.throttled += 1
+                    self._condition.wait(pause)
+                    self.throttled -= 1
+                    continue
+                if not self.rate:
+                    return
+                self.tokens = min(self.capacity, self.tokens + (now - self.refilled) * self.current_rate)
+                self.refilled = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                self._condition.wait((1 - self.tokens) / self.current_rate)
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the provider's call slots and a token for the duration of one call."""
+        started = time.monotonic()
+        with self._condition:
+            self.queued += 1
+        try:
+            if self._slots:
+                self._slots.acquire()
+            try:
+                self._take_token()
+            except BaseException:
+                if self._slots:
+                    self._slots.release()
+                raise
+        except BaseException:
+            with self._condition:
+                self.queued -= 1
+            raise
+        with self._condition:
+            self.queued -= 1
+            self.in_flight += 1
+            self.calls += 1
+            self.wait_seconds += time.monotonic() - started
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+            if self._slots:
+                self._slots.release()
+
+    def slow_down(self, retry_after=None):
+        """Pause every call for retry_after (or RATE_LIMIT_BACKOFF) seconds and halve the request rate."""
+        pause = RATE_LIMIT_BACKOFF if retry_after is None else retry_after
+        with self._condition:
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.tokens = 0.0
+            if self.rate:
+                self.current_rate = max(self.rate * MIN_RATE_FRACTION, self.current_rate / 2)
+            self._condition.notify_all()
+        print(f"[RATE LIMIT] {self.name} rate limited, pausing calls for {pause:.1f}s"
+              + (f" (now {self.current_rate * 60:.1f} requests/min)" if self.rate else ""))
+
+    def _speed_up(self):
+        with self._condition:
+            if self.current_rate < self.rate:
+                self.current_rate = min(self.rate, self.current_rate + self.rate * MIN_RATE_FRACTION)
+
+    def call(self, function, *args, **kwargs):
+        """
+        Call function within the limits, retrying it when it is rate limited.
+
+        Raises:
+            Whatever function raises; a rate limit error once
+            RATE_LIMIT_MAX_RETRIES retries have been rejected too
+        """
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            with self.slot():
+                try:
+                    result = function(*args, **kwargs)
+                except Exception as e:
+                    limited, retry_after = rate_limit_info(e)
+                    if not limited:
+                        raise
+                    self.slow_down(retry_after)
+                    if attempt == RATE_LIMIT_MAX_RETRIES:
+                        raise
+                    with self._condition:
+                        self.retries += 1
+                    continue
+            self._speed_up()
+            return result
+
+    def metrics(self):
+        """Get the limiter's settings, live counts and counters."""
+        with self._condition:
+            return {
+                "requests_per_minute": round(self.rate * 60, 2),
+                "current_requests_per_minute": round(self.current_rate * 60, 2),
+                "max_concurrent": self.max_concurrent,
+                "queued": self.queued,
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+                "calls": self.calls,
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+                "wait_seconds": round(self.wait_seconds, 2),
+            }
+
+
+# Shared instances used by commentary.py, texttospeech.py and aivideo.py
+rate_limiters = {name: RateLimiter(name, **settings) for name, settings in PROVIDERS.items()}
+
+
+def rate_limited(provider, function, *args, **kwargs):
+    """Call function through a provider's shared limiter (see RateLimiter.call())."""
+    return rate_limiters[provider].call(function, *args, **kwargs)
+
+
+def rate_limit_metrics():
+    """Get {provider: metrics} for every provider."""
+    return {name: limiter.metrics() for name, limiter in rate_limiters.items()}
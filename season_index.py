@@ -0,0 +1,431 @@
+"""
+Season Index - Compact binary index of all IPL season files
+
+Build step (run once after the data/ folder changes, e.g. in build.sh):
+    python season_index.py [data_dir] [output_path]
+
+The index packs every data/ipl_<year>.json file into a single file that is
+loaded with mmap, so a worker can answer match lookups without parsing any
+JSON. All workers map the same file, so the operating system keeps one copy
+in the page cache no matter how many workers or seasons there are.
+
+Layout (native byte order, every section 8-byte aligned):
+    header          magic, byte-order mark and section counts
+    string offsets  u32[n_strings + 1] into the string blob
+    seasons         fixed-width records: year, first match, match count,
+                    source file mtime and size
+    matches         fixed-width records: teams, info, innings ranges
+    innings         fixed-width records: name, extras, batting row range
+    refs            u32 string ids for the teams and info lists
+    batting columns one array per field across all innings rows: string ids
+                    for lossless reconstruction plus numeric runs, balls,
+                    fours, sixes and strike rate
+    string blob     interned UTF-8 strings (teams, players, labels)
+"""
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from collections.abc import Sequence
+
+
+DATA_DIR = "data"
+INDEX_PATH = os.path.join(DATA_DIR, "seasons.idx")
+
+MAGIC = b"QGSIDX01"
+BYTE_ORDER_MARK = 0x01020304
+NONE = 0xFFFFFFFF  # Missing string id
+MISSING = -1       # Unparsable numeric batting value
+
+HEADER = struct.Struct("=8sIIIIIIII")  # magic, bom, n_strings, blob_len, n_seasons, n_matches, n_innings, n_rows, n_refs
+SEASON = struct.Struct("=IIIIqq")      # year, match_start, match_count, pad, source mtime_ns, source size
+MATCH = struct.Struct("=IIIIII")       # teams_start, teams_count, info_start, info_count, innings_start, innings_count
+INNINGS = struct.Struct("=IIII")       # name, extras, row_start, row_count
+
+STRING_COLUMNS = ("player", "runs", "balls", "fours", "sixes", "strike_rate")
+INT_COLUMNS = ("runs", "balls", "fours", "sixes")
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _layout(n_strings, n_seasons, n_matches, n_innings, n_rows, n_refs):
+    """Compute the byte offset of every section from the header counts."""
+    sections = [
+        ("string_offsets", 4 * (n_strings + 1)),
+        ("seasons", SEASON.size * n_seasons),
+        ("matches", MATCH.size * n_matches),
+        ("innings", INNINGS.size * n_innings),
+        ("refs", 4 * n_refs),
+    ]
+    sections += [(f"str_{name}", 4 * n_rows) for name in STRING_COLUMNS]
+    sections += [(f"int_{name}", 4 * n_rows) for name in INT_COLUMNS]
+    sections.append(("strike_rate", 8 * n_rows))
+
+    offsets = {}
+    offset = _align(HEADER.size)
+    for name, size in sections:
+        offsets[name] = offset
+        offset = _align(offset + size)
+    offsets["blob"] = offset
+    return offsets
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def _to_strike_rate(value):
+    # Same conversion as data_processor.extract_scoreboard_data
+    if value == '-':
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def build_index(data_dir=DATA_DIR, output_path=None):
+    """
+    Build the binary season index from data/ipl_<year>.json files.
+
+    Args:
+        data_dir: Folder containing the season JSON files
+        output_path: Where to write the index (default: <data_dir>/seasons.idx)
+
+    Returns:
+        Path of the written index file
+    """
+    if output_path is None:
+        output_path = os.path.join(data_dir, "seasons.idx")
+
+    strings = {}
+    blob = bytearray()
+    string_offsets = array.array("I", [0])
+
+    def intern(value):
+        string_id = strings.get(value)
+        if string_id is None:
+            string_id = len(strings)
+            strings[value] = string_id
+            blob.extend(value.encode("utf-8"))
+            string_offsets.append(len(blob))
+        return string_id
+
+    seasons = bytearray()
+    matches = bytearray()
+    innings_table = bytearray()
+    refs = array.array("I")
+    str_columns = {name: array.array("I") for name in STRING_COLUMNS}
+    int_columns = {name: array.array("i") for name in INT_COLUMNS}
+    strike_rates = array.array("d")
+    n_seasons = n_matches = n_innings = 0
+
+    years = []
+    for file_name in os.listdir(data_dir):
+        if file_name.startswith("ipl_") and file_name.endswith(".json"):
+            year = file_name[len("ipl_"):-len(".json")]
+            if year.isdigit():
+                years.append(year)
+
+    for year in sorted(years):
+        path = os.path.join(data_dir, f"ipl_{year}.json")
+        stat = os.stat(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            season = json.load(f)
+
+        seasons.extend(SEASON.pack(int(year), n_matches, len(season), 0, stat.st_mtime_ns, stat.st_size))
+        n_seasons += 1
+
+        for match in season:
+            teams = match.get("teams", [])
+            info = match.get("info", [])
+            innings_list = match.get("innings", [])
+
+            teams_start = len(refs)
+            refs.extend(intern(team) for team in teams)
+            info_start = len(refs)
+            refs.extend(intern(line) for line in info)
+
+            matches.extend(MATCH.pack(teams_start, len(teams), info_start, len(info),
+                                      n_innings, len(innings_list)))
+            n_matches += 1
+
+            for inning in innings_list:
+                row_start = len(str_columns["player"])
+                extras = NONE
+                for entry in inning.get("batting", []):
+                    if "player" in entry:
+                        for name in STRING_COLUMNS:
+                            str_columns[name].append(intern(entry[name]))
+                        for name in INT_COLUMNS:
+                            int_columns[name].append(_to_int(entry[name]))
+                        strike_rates.append(_to_strike_rate(entry["strike_rate"]))
+                    elif "Extras" in entry:
+                        extras = intern(entry["Extras"])
+                row_count = len(str_columns["player"]) - row_start
+
+                innings_table.extend(INNINGS.pack(intern(inning["name"]), extras, row_start, row_count))
+                n_innings += 1
+
+    n_rows = len(str_columns["player"])
+    offsets = _layout(len(strings), n_seasons, n_matches, n_innings, n_rows, len(refs))
+
+    sections = [
+        ("string_offsets", string_offsets.tobytes()),
+        ("seasons", bytes(seasons)),
+        ("matches", bytes(matches)),
+        ("innings", bytes(innings_table)),
+        ("refs", refs.tobytes()),
+    ]
+    sections += [(f"str_{name}", str_columns[name].tobytes()) for name in STRING_COLUMNS]
+    sections += [(f"int_{name}", int_columns[name].tobytes()) for name in INT_COLUMNS]
+    sections.append(("strike_rate", strike_rates.tobytes()))
+    sections.append(("blob", bytes(blob)))
+
+    # Write to a temp file and swap it in, so workers that already mapped the
+    # old index keep a consistent view
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, BYTE_ORDER_MARK, len(strings), len(blob), n_seasons,
+                            n_matches, n_innings, n_rows, len(refs)))
+        for name, data in sections:
+            f.write(b"\0" * (offsets[name] - f.tell()))
+            f.write(data)
+    os.replace(temp_path, output_path)
+
+    print(f"✓ Indexed {n_seasons} seasons, {n_matches} matches, {n_rows} batting rows, "
+          f"{len(strings)} unique strings -> {output_path} ({os.path.getsize(output_path) / 1024:.1f} KB)")
+    return output_path
+
+
+class SeasonMatches(Sequence):
+    """Lazy, read-only list of the matches of one season, decoded on access."""
+
+    def __init__(self, index, match_start, match_count):
+        self._index = index
+        self._start = match_start
+        self._count = match_count
+        self._decoded = [None] * match_count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self._count))]
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError("match index out of range")
+        match = self._decoded[position]
+        if match is None:
+            match = self._index._decode_match(self._start + position)
+            self._decoded[position] = match
+        return match
+
+
+class SeasonIndex:
+    """Read-only, mmap-backed view of a season index file."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.data_dir = os.path.dirname(path) or "."
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, bom, n_strings, blob_len, n_seasons, n_matches,
+         n_innings, n_rows, n_refs) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a season index: {path}")
+        if bom != BYTE_ORDER_MARK:
+            raise ValueError(f"Season index was built on a machine with a different byte order: {path}")
+
+        offsets = _layout(n_strings, n_seasons, n_matches, n_innings, n_rows, n_refs)
+        view = memoryview(self._mm)
+
+        def column(name, count, fmt, width):
+            return view[offsets[name]:offsets[name] + count * width].cast(fmt)
+
+        self._string_offsets = column("string_offsets", n_strings + 1, "I", 4)
+        self._refs = column("refs", n_refs, "I", 4)
+        self._str_columns = {name: column(f"str_{name}", n_rows, "I", 4) for name in STRING_COLUMNS}
+        self._int_columns = {name: column(f"int_{name}", n_rows, "i", 4) for name in INT_COLUMNS}
+        self._strike_rates = column("strike_rate", n_rows, "d", 8)
+        self._blob_offset = offsets["blob"]
+        self._matches_offset = offsets["matches"]
+        self._innings_offset = offsets["innings"]
+        self._strings = {}
+
+        self._seasons = {}
+        for i in range(n_seasons):
+            year, match_start, match_count, _, mtime_ns, size = SEASON.unpack_from(
+                self._mm, offsets["seasons"] + i * SEASON.size)
+            self._seasons[str(year)] = (match_start, match_count, mtime_ns, size)
+
+    def string(self, string_id):
+        """Decode an interned string (decoded strings are cached)."""
+        if string_id == NONE:
+            return None
+        value = self._strings.get(string_id)
+        if value is None:
+            start = self._blob_offset + self._string_offsets[string_id]
+            end = self._blob_offset + self._string_offsets[string_id + 1]
+            value = self._mm[start:end].decode("utf-8")
+            self._strings[string_id] = value
+        return value
+
+    def years(self):
+        """Get sorted list of indexed season years."""
+        return sorted(self._seasons)
+
+    def is_fresh(self, year):
+        """Check that the season's JSON file has not changed since indexing."""
+        season = self._seasons.get(str(year))
+        if season is None:
+            return False
+        try:
+            stat = os.stat(os.path.join(self.data_dir, f"ipl_{year}.json"))
+        except OSError:
+            # Source file not deployed; the index is the only copy
+            return True
+        return stat.st_mtime_ns == season[2] and stat.st_size == season[3]
+
+    def matches(self, year):
+        """
+        Get the matches of a season as a lazy sequence of match dictionaries.
+
+        Returns:
+            SeasonMatches, or None if the season is not indexed
+        """
+        season = self._seasons.get(str(year))
+        if season is None:
+            return None
+        return SeasonMatches(self, season[0], season[1])
+
+    def _match_record(self, year, match_number):
+        season = self._seasons.get(str(year))
+        try:
+            match_number = int(match_number)
+        except (TypeError, ValueError):
+            return None
+        if season is None or not 1 <= match_number <= season[1]:
+            return None
+        return MATCH.unpack_from(self._mm, self._matches_offset + (season[0] + match_number - 1) * MATCH.size)
+
+    def _innings_records(self, innings_start, innings_count):
+        for i in range(innings_start, innings_start + innings_count):
+            yield INNINGS.unpack_from(self._mm, self._innings_offset + i * INNINGS.size)
+
+    def _decode_match(self, match_id):
+        teams_start, teams_count, info_start, info_count, innings_start, innings_count = \
+            MATCH.unpack_from(self._mm, self._matches_offset + match_id * MATCH.size)
+
+        innings_list = []
+        for name, extras, row_start, row_count in self._innings_records(innings_start, innings_count):
+            batting = []
+            for row in range(row_start, row_start + row_count):
+                batting.append({
+                    field: self.string(self._str_columns[field][row]) for field in STRING_COLUMNS
+                })
+            if extras != NONE:
+                batting.append({"Extras": self.string(extras)})
+            innings_list.append({"name": self.string(name), "batting": batting})
+
+        return {
+            "info": [self.string(i) for i in self._refs[info_start:info_start + info_count]],
+            "teams": [self.string(i) for i in self._refs[teams_start:teams_start + teams_count]],
+            "innings": innings_list,
+        }
+
+    def teams(self, year, match_number):
+        """Get the team list of a match without decoding the rest of it."""
+        record = self._match_record(year, match_number)
+        if record is None:
+            return None
+        teams_start, teams_count = record[0], record[1]
+        return [self.string(i) for i in self._refs[teams_start:teams_start + teams_count]]
+
+    def innings_columns(self, year, match_number):
+        """
+        Get the batting columns of every innings of a match.
+
+        Returns:
+            List of dictionaries (one per innings) with the raw innings name,
+            the raw extras text (or None) and per-field lists of batting
+            values, or None if the match is not indexed
+        """
+        record = self._match_record(year, match_number)
+        if record is None:
+            return None
+
+        innings_list = []
+        for name, extras, row_start, row_count in self._innings_records(record[4], record[5]):
+            rows = slice(row_start, row_start + row_count)
+            innings = {
+                "name": self.string(name),
+                "extras": self.string(extras),
+                "player": [self.string(i) for i in self._str_columns["player"][rows]],
+                "strike_rate": self._strike_rates[rows].tolist(),
+            }
+            for field in INT_COLUMNS:
+                innings[field] = self._int_columns[field][rows].tolist()
+            innings_list.append(innings)
+        return innings_list
+
+
+_index_lock = threading.Lock()
+_loaded_index = None  # ((path, mtime_ns), SeasonIndex)
+
+
+def load_season_index(path=INDEX_PATH):
+    """
+    Get the shared season index, reopening it if the file was rebuilt.
+
+    Returns:
+        SeasonIndex, or None if no valid index exists at path
+    """
+    global _loaded_index
+
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+
+    loaded = _loaded_index
+    if loaded and loaded[0] == key:
+        return loaded[1]
+
+    with _index_lock:
+        if _loaded_index and _loaded_index[0] == key:
+            return _loaded_index[1]
+        try:
+            index = SeasonIndex(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"[INDEX] Could not load season index {path}: {e}")
+            return None
+        _loaded_index = (key, index)
+        return index
+
+
+def main():
+    """Build the season index from the command line."""
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else DATA_DIR
+    output_path = sys.argv[2] if len(sys.argv) > 2 else None
+
+    if not os.path.isdir(data_dir):
+        print(f"❌ Data folder not found: {data_dir}")
+        sys.exit(1)
+
+    build_index(data_dir, output_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Stream Packaging - Package a final highlight video for adaptive streaming
+
+Re-encodes the final MP4 into a bitrate ladder with keyframes every
+STREAM_SEGMENT_SECONDS, and splits it into short segments with playlists:
+    hls  - master.m3u8 with one media playlist per rung (MPEG-TS segments)
+    dash - manifest.mpd with fragmented MP4 segments; when HLS is also
+           requested the same segments are listed in master.m3u8, so both
+           formats come from a single encode
+
+Players fetch the master playlist, start on a small first segment and
+switch rungs as bandwidth changes, instead of downloading the whole MP4.
+Rungs taller than the video (by its short side) are skipped.
+
+The packaged files go in <video name>_stream/ next to the video, which is
+replaced only once packaging has succeeded.
+
+The web page plays HLS natively where the browser can, and otherwise loads
+hls.js from HLS_JS_URL on first use (never when HLS is not enabled).
+
+Settings:
+    STREAM_FORMATS           - "hls", "dash" or "hls,dash" (default: empty, no packaging)
+    STREAM_SEGMENT_SECONDS   - Segment length in seconds (default: 2)
+    HLS_JS_URL               - hls.js script for browsers without native HLS (default: a
+                               pinned jsDelivr release; point it at a copy under /static to vendor it)
+    HLS_JS_INTEGRITY         - Subresource Integrity hash of that script, e.g. "sha384-..."
+                               (default: empty, not checked)
+
+Usage: python stream_packaging.py <video.mp4> [--formats hls dash]
+Example: python stream_packaging.py commentaries/2008/match_1_KKR_vs_RCB/final_video_with_scoreboards.mp4
+"""
+import os
+import shutil
+from pathlib import Path
+from media_probe import get_duration, get_video_size
+from video_combining import run_ffmpeg_cmd
+
+
+STREAM_FORMAT_CHOICES = ("hls", "dash")
+STREAM_FORMATS = [name.strip().lower() for name in os.getenv("STREAM_FORMATS", "").split(",") if name.strip()]
+STREAM_SEGMENT_SECONDS = float(os.getenv("STREAM_SEGMENT_SECONDS", "2"))
+
+HLS_JS_URL = os.getenv("HLS_JS_URL", "https://cdn.jsdelivr.net/npm/hls.js@1.5.20/dist/hls.min.js")
+HLS_JS_INTEGRITY = os.getenv("HLS_JS_INTEGRITY", "")
+
+# (short side in pixels, video bitrate, audio bitrate), highest first
+STREAM_LADDER = [
+    (1080, "5000k", "128k"),
+    (720, "2800k", "128k"),
+    (480, "1200k", "96k"),
+    (360, "700k", "64k"),
+]
+
+HLS_PLAYLIST = "master.m3u8"
+DASH_MANIFEST = "manifest.mpd"
+
+STREAM_MIMETYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".mpd": "application/dash+xml",
+    ".ts": "video/mp2t",
+    ".m4s": "video/iso.segment",
+}
+
+
+def stream_dir_for(video_path):
+    """Get the folder holding the packaged stream of a video."""
+    video_path = Path(video_path)
+    return video_path.with_name(f"{video_path.stem}_stream")
+
+
+def packaged_stream(stream_dir):
+    """
+    Find the playlists in a stream folder.
+
+    Returns:
+        {format: playlist file name} for the formats that have been packaged
+    """
+    stream_dir = Path(stream_dir)
+    playlists = {}
+    if (stream_dir / DASH_MANIFEST).exists():
+        playlists["dash"] = DASH_MANIFEST
+    if (stream_dir / HLS_PLAYLIST).exists():
+        playlists["hls"] = HLS_PLAYLIST
+    return playlists
+
+
+def ladder_for(width, height, ladder=None):
+    """Get the ladder rungs that are not taller than the video (at least the smallest rung)."""
+    ladder = ladder or STREAM_LADDER
+    short_side = min(width, height)
+    return [rung for rung in ladder if rung[0] <= short_side] or [ladder[-1]]
+
+
+def package_stream(video_path, formats=None, output_dir=None, segment_seconds=None, progress=None):
+    """
+    Package a video as HLS and/or DASH.
+
+    Args:
+        video_path: Final MP4 (with an audio track)
+        formats: List of "hls" and/or "dash" (default: STREAM_FORMATS)
+        output_dir: Stream folder (default: stream_dir_for(video_path))
+        segment_seconds: Segment length (default: STREAM_SEGMENT_SECONDS)
+        progress: Optional encode progress callback (see run_ffmpeg_cmd())
+
+    Returns:
+        {format: playlist file name} relative to output_dir; empty if no
+        formats are enabled
+    """
+    formats = list(dict.fromkeys(formats if formats is not None else STREAM_FORMATS))
+    for name in formats:
+        if name not in STREAM_FORMAT_CHOICES:
+            raise ValueError(f"Unknown stream format: {name} (expected one of {', '.join(STREAM_FORMAT_CHOICES)})")
+    if not formats:
+        return {}
+    segment_seconds = segment_seconds or STREAM_SEGMENT_SECONDS
+    output_dir = Path(output_dir or stream_dir_for(video_path))
+
+    frame_size = get_video_size(video_path)
+    if frame_size is None:
+        raise Exception(f"Could not read the frame size of {video_path}")
+    width, height = frame_size
+    rungs = ladder_for(width, height)
+    landscape = width >= height
+
+    # Scale every rung from one decode of the source
+    outputs = "".join(f"[v{i}]" for i in range(len(rungs)))
+    filter_parts = [f"[0:v]split={len(rungs)}{outputs}"]
+    for i, (short_side, _, _) in enumerate(rungs):
+        size = f"-2:{short_side}" if landscape else f"{short_side}:-2"
+        filter_parts.append(f"[v{i}]scale={size}[v{i}out]")
+    encode_args = [
+        f'-filter_complex "{";".join(filter_parts)}"',
+        " ".join(f'-map "[v{i}out]"' for i in range(len(rungs))),
+        "-map 0:a:0",
+        "-c:v libx264 -preset veryfast -pix_fmt yuv420p -sc_threshold 0",
+        # Keyframes on segment boundaries so every rung can be switched at every segment
+        f'-force_key_frames "expr:gte(t,n_forced*{segment_seconds})"',
+    ]
+    for i, (_, video_bitrate, _) in enumerate(rungs):
+        rate = int(video_bitrate.rstrip("k"))
+        encode_args.append(f"-b:v:{i} {video_bitrate} -maxrate:v:{i} {rate * 3 // 2}k -bufsize:v:{i} {rate * 2}k")
+    encode_args.append(f"-c:a aac -b:a {rungs[0][2]}")
+
+    temp_dir = output_dir.with_name(f"{output_dir.name}.tmp-{os.getpid()}")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    temp_dir.mkdir(parents=True)
+    try:
+        if "dash" in formats:
+            muxer_args = (
+                f"-f dash -seg_duration {segment_seconds} -use_template 1 -use_timeline 1 "
+                f'-adaptation_sets "id=0,streams=v id=1,streams=a" '
+                f"-init_seg_name 'init-$RepresentationID$.m4s' "
+                f"-media_seg_name 'chunk-$RepresentationID$-$Number%05d$.m4s' "
+            )
+            if "hls" in formats:
+                muxer_args += f"-hls_playlist 1 -hls_master_name {HLS_PLAYLIST} "
+            output = temp_dir / DASH_MANIFEST
+        else:
+            # One audio rendition shared by every video rung
+            stream_map = " ".join(["a:0,agroup:audio"] + [f"v:{i},agroup:audio" for i in range(len(rungs))])
+            muxer_args = (
+                f"-f hls -hls_time {segment_seconds} -hls_playlist_type vod -hls_flags independent_segments "
+                f'-master_pl_name {HLS_PLAYLIST} -var_stream_map "{stream_map}" '
+                f'-hls_segment_filename "{temp_dir}/stream_%v/segment_%03d.ts" '
+            )
+            output = temp_dir / "stream_%v" / "index.m3u8"
+
+        cmd = f'ffmpeg -y -i "{video_path}" {" ".join(encode_args)} {muxer_args}"{output}"'
+        run_ffmpeg_cmd(cmd, f"Packaging {Path(video_path).name} as {' and '.join(formats).upper()} "
+                            f"({len(rungs)} rung(s))",
+                       progress=progress, duration=get_duration(video_path) or None)
+
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.replace(temp_dir, output_dir)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return packaged_stream(output_dir)
+
+
+def main():
+    """Main entry point."""
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Package a highlight video for HLS/DASH streaming")
+    parser.add_argument("video", help="Final MP4 video")
+    parser.add_argument("--formats", nargs="+", choices=STREAM_FORMAT_CHOICES, default=None,
+                        help="Formats to write (default: STREAM_FORMATS or hls)")
+    parser.add_argument("--output-dir", help="Stream folder (default: <video name>_stream next to the video)")
+    args = parser.parse_args()
+
+    try:
+        playlists = package_stream(args.video, args.formats or STREAM_FORMATS or ["hls"], args.output_dir)
+        output_dir = Path(args.output_dir or stream_dir_for(args.video))
+        for name, playlist in playlists.items():
+            print(f"✓ {name.upper()}: {output_dir / playlist}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ import uuid
 from dotenv import load_dotenv
 from elevenlabs import VoiceSettings
 from elevenlabs.client import ElevenLabs
+from file_utils import atomic_write
+from rate_limiter import rate_limited
 
 load_dotenv()
 
@@ -12,6 +14,25 @@ elevenlabs = ElevenLabs(
     api_key=ELEVENLABS_API_KEY,
 )
 
+VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "pNInz6obpgDQGcFmaJgB")  # Adam pre-made voice
+TTS_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_turbo_v2_5")  # use the turbo model for low latency
+OUTPUT_FORMAT = "mp3_22050_32"
+VOICE_SETTINGS = {
+    "stability": 0.0,
+    "similarity_boost": 1.0,
+    "style": 0.0,
+    "use_speaker_boost": True,
+    "speed": 1.2,
+}
+
+# Everything besides the text that changes the audio (for cache keys)
+SPEECH_SETTINGS = {
+    "voice_id": VOICE_ID,
+    "model_id": TTS_MODEL_ID,
+    "output_format": OUTPUT_FORMAT,
+    "voice_settings": VOICE_SETTINGS,
+}
+
 def text_to_speech_file(text: str, output_path: str = None) -> str:
     """
     Convert text to speech and save as MP3 file.
@@ -21,33 +42,30 @@ def text_to_speech_file(text: str, output_path: str = None) -> str:
     Returns:
         Path to the saved audio file
     """
-    # Calling the text_to_speech conversion API with detailed parameters
-    response = elevenlabs.text_to_speech.convert(
-        voice_id="pNInz6obpgDQGcFmaJgB", # Adam pre-made voice
-        output_format="mp3_22050_32",
-        text=text,
-        model_id="eleven_turbo_v2_5", # use the turbo model for low latency
-        # Optional voice settings that allow you to customize the output
-        voice_settings=VoiceSettings(
-            stability=0.0,
-            similarity_boost=1.0,
-            style=0.0,
-            use_speaker_boost=True,
-            speed=1.2,
-        ),
-    )
-    # uncomment the line below to play the audio back
-    # play(response)
     # Use provided path or generate a unique file name
     if output_path is None:
         save_file_path = f"{uuid.uuid4()}.mp3"
     else:
         save_file_path = output_path
-    # Writing the audio to a file
-    with open(save_file_path, "wb") as f:
-        for chunk in response:
-            if chunk:
-                f.write(chunk)
+
+    def synthesize():
+        # Calling the text_to_speech conversion API with detailed parameters
+        response = elevenlabs.text_to_speech.convert(
+            voice_id=VOICE_ID,
+            output_format=OUTPUT_FORMAT,
+            text=text,
+            model_id=TTS_MODEL_ID,
+            # Optional voice settings that allow you to customize the output
+            voice_settings=VoiceSettings(**VOICE_SETTINGS),
+        )
+        # Writing the audio to a file (atomically, so a failed download never leaves a partial MP3)
+        with atomic_write(save_file_path, "wb") as f:
+            for chunk in response:
+                if chunk:
+                    f.write(chunk)
+
+    # The audio streams while it is written, so the whole download is one rate limited call
+    rate_limited("elevenlabs", synthesize)
     print(f"🎵 Audio saved to: {save_file_path}")
     # Return the path of the saved audio file
     return save_file_path
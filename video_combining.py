@@ -4,56 +4,615 @@ Creates a final video with:
 1. HeyGen AI avatar video with commentary audio
 2. Scoreboard images overlaid at appropriate times
 
-Usage: python video_combining.py <match_folder_path>
-Example: python video_combining.py commentaries/match_22_KXIP_vs_KKR
+The final video is rendered in one of two modes (VIDEO_COMBINE_MODE):
+    single   - one ffmpeg process with a single filter_complex and one encode
+               (default)
+    parallel - every segment body and every crossfade window is encoded as
+               a separate ffmpeg process on a pool sized to the CPU count,
+               then the pieces are joined with a stream-copy concat; encoded
+               scoreboard clips are kept in the clip cache (see clip_cache.py)
+               and reused while the image and timings are unchanged
+
+Encoder settings, resolution and frame rate come from a named render
+profile (RENDER_PROFILE, default: standard):
+    draft    - 960x540, x264 ultrafast, for quick previews
+    standard - 1920x1080, x264 medium, CRF 23
+    archive  - 1920x1080, x264 slow, CRF 18, higher audio bitrate
+Every input is converted to the profile's frame rate. Profiles other than
+standard write final_video_with_scoreboards_<profile>.mp4, so a draft never
+replaces the standard render.
+
+Several renditions can be written at once (VIDEO_RENDITIONS, default:
+landscape):
+    landscape - the profile's frame size (16:9)
+    vertical  - the same frame turned on its side (9:16), for stories and reels
+    square    - 1:1, as high as the profile's frame
+In single mode every input is decoded once and the filtergraph is split
+into one scale/crossfade chain and one encode per rendition. Renditions
+other than landscape are written as final_video_with_scoreboards_<rendition>.mp4.
+
+Final videos are laid out for web playback (MP4_LAYOUT, default: faststart):
+    faststart  - the moov atom is moved to the front once encoding finishes,
+                 so players can start before the whole file has arrived
+    fragmented - moov first, media in short fragments; the file is playable
+                 while ffmpeg is still writing it, so the web app can stream
+                 an unfinished render
+
+Parallel mode writes its intermediate parts to a scratch folder that is
+unique to the run and removed when it ends, whether it succeeds or fails
+(single mode pipes everything through one ffmpeg process and writes no
+intermediates). The scratch folder is created in VIDEO_SCRATCH_DIR, e.g.
+/dev/shm to keep the parts in RAM, or in the match folder if that is unset,
+missing or has less than VIDEO_SCRATCH_MIN_FREE_MB free. Scratch folders
+and temporary files left by a killed run are removed by the next one.
+
+Usage: python video_combining.py <match_folder_path> [--profile draft|standard|archive]
+                                 [--renditions landscape vertical square] [--layout faststart|fragmented]
+Example: python video_combining.py commentaries/match_22_KXIP_vs_KKR --profile draft
 """
 import subprocess
 import os
 import json
+import shlex
+import shutil
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from clip_cache import clip_cache
+from file_utils import atomic_output, directory_size, remove_stale_scratch, scratch_directory
+from media_probe import get_duration, probe
+
+
+COMBINE_MODES = ("single", "parallel")
+VIDEO_COMBINE_MODE = os.getenv("VIDEO_COMBINE_MODE", "single").lower()
+
+RENDER_PROFILES = {
+    "draft": {"preset": "ultrafast", "crf": 30, "width": 960, "height": 540, "fps": 25, "audio_bitrate": "96k"},
+    "standard": {"preset": "medium", "crf": 23, "width": 1920, "height": 1080, "fps": 25, "audio_bitrate": "192k"},
+    "archive": {"preset": "slow", "crf": 18, "width": 1920, "height": 1080, "fps": 25, "audio_bitrate": "256k"},
+}
+DEFAULT_RENDER_PROFILE = os.getenv("RENDER_PROFILE", "standard").lower()
+
+# ffmpeg is killed if it reports no progress for this many seconds (0 disables)
+FFMPEG_STALL_TIMEOUT = float(os.getenv("FFMPEG_STALL_TIMEOUT", "120"))
+
+MP4_LAYOUTS = ("faststart", "fragmented")
+MP4_LAYOUT = os.getenv("MP4_LAYOUT", "faststart").lower()
+
+RENDITIONS = ("landscape", "vertical", "square")
+VIDEO_RENDITIONS = [name.strip().lower() for name in os.getenv("VIDEO_RENDITIONS", "landscape").split(",")
+                    if name.strip()]
 
+# Where parallel mode writes its intermediate parts (empty: the match folder)
+VIDEO_SCRATCH_DIR = os.getenv("VIDEO_SCRATCH_DIR", "")
+VIDEO_SCRATCH_MIN_FREE_MB = float(os.getenv("VIDEO_SCRATCH_MIN_FREE_MB", "1024"))
 
-def get_duration(file_path):
-    """Get the duration of a media file using ffprobe."""
-    cmd = [
-        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1', str(file_path)
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+
+def _progress_number(value, default=0.0):
     try:
-        return float(result.stdout.strip())
-    except:
-        return 0.0
+        return float(str(value).rstrip("x"))
+    except ValueError:
+        return default  # "N/A" before the first frame
+
+
+def progress_report(fields, duration=None):
+    """
+    Turn one block of ffmpeg -progress output into a progress dictionary.
 
+    Args:
+        fields: {key: value} lines of the block (frame, fps, out_time_us, speed...)
+        duration: Expected output length in seconds
 
+    Returns:
+        {frame, fps, speed, time, percent}: speed is a multiple of realtime
+        (None until known), time is seconds of output written, percent is
+        None without a duration
+    """
+    out_time_us = fields.get("out_time_us", fields.get("out_time_ms", 0))
+    seconds = max(0.0, _progress_number(out_time_us) / 1_000_000)
+    speed = _progress_number(fields.get("speed"), None)
+    report = {
+        "frame": int(_progress_number(fields.get("frame"))),
+        "fps": _progress_number(fields.get("fps")),
+        "speed": speed,
+        "time": round(seconds, 2),
+        "percent": None,
+    }
+    if duration:
+        report["percent"] = round(min(100.0, seconds / duration * 100), 1)
+    if fields.get("progress") == "end" and duration:
+        report["percent"] = 100.0
+    return report
 
 
-def run_ffmpeg_cmd(cmd, description="Running FFmpeg command"):
-    """Execute an FFmpeg command and handle errors."""
+def run_ffmpeg_cmd(cmd, description="Running FFmpeg command", progress=None, duration=None,
+                   stall_timeout=FFMPEG_STALL_TIMEOUT):
+    """
+    Execute an FFmpeg command, following its progress, and handle errors.
+
+    ffmpeg runs without a shell and writes machine-readable progress to a
+    pipe (-progress pipe:1), which is parsed as it arrives.
+
+    Args:
+        cmd: ffmpeg argument list, or a command string (split the way a
+            shell would, but never run through one)
+        description: Step name for the log
+        progress: Optional callback receiving a progress_report() dict about
+            twice a second
+        duration: Expected output length in seconds (for percent)
+        stall_timeout: Kill ffmpeg if it reports no progress for this many
+            seconds (0 disables), so a hung encode fails instead of blocking
+
+    Returns:
+        The last progress_report() dict
+    """
+    args = shlex.split(cmd) if isinstance(cmd, str) else [str(arg) for arg in cmd]
+    args = args[:1] + ["-nostats", "-progress", "pipe:1"] + args[1:]
     print(f"\n{description}...")
-    print(f"Command: {cmd}\n")
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"❌ FFmpeg Error: {result.stderr}")
-        raise Exception(f"FFmpeg command failed: {cmd}")
-    print(f"✓ {description} completed")
-    return result
+    print(f"Command: {shlex.join(args)}\n")
+
+    started = time.time()
+    process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True)
+    # stderr must be drained while stdout is read, or a full pipe blocks ffmpeg
+    stderr_tail = deque(maxlen=50)
+    stderr_reader = threading.Thread(target=stderr_tail.extend, args=(process.stderr,), daemon=True)
+    stderr_reader.start()
+
+    last_seen = [started]
+    stalled = threading.Event()
+
+    def watchdog():
+        while process.poll() is None:
+            if stall_timeout and time.time() - last_seen[0] > stall_timeout:
+                stalled.set()
+                process.kill()
+                return
+            time.sleep(1)
+
+    threading.Thread(target=watchdog, daemon=True).start()
+
+    report = progress_report({}, duration)
+    fields = {}
+    for line in process.stdout:
+        key, _, value = line.strip().partition("=")
+        fields[key] = value
+        if key != "progress":
+            continue
+        last_seen[0] = time.time()
+        report = progress_report(fields, duration)
+        fields = {}
+        if progress:
+            try:
+                progress(report)
+            except Exception as e:
+                print(f"[FFMPEG] Progress callback failed: {e}")
+    process.wait()
+    stderr_reader.join()
+
+    if stalled.is_set():
+        raise Exception(f"FFmpeg stalled (no progress for {stall_timeout:.0f}s): {description}")
+    if process.returncode != 0:
+        print(f"❌ FFmpeg Error: {''.join(stderr_tail)}")
+        raise Exception(f"FFmpeg command failed: {shlex.join(args)}")
+    elapsed = time.time() - started
+    speed = f", {report['speed']:.2f}x realtime" if report["speed"] else ""
+    print(f"✓ {description} completed in {elapsed:.1f}s "
+          f"({report['frame']} frames, {report['frame'] / max(elapsed, 0.001):.0f} fps{speed})")
+    return report
+
+
+def get_render_profile(name=None):
+    """
+    Look up a render profile.
+
+    Args:
+        name: "draft", "standard", "archive" or None for RENDER_PROFILE
+
+    Returns:
+        Profile dictionary (preset, crf, width, height, fps, audio_bitrate, name)
+
+    Raises:
+        ValueError: If the profile does not exist
+    """
+    name = (name or DEFAULT_RENDER_PROFILE).lower()
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name} (expected one of {', '.join(RENDER_PROFILES)})")
+    return dict(RENDER_PROFILES[name], name=name)
+
+
+def final_video_name(profile=None, rendition="landscape"):
+    """Get the final video file name for a render profile and rendition."""
+    name = get_render_profile(profile)["name"]
+    suffix = "".join(f"_{part}" for part, default in ((name, "standard"), (rendition, "landscape"))
+                     if part != default)
+    return f"final_video_with_scoreboards{suffix}.mp4"
+
+
+def rendition_size(profile, rendition="landscape"):
+    """
+    Get the frame size of a rendition.
+
+    Returns:
+        (width, height): the profile's frame for landscape, swapped for
+        vertical, and the profile's height squared for square
+    """
+    width, height = profile["width"], profile["height"]
+    if rendition == "vertical":
+        return height, width
+    if rendition == "square":
+        return height, height
+    if rendition == "landscape":
+        return width, height
+    raise ValueError(f"Unknown rendition: {rendition} (expected one of {', '.join(RENDITIONS)})")
 
 
-def create_scoreboard_video_clip(image_path, duration, output_path):
-    """Convert a scoreboard image to a video clip."""
+def frame_filter(profile, rendition="landscape"):
+    """Scale and letterbox any input to a rendition's frame size and the profile's frame rate."""
+    width, height = rendition_size(profile, rendition)
+    return (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={profile['fps']},format=yuv420p"
+    )
+
+
+def matches_profile(video_file, profile, rendition="landscape"):
+    """Check whether a video is already H.264 at a rendition's frame size and the profile's frame rate."""
+    try:
+        info = probe(video_file)
+    except FileNotFoundError:
+        return False
+    video = next((stream for stream in info["streams"] if stream["type"] == "video"), {})
+    return (video.get("codec") == "h264" and (info["width"], info["height"]) == rendition_size(profile, rendition)
+            and info["fps"] is not None and abs(info["fps"] - profile["fps"]) < 0.01)
+
+
+def video_encode_args(profile):
+    # Every piece of the final video is encoded with the same settings, so
+    # pieces encoded separately can be joined without re-encoding
+    return f"-c:v libx264 -preset {profile['preset']} -crf {profile['crf']} -pix_fmt yuv420p"
+
+
+def audio_encode_args(profile):
+    return f"-c:a aac -b:a {profile['audio_bitrate']}"
+
+
+def mp4_muxer_args(layout=None):
+    """
+    Get the MP4 muxer options for a final video.
+
+    Args:
+        layout: "faststart" or "fragmented" (default: MP4_LAYOUT)
+    """
+    layout = (layout or MP4_LAYOUT).lower()
+    if layout == "faststart":
+        return "-movflags +faststart"
+    if layout == "fragmented":
+        # A fragment at least every 2 seconds, so a growing file is playable almost immediately
+        return "-movflags +frag_keyframe+empty_moov+default_base_moof -frag_duration 2000000"
+    raise ValueError(f"Unknown MP4 layout: {layout} (expected one of {', '.join(MP4_LAYOUTS)})")
+
+
+def still_clip_key(image_path, duration, frame_filter, encode_args):
+    """Get the clip cache key for a still image encoded with the given settings."""
+    return clip_cache.key(image_path, kind="still", duration=duration,
+                          frame_filter=frame_filter, encode_args=encode_args)
+
+
+def create_scoreboard_video_clip(image_path, duration, output_path, profile=None):
+    """Convert a scoreboard image to a video clip (reused from the clip cache when possible)."""
+    profile = get_render_profile(profile) if not isinstance(profile, dict) else profile
+    still_filter = frame_filter(profile)
+    encode_args = video_encode_args(profile)
+    key = still_clip_key(image_path, duration, still_filter, encode_args)
+    if clip_cache.fetch(key, output_path):
+        print(f"✓ Reused cached clip for {Path(image_path).name}")
+        return
     cmd = (
-        f'ffmpeg -y -loop 1 -i "{image_path}" -t {duration} '
-        f'-c:v libx264 -pix_fmt yuv420p -vf "scale=1920:1080:force_original_aspect_ratio=decrease,'
-        f'pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1" -r 30 "{output_path}"'
+        f'ffmpeg -y -loop 1 -framerate {profile["fps"]} -t {duration} -i "{image_path}" '
+        f'-vf "{still_filter}" {encode_args} "{output_path}"'
     )
     run_ffmpeg_cmd(cmd, f"Creating video clip from {Path(image_path).name}")
+    clip_cache.store(key, output_path)
+
+
+def scratch_base(match_folder):
+    """
+    Pick the folder that holds a run's scratch folder.
+
+    Returns:
+        VIDEO_SCRATCH_DIR if it is set, exists and has at least
+        VIDEO_SCRATCH_MIN_FREE_MB free; the match folder otherwise
+    """
+    if not VIDEO_SCRATCH_DIR:
+        return Path(match_folder)
+    try:
+        free = shutil.disk_usage(VIDEO_SCRATCH_DIR).free
+    except FileNotFoundError:
+        print(f"⚠️  Scratch folder {VIDEO_SCRATCH_DIR} not found, using the match folder")
+        return Path(match_folder)
+    if free < VIDEO_SCRATCH_MIN_FREE_MB * 1024 * 1024:
+        print(f"⚠️  Only {free / 1024 / 1024:.0f} MB free in {VIDEO_SCRATCH_DIR}, using the match folder")
+        return Path(match_folder)
+    return Path(VIDEO_SCRATCH_DIR)
+
+
+def video_piece(video_file, start, duration=None):
+    """A part of the avatar video (duration None: until the end)."""
+    return {"kind": "video", "source": str(video_file), "start": start, "duration": duration}
+
+
+def still_piece(image_file, duration):
+    """A still image (scoreboard) shown for duration seconds."""
+    return {"kind": "still", "source": str(image_file), "start": 0, "duration": duration}
+
+
+def piece_input(piece, profile, offset=0, duration=None):
+    """
+    Get ffmpeg input options reading part of a piece.
+
+    Args:
+        piece: video_piece() or still_piece()
+        profile: Render profile (stills are looped at its frame rate)
+        offset: Seconds into the piece to start from
+        duration: Seconds to read (default: the rest of the piece)
+    """
+    if duration is None and piece["duration"] is not None:
+        duration = piece["duration"] - offset
+    length = f"-t {duration} " if duration is not None else ""
+    if piece["kind"] == "still":
+        return f'-loop 1 -framerate {profile["fps"]} {length}-i "{piece["source"]}"'
+    return f'-ss {piece["start"] + offset} {length}-i "{piece["source"]}"'
+
+
+def piece_timing(piece):
+    # setpts must come before fps, or xfade sees an unknown frame rate
+    return "null" if piece["kind"] == "still" else "setpts=PTS-STARTPTS"
+
+
+def piece_filter(piece, profile, rendition="landscape"):
+    """Get the filter chain that normalises a piece to a rendition's frame format."""
+    if piece["kind"] == "still":
+        return frame_filter(profile, rendition)
+    return f"{piece_timing(piece)},{frame_filter(profile, rendition)}"
+
+
+def render_single_pass(pieces, audio_file, fade_duration, outputs, profile, muxer_args="", progress=None,
+                       duration=None):
+    """
+    Render pieces joined by fade transitions, plus the audio, with one ffmpeg process.
+
+    The pieces are separate (input-seeked) inputs, and the scaling, padding,
+    xfade transitions and audio mux all happen in one filter_complex. With
+    several renditions each input is decoded once and split, and every
+    rendition gets its own scale/xfade chain and encode in the same process.
+
+    Args:
+        pieces: List of video_piece()/still_piece()
+        audio_file: Commentary audio
+        fade_duration: Crossfade length in seconds
+        outputs: {rendition: output path}
+        profile: Render profile
+        muxer_args: Output options such as mp4_muxer_args()
+        progress: Optional progress callback (see run_ffmpeg_cmd())
+        duration: Expected output length in seconds
+    """
+    renditions = list(outputs)
+    input_args = [f'-i "{audio_file}"']
+    filter_parts = []
+    labels = {rendition: [] for rendition in renditions}
+    for k, piece in enumerate(pieces, 1):
+        input_args.append(piece_input(piece, profile))
+        if len(renditions) == 1:
+            filter_parts.append(f"[{k}:v]{piece_filter(piece, profile, renditions[0])}[s{k}r0]")
+        else:
+            branches = "".join(f"[p{k}r{j}]" for j in range(len(renditions)))
+            filter_parts.append(f"[{k}:v]{piece_timing(piece)},split={len(renditions)}{branches}")
+            for j, rendition in enumerate(renditions):
+                filter_parts.append(f"[p{k}r{j}]{frame_filter(profile, rendition)}[s{k}r{j}]")
+        for j, rendition in enumerate(renditions):
+            labels[rendition].append(f"[s{k}r{j}]")
+    
+    output_args = []
+    for j, rendition in enumerate(renditions):
+        # Each transition starts fade_duration before the end of the output so far
+        current_label = labels[rendition][0]
+        offset = pieces[0]["duration"]
+        for i, (piece, label) in enumerate(zip(pieces[1:], labels[rendition][1:]), 1):
+            offset -= fade_duration
+            output_label = f"[v{j}]" if i == len(pieces) - 1 else f"[x{i}r{j}]"
+            filter_parts.append(
+                f"{current_label}{label}xfade=transition=fade:duration={fade_duration}:offset={offset}{output_label}"
+            )
+            current_label = output_label
+            if piece["duration"] is not None:
+                offset += piece["duration"]
+        output_args.append(
+            f'-map "{current_label}" -map 0:a:0 '
+            f'{video_encode_args(profile)} {audio_encode_args(profile)} {muxer_args} -shortest "{outputs[rendition]}"'
+        )
+    
+    filter_complex = ";".join(filter_parts)
+    cmd = (
+        f'ffmpeg -y {" ".join(input_args)} '
+        f'-filter_complex "{filter_complex}" '
+        f'{" ".join(output_args)}'
+    )
+    run_ffmpeg_cmd(cmd, f"Rendering {', '.join(renditions)} in a single pass ({profile['name']} profile)",
+                   progress=progress, duration=duration)
+
+
+def render_parallel(pieces, audio_file, fade_duration, output_path, profile, work_dir, workers=None,
+                    rendition="landscape", muxer_args="", progress=None):
+    """
+    Render pieces joined by fade transitions, plus the audio, encoding the
+    parts concurrently.
+
+    Each piece's body (without the fade_duration windows it shares with its
+    neighbours) and each crossfade window is encoded once, straight from the
+    source, by its own ffmpeg process. The encoded parts are then joined
+    with a stream-copy concat that also muxes the audio.
+
+    Args:
+        pieces: List of video_piece()/still_piece(); only the last may have
+            no duration
+        audio_file: Commentary audio
+        fade_duration: Crossfade length in seconds
+        output_path: Final video path
+        profile: Render profile
+        work_dir: Empty folder for the intermediate parts, removed by the
+            caller (see scratch_directory())
+        workers: Concurrent ffmpeg processes (default: CPU count)
+        rendition: Frame shape to render (see RENDITIONS)
+        muxer_args: Output options of the joined video such as mp4_muxer_args()
+        progress: Optional callback receiving the combined progress of all
+            running encodes (see run_ffmpeg_cmd()), plus the current and peak
+            size of work_dir (scratch_bytes, scratch_peak_bytes)
+
+    Returns:
+        Peak size of work_dir in bytes
+    """
+    work_dir = Path(work_dir)
+    parts = []  # Encoded parts in playback order
+    jobs = []   # (description, output, ffmpeg input/filter args, clip cache key, seconds)
+    
+    for i, piece in enumerate(pieces):
+        first, last = i == 0, i == len(pieces) - 1
+        start = 0 if first else fade_duration
+        duration = None if piece["duration"] is None else piece["duration"] - start - (0 if last else fade_duration)
+        if duration is not None and duration <= 0:
+            raise ValueError(f"Piece {i + 1} is shorter than its fade transitions")
+        body = work_dir / f"part{2 * i:02d}_body.mp4"
+        parts.append(body)
+        cache_key = None
+        if piece["kind"] == "still" and clip_cache.enabled:
+            # Scoreboard bodies only depend on the image and duration
+            cache_key = still_clip_key(piece["source"], duration, frame_filter(profile, rendition),
+                                       video_encode_args(profile))
+        if cache_key and clip_cache.fetch(cache_key, body):
+            print(f"✓ Reused cached clip for {Path(piece['source']).name}")
+        else:
+            jobs.append((f"Encoding segment {i + 1}/{len(pieces)}", body,
+                         f'{piece_input(piece, profile, start, duration)} '
+                         f'-vf "{piece_filter(piece, profile, rendition)}" -an',
+                         cache_key, duration))
+        
+        if not last:
+            following = pieces[i + 1]
+            tail_start = piece["duration"] - fade_duration
+            window = work_dir / f"part{2 * i + 1:02d}_fade.mp4"
+            parts.append(window)
+            filter_complex = (
+                f"[0:v]{piece_filter(piece, profile, rendition)}[a];"
+                f"[1:v]{piece_filter(following, profile, rendition)}[b];"
+                f"[a][b]xfade=transition=fade:duration={fade_duration}:offset=0[v]"
+            )
+            jobs.append((f"Encoding transition {i + 1}/{len(pieces) - 1}", window,
+                         f'{piece_input(piece, profile, tail_start, fade_duration)} '
+                         f'{piece_input(following, profile, 0, fade_duration)} '
+                         f'-filter_complex "{filter_complex}" -map "[v]"', None, fade_duration))
+    
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(jobs)))
+    threads = max(1, cores // workers)
+    print(f"\n⚙️  Encoding {len(jobs)} parts with {workers} parallel ffmpeg process(es)...")
+    
+    # Latest report of every encode; fps and speed add up over the running ones
+    reports = {}
+    reports_lock = threading.Lock()
+    total_seconds = sum(job[4] for job in jobs)
+    size = directory_size(work_dir)  # Cached clips already linked in
+    scratch = {"current": size, "peak": size}
+    
+    def measure_scratch():
+        # Parts only grow while encoding, so finished encodes mark the peaks
+        size = directory_size(work_dir)
+        with reports_lock:
+            scratch["current"] = size
+            scratch["peak"] = max(scratch["peak"], size)
+    
+    def report_progress(output, info):
+        with reports_lock:
+            reports[output] = info
+            combined = {
+                "frame": sum(r["frame"] for r in reports.values()),
+                "fps": sum(r["fps"] for r in reports.values()),
+                "speed": sum(r["speed"] or 0 for r in reports.values()) or None,
+                "time": round(sum(r["time"] for r in reports.values()), 2),
+                "scratch_bytes": scratch["current"],
+                "scratch_peak_bytes": scratch["peak"],
+            }
+        combined["percent"] = round(min(100.0, combined["time"] / total_seconds * 100), 1) if total_seconds else None
+        progress(combined)
+    
+    def encode(job):
+        description, output, args, cache_key, seconds = job
+        on_progress = None
+        if progress:
+            def on_progress(info):
+                report_progress(output, dict(info, time=min(info["time"], seconds)))
+        final = run_ffmpeg_cmd(f'ffmpeg -y {args} {video_encode_args(profile)} -threads {threads} "{output}"',
+                               description, progress=on_progress, duration=seconds)
+        measure_scratch()
+        if progress:
+            report_progress(output, dict(final, fps=0.0, speed=None, time=seconds))
+        if cache_key:
+            clip_cache.store(cache_key, output)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() re-raises the first ffmpeg failure
+        list(executor.map(encode, jobs))
+    
+    concat_list = work_dir / "parts.txt"
+    with open(concat_list, 'w', encoding='utf-8') as f:
+        for part in parts:
+            f.write(f"file '{part.resolve()}'\n")
+    
+    cmd = (
+        f'ffmpeg -y -f concat -safe 0 -i "{concat_list}" -i "{audio_file}" '
+        f'-map 0:v:0 -map 1:a:0 -c:v copy {audio_encode_args(profile)} {muxer_args} -shortest "{output_path}"'
+    )
+    run_ffmpeg_cmd(cmd, "Joining parts and adding audio")
+    measure_scratch()
+    print(f"💾 Scratch space used: {scratch['peak'] / 1024 / 1024:.1f} MB peak in {work_dir}")
+    return scratch["peak"]
+
+
+def _rendition_progress(progress, index, count):
+    # Renditions rendered one after another share one 0-100% range
+    if progress is None or count == 1:
+        return progress
+    def report(info):
+        percent = info["percent"]
+        if percent is not None:
+            percent = round((index * 100 + percent) / count, 1)
+        progress(dict(info, percent=percent))
+    return report
 
 
 def combine_video_with_scoreboards(match_folder_path, video_before_scoreboard=6, scoreboard_duration=5, 
-                                  fade_duration=0.5):
+                                  fade_duration=0.5, mode=None, profile=None, layout=None, progress=None):
     """
-    Combine HeyGen video with scoreboard overlays using fade transitions.
+    Combine HeyGen video with scoreboard overlays into a landscape video.
+    
+    See combine_video_renditions() for the arguments.
+    
+    Returns:
+        Path of the final video, or None if it could not be created
+    """
+    outputs = combine_video_renditions(match_folder_path, ["landscape"], video_before_scoreboard,
+                                       scoreboard_duration, fade_duration, mode, profile, layout, progress)
+    return outputs["landscape"] if outputs else None
+
+
+def combine_video_renditions(match_folder_path, renditions=None, video_before_scoreboard=6, scoreboard_duration=5,
+                             fade_duration=0.5, mode=None, profile=None, layout=None, progress=None):
+    """
+    Combine HeyGen video with scoreboard overlays using fade transitions,
+    writing one file per rendition.
     
     Structure:
     - 5 seconds of video.mp4
@@ -65,10 +624,30 @@ def combine_video_with_scoreboards(match_folder_path, video_before_scoreboard=6,
     
     Args:
         match_folder_path: Path to the match folder containing video.mp4, commentary.mp3, and scoreboard images
+        renditions: Frame shapes to write, from RENDITIONS (default: VIDEO_RENDITIONS)
         video_before_scoreboard: Seconds of video before each scoreboard (default: 5)
         scoreboard_duration: How long to show each scoreboard (seconds, default: 4)
         fade_duration: Fade transition duration (seconds, default: 1.0)
+        mode: "single" or "parallel" (default: VIDEO_COMBINE_MODE)
+        profile: Render profile name (default: RENDER_PROFILE, see RENDER_PROFILES)
+        layout: "faststart" or "fragmented" MP4 (default: MP4_LAYOUT)
+        progress: Optional callback receiving encode progress dictionaries
+            (frame, fps, speed, time, percent; see run_ffmpeg_cmd()); parallel
+            mode adds scratch_bytes and scratch_peak_bytes, the current and
+            peak size of its intermediate parts
+    
+    Returns:
+        {rendition: final video path}, or None if the videos could not be created
     """
+    mode = (mode or VIDEO_COMBINE_MODE).lower()
+    if mode not in COMBINE_MODES:
+        raise ValueError(f"Unknown video combine mode: {mode} (expected one of {', '.join(COMBINE_MODES)})")
+    profile = get_render_profile(profile)
+    renditions = list(dict.fromkeys(renditions or VIDEO_RENDITIONS))
+    for rendition in renditions:
+        rendition_size(profile, rendition)  # Raises ValueError for unknown renditions
+    muxer_args = mp4_muxer_args(layout)
+    
     match_folder = Path(match_folder_path)
     
     # Check if match folder exists
@@ -95,9 +674,10 @@ def combine_video_with_scoreboards(match_folder_path, video_before_scoreboard=6,
     print(f"🎬 Creating Combined Video for {match_folder.name}")
     print(f"{'='*80}\n")
     
-    # Create temp directory
-    temp_dir = match_folder / "temp_video_combining"
-    temp_dir.mkdir(exist_ok=True)
+    # Clear parts and partial outputs of runs that were killed
+    remove_stale_scratch(match_folder, "combine")
+    if VIDEO_SCRATCH_DIR:
+        remove_stale_scratch(VIDEO_SCRATCH_DIR, "combine", temp_files=False)
     
     # Get video duration
     video_duration = get_duration(video_file)
@@ -115,207 +695,117 @@ def combine_video_with_scoreboards(match_folder_path, video_before_scoreboard=6,
     if has_scoreboard2:
         print(f"✓ Found {scoreboard2.name}")
     
-    # Output file
-    output_file = match_folder / "final_video_with_scoreboards.mp4"
+    # Output files
+    output_files = {rendition: match_folder / final_video_name(profile["name"], rendition)
+                    for rendition in renditions}
     
-    if not has_scoreboard1 and not has_scoreboard2:
-        # No scoreboards, just combine video with audio
+    if (not has_scoreboard1 and not has_scoreboard2 and renditions == ["landscape"]
+            and matches_profile(video_file, profile)):
+        # No scoreboards and the video is already in the profile's format: just add the audio
+        output_file = output_files["landscape"]
         print(f"\n🎵 No scoreboards found. Adding commentary audio to video...")
-        cmd = (
-            f'ffmpeg -y -i "{video_file}" -i "{audio_file}" '
-            f'-c:v copy -c:a aac -b:a 192k -map 0:v:0 -map 1:a:0 '
-            f'-shortest "{output_file}"'
-        )
-        run_ffmpeg_cmd(cmd, "Adding audio to video")
+        with atomic_output(output_file) as temp_output:
+            cmd = (
+                f'ffmpeg -y -i "{video_file}" -i "{audio_file}" '
+                f'-c:v copy {audio_encode_args(profile)} -map 0:v:0 -map 1:a:0 '
+                f'{muxer_args} -shortest "{temp_output}"'
+            )
+            run_ffmpeg_cmd(cmd, "Adding audio to video", progress=progress,
+                           duration=min(video_duration, audio_duration) or None)
         final_duration = get_duration(output_file)
         print(f"\n✅ Created video: {output_file} ({final_duration:.2f}s)")
-        return str(output_file)
-    
-    print(f"\n📊 Creating video with scoreboard overlays and fade transitions...")
-    
-    # Create scoreboard video clips with matching frame rate
-    if has_scoreboard1:
-        scoreboard1_video = temp_dir / "scoreboard1_clip.mp4"
-        cmd = (
-            f'ffmpeg -y -loop 1 -i "{scoreboard1}" -t {scoreboard_duration} '
-            f'-c:v libx264 -pix_fmt yuv420p -vf "scale=1920:1080:force_original_aspect_ratio=decrease,'
-            f'pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=25" -r 25 "{scoreboard1_video}"'
-        )
-        run_ffmpeg_cmd(cmd, f"Creating video clip from {scoreboard1.name}")
+        return {"landscape": str(output_file)}
     
-    if has_scoreboard2:
-        scoreboard2_video = temp_dir / "scoreboard2_clip.mp4"
-        cmd = (
-            f'ffmpeg -y -loop 1 -i "{scoreboard2}" -t {scoreboard_duration} '
-            f'-c:v libx264 -pix_fmt yuv420p -vf "scale=1920:1080:force_original_aspect_ratio=decrease,'
-            f'pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=25" -r 25 "{scoreboard2_video}"'
-        )
-        run_ffmpeg_cmd(cmd, f"Creating video clip from {scoreboard2.name}")
-    
-    # Split the main video into segments and scale them to 1920x1080
-    # Segment 1: 0 to video_before_scoreboard seconds
-    video_segment1 = temp_dir / "video_seg1.mp4"
-    cmd = (
-        f'ffmpeg -y -i "{video_file}" -ss 0 -t {video_before_scoreboard} '
-        f'-vf "scale=1920:1080:force_original_aspect_ratio=decrease,'
-        f'pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1" '
-        f'-c:v libx264 -preset medium -crf 23 -c:a copy "{video_segment1}"'
-    )
-    run_ffmpeg_cmd(cmd, "Extracting and scaling video segment 1")
+    if has_scoreboard1 or has_scoreboard2:
+        print(f"\n📊 Creating {', '.join(renditions)} video with scoreboard overlays and fade transitions...")
+    else:
+        print(f"\n🎵 No scoreboards found. Rendering {', '.join(renditions)} video with commentary audio...")
     
-    # Calculate time offsets
-    offset_after_sb1 = video_before_scoreboard + scoreboard_duration
-    
-    # Segment 2: After scoreboard1 for video_before_scoreboard seconds
-    video_segment2 = temp_dir / "video_seg2.mp4"
-    cmd = (
-        f'ffmpeg -y -i "{video_file}" -ss {video_before_scoreboard} -t {video_before_scoreboard} '
-        f'-vf "scale=1920:1080:force_original_aspect_ratio=decrease,'
-        f'pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1" '
-        f'-c:v libx264 -preset medium -crf 23 -c:a copy "{video_segment2}"'
-    )
-    run_ffmpeg_cmd(cmd, "Extracting and scaling video segment 2")
-    
-    # Segment 3: Rest of the video
-    offset_after_sb2 = video_before_scoreboard + video_before_scoreboard + scoreboard_duration
-    remaining_duration = video_duration - (video_before_scoreboard * 2)
-    video_segment3 = temp_dir / "video_seg3.mp4"
-    cmd = (
-        f'ffmpeg -y -i "{video_file}" -ss {video_before_scoreboard * 2} '
-        f'-vf "scale=1920:1080:force_original_aspect_ratio=decrease,'
-        f'pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1" '
-        f'-c:v libx264 -preset medium -crf 23 -c:a copy "{video_segment3}"'
-    )
-    run_ffmpeg_cmd(cmd, "Extracting and scaling video segment 3")
-    
-    # Now create the final video with xfade transitions
-    print(f"\n🎬 Creating video with fade transitions...")
-    
-    # Build complex filter for xfade transitions
     # Structure: [seg1] -> fade -> [scoreboard1] -> fade -> [seg2] -> fade -> [scoreboard2] -> fade -> [seg3]
-    
-    filter_parts = []
-    input_files = []
-    
-    # Add video segment 1
-    input_files.append(str(video_segment1))
-    current_label = "[0:v]"
-    offset = 0.0
-    
+    # Segment 1: 0 to video_before_scoreboard seconds
+    # Segment 2: the next video_before_scoreboard seconds
+    # Segment 3: rest of the video
+    pieces = [video_piece(video_file, 0, video_before_scoreboard)]
     if has_scoreboard1:
-        # Add scoreboard 1
-        input_files.append(str(scoreboard1_video))
-        input_idx = len(input_files) - 1
-        offset += video_before_scoreboard - fade_duration
-        
-        # Fade from video to scoreboard1
-        filter_parts.append(
-            f"{current_label}[{input_idx}:v]xfade=transition=fade:duration={fade_duration}:offset={offset}[v{input_idx}]"
-        )
-        current_label = f"[v{input_idx}]"
-        offset += scoreboard_duration
-    
-    # Add video segment 2
-    input_files.append(str(video_segment2))
-    input_idx = len(input_files) - 1
-    offset -= fade_duration
-    
-    filter_parts.append(
-        f"{current_label}[{input_idx}:v]xfade=transition=fade:duration={fade_duration}:offset={offset}[v{input_idx}]"
-    )
-    current_label = f"[v{input_idx}]"
-    offset += video_before_scoreboard
-    
+        pieces.append(still_piece(scoreboard1, scoreboard_duration))
+    pieces.append(video_piece(video_file, video_before_scoreboard, video_before_scoreboard))
     if has_scoreboard2:
-        # Add scoreboard 2
-        input_files.append(str(scoreboard2_video))
-        input_idx = len(input_files) - 1
-        offset -= fade_duration
-        
-        # Fade from video to scoreboard2
-        filter_parts.append(
-            f"{current_label}[{input_idx}:v]xfade=transition=fade:duration={fade_duration}:offset={offset}[v{input_idx}]"
-        )
-        current_label = f"[v{input_idx}]"
-        offset += scoreboard_duration
-    
-    # Add video segment 3
-    input_files.append(str(video_segment3))
-    input_idx = len(input_files) - 1
-    offset -= fade_duration
-    
-    filter_parts.append(
-        f"{current_label}[{input_idx}:v]xfade=transition=fade:duration={fade_duration}:offset={offset}[vout]"
-    )
-    
-    # Build the ffmpeg command
-    inputs = " ".join([f'-i "{f}"' for f in input_files])
-    filter_complex = ";".join(filter_parts)
-    
-    final_video_no_audio = temp_dir / "final_video_no_audio.mp4"
-    cmd = (
-        f'ffmpeg -y {inputs} '
-        f'-filter_complex "{filter_complex}" '
-        f'-map "[vout]" -c:v libx264 -preset medium -crf 23 -pix_fmt yuv420p '
-        f'"{final_video_no_audio}"'
-    )
-    run_ffmpeg_cmd(cmd, "Creating video with fade transitions")
-    
-    # Add commentary audio
-    print(f"\n🎵 Adding commentary audio to video...")
-    cmd = (
-        f'ffmpeg -y -i "{final_video_no_audio}" -i "{audio_file}" '
-        f'-c:v copy -c:a aac -b:a 192k -map 0:v:0 -map 1:a:0 '
-        f'-shortest "{output_file}"'
-    )
-    run_ffmpeg_cmd(cmd, "Adding audio to video")
-    
-    # Cleanup temp files
-    print(f"\n🧹 Cleaning up temporary files...")
-    for temp_file in temp_dir.glob("*"):
-        temp_file.unlink()
-    temp_dir.rmdir()
-    
-    final_duration = get_duration(output_file)
+        pieces.append(still_piece(scoreboard2, scoreboard_duration))
+    pieces.append(video_piece(video_file, video_before_scoreboard * 2))
+    if not has_scoreboard1 and not has_scoreboard2:
+        # Only scaling and reframing the video to the profile, no transitions needed
+        pieces = [video_piece(video_file, 0)]
+    
+    # Output length for progress: the pieces minus their overlaps, cut to the audio by -shortest
+    last_duration = video_duration - (video_before_scoreboard * 2 if len(pieces) > 1 else 0)
+    timeline = (sum(piece["duration"] for piece in pieces[:-1]) + last_duration
+                - fade_duration * (len(pieces) - 1))
+    expected_duration = min(timeline, audio_duration) or None
+    
+    # Write to temp files so final_video_with_scoreboards.mp4 only exists once complete
+    with ExitStack() as stack:
+        temp_outputs = {rendition: stack.enter_context(atomic_output(output_file))
+                        for rendition, output_file in output_files.items()}
+        if mode == "parallel" and len(pieces) > 1:
+            # The last segment's body needs a known length to end its fade-in
+            pieces[-1]["duration"] = last_duration
+            for index, (rendition, temp_output) in enumerate(temp_outputs.items()):
+                with scratch_directory(scratch_base(match_folder), "combine") as work_dir:
+                    render_parallel(pieces, audio_file, fade_duration, temp_output, profile, work_dir,
+                                    rendition=rendition, muxer_args=muxer_args,
+                                    progress=_rendition_progress(progress, index, len(temp_outputs)))
+        else:
+            render_single_pass(pieces, audio_file, fade_duration, temp_outputs, profile, muxer_args,
+                               progress=progress, duration=expected_duration)
     
     print(f"\n{'='*80}")
     print(f"✅ Successfully created combined video!")
     print(f"{'='*80}")
-    print(f"📁 Output: {output_file}")
-    print(f"⏱️  Duration: {final_duration:.2f}s")
+    for output_file in output_files.values():
+        print(f"📁 Output: {output_file}")
+        print(f"⏱️  Duration: {get_duration(output_file):.2f}s")
     print(f"{'='*80}\n")
     
-    return str(output_file)
+    return {rendition: str(output_file) for rendition, output_file in output_files.items()}
 
 
 def main():
     """Main entry point."""
+    import argparse
     import sys
-    
-    if len(sys.argv) < 2:
-        print("Usage: python video_combining.py <match_folder_path> [video_before_scoreboard] [scoreboard_duration] [fade_duration]")
-        print("\nExample:")
-        print("  python video_combining.py commentaries/match_22_KXIP_vs_KKR")
-        print("\nDefault values:")
-        print("  video_before_scoreboard: 5 seconds")
-        print("  scoreboard_duration: 3 seconds")
-        print("  fade_duration: 1.0 seconds")
-        sys.exit(1)
-    
-    match_folder = sys.argv[1]
-    video_before_scoreboard = float(sys.argv[2]) if len(sys.argv) > 2 else 6.0
-    scoreboard_duration = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
-    fade_duration = float(sys.argv[4]) if len(sys.argv) > 4 else 1.0
-    
+
+    parser = argparse.ArgumentParser(description="Combine a highlight video with scoreboard images")
+    parser.add_argument("match_folder", help="Match folder containing the video, audio and scoreboards")
+    parser.add_argument("video_before_scoreboard", nargs="?", type=float, default=6.0,
+                        help="Seconds of video before the first scoreboard (default: 6)")
+    parser.add_argument("scoreboard_duration", nargs="?", type=float, default=5.0,
+                        help="Seconds each scoreboard is shown (default: 5)")
+    parser.add_argument("fade_duration", nargs="?", type=float, default=1.0,
+                        help="Crossfade length in seconds (default: 1.0)")
+    parser.add_argument("--profile", choices=list(RENDER_PROFILES),
+                        help="Render profile (default: RENDER_PROFILE or standard)")
+    parser.add_argument("--mode", choices=COMBINE_MODES,
+                        help="Combine mode (default: VIDEO_COMBINE_MODE or single)")
+    parser.add_argument("--renditions", nargs="+", choices=RENDITIONS,
+                        help="Frame shapes to write (default: VIDEO_RENDITIONS or landscape)")
+    parser.add_argument("--layout", choices=MP4_LAYOUTS,
+                        help="MP4 layout (default: MP4_LAYOUT or faststart)")
+    args = parser.parse_args()
+
     try:
-        result = combine_video_with_scoreboards(
-            match_folder, 
-            video_before_scoreboard=video_before_scoreboard,
-            scoreboard_duration=scoreboard_duration,
-            fade_duration=fade_duration
+        result = combine_video_renditions(
+            args.match_folder,
+            renditions=args.renditions,
+            video_before_scoreboard=args.video_before_scoreboard,
+            scoreboard_duration=args.scoreboard_duration,
+            fade_duration=args.fade_duration,
+            mode=args.mode,
+            profile=args.profile,
+            layout=args.layout
         )
         if result:
-            print(f"✓ Video created successfully: {result}")
+            for path in result.values():
+                print(f"✓ Video created successfully: {path}")
         else:
             print("❌ Failed to create video")
             sys.exit(1)
@@ -1,317 +1,606 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import (Flask, render_template, request, jsonify, send_file, send_from_directory, Response,
+                   stream_with_context)
 import json
 import os
 from dotenv import load_dotenv
-import glob
 from datetime import datetime
-from commentary import get_langchain_response
-from texttospeech import text_to_speech_file, clean_commentary_text
+from commentary import get_langchain_response, COMMENTARY_SETTINGS, FALLBACK_RESPONSE
+from texttospeech import text_to_speech_file, clean_commentary_text, SPEECH_SETTINGS
 from aivideo import (upload_audio_file, generate_video, wait_for_video_with_webhook_fallback,
-                     DEFAULT_AVATAR_ID, WEBHOOK_URL)
-import threading
+                     AVATAR_SETTINGS, DEFAULT_AVATAR_ID, WEBHOOK_URL)
 import sys
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
 
 # Add graphs_gen to path for scoreboard generation
 sys.path.insert(0, str(Path(__file__).parent / "graphs_gen"))
-from img_generator import generate_scoreboards_sync
+from img_generator import generate_scoreboards_sync, resolve_engine, HTML_TEMPLATE, SCOREBOARD_ENGINE
 
 # Import video combining
-from video_combining import combine_video_with_scoreboards
+from video_combining import (combine_video_renditions, final_video_name, get_render_profile,
+                             MP4_LAYOUT, RENDITIONS, VIDEO_RENDITIONS)
+from clip_cache import file_digest
+from artifact_cache import artifact_cache, artifact_key, load_manifest
+from media_probe import get_duration
+from stream_packaging import (HLS_JS_INTEGRITY, HLS_JS_URL, STREAM_FORMATS, STREAM_MIMETYPES, package_stream,
+                              packaged_stream, stream_dir_for)
+from match_catalog import catalog, match_folder_path
+from pipeline import Pipeline, Stage
+from rate_limiter import rate_limit_metrics
+from job_queue import JobScheduler, QueueFullError, PRIORITIES, PRIORITY_NORMAL, PRIORITY_HIGH
+from file_utils import atomic_write, directory_size, follow_file, match_lock, partial_output
+from job_store import create_job_store, process_id, is_active, owner_alive, TERMINAL_STATUSES
 
 load_dotenv()
 API_KEY = os.getenv("HEYGEN_API_KEY")
 app = Flask(__name__)
 
-# Global variable to track generation status
-generation_status = {}
+# Job status records (shared across workers and restarts with the SQLite backend)
+job_store = create_job_store()
+
+# Bounded worker pool that runs generate_highlight_async
+scheduler = JobScheduler()
+
+# Makes the "already running?" check and the submit in /api/generate atomic
+submit_lock = threading.Lock()
+
+# Each /api/events stream (and each preview of a video still rendering, see
+# download_video) occupies a worker thread for as long as it is open; keep
+# enough threads free for the other routes (render.yaml runs 16 per worker)
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", "8"))
+open_streams = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+# Parse all seasons up front (shared with workers when gunicorn uses --preload)
+catalog.preload()
 
 def load_matches(year):
-    """Load matches from the JSON file for a specific year."""
-    json_file = f"data/ipl_{year}.json"
-    try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            matches = json.load(f)
-        return matches
-    except FileNotFoundError:
-        return []
-    except json.JSONDecodeError:
-        return []
+    """Load matches for a specific year from the shared match catalog."""
+    return catalog.get_matches(year)
 
 def get_available_years():
     """Get list of available IPL years from data folder."""
-    years = []
-    for file in glob.glob("data/ipl_*.json"):
-        year = file.split('_')[1].split('.')[0]
-        years.append(year)
-    return sorted(years)
+    return catalog.available_years()
 
-def generate_highlight_async(year, match_num, match_data):
-    """Generate highlight asynchronously."""
-    global generation_status
+def highlight_job_id(year, match_num, profile="standard"):
+    """Get the job ID of a highlight; renders with another profile than standard get their own job."""
+    if profile == "standard":
+        return f"{year}_{match_num}"
+    return f"{year}_{match_num}_{profile}"
+
+def parse_job_id(job_id):
+    """Split a job ID from highlight_job_id() into (year, match_num, profile)."""
+    parts = job_id.split('_')
+    if len(parts) == 2:
+        return parts[0], parts[1], "standard"
+    year, match_num, profile = parts
+    return year, match_num, profile
+
+def final_video_paths(match_folder, profile="standard"):
+    """Get the {rendition: path} final videos a job produces (VIDEO_RENDITIONS)."""
+    return {rendition: f"{match_folder}/{final_video_name(profile, rendition)}" for rendition in VIDEO_RENDITIONS}
+
+# Timings of the scoreboard cut in the final video
+FINAL_VIDEO_TIMINGS = {"video_before_scoreboard": 6, "scoreboard_duration": 5, "fade_duration": 1.0}
+
+SCOREBOARD_FILES = ["scoreboard_inning1.png", "scoreboard_inning2.png"]
+
+def scoreboard_files(match_data):
+    """Get the scoreboard images a match's final video shows: one per innings played (none if abandoned)."""
+    return SCOREBOARD_FILES[:len(match_data.get("innings") or [])]
+
+def scoreboard_key(match_data):
+    """Artifact key of a match's scoreboard images: the match data, engine and HTML template."""
+    try:
+        engine = resolve_engine()
+    except ValueError:
+        engine = SCOREBOARD_ENGINE
+    template = file_digest(HTML_TEMPLATE) if engine == "browser" else None
+    return artifact_key("scoreboards", match_data=match_data, engine=engine, template=template)
+
+def final_video_key(video_key, audio_key, scoreboards_key, profile):
+    """Artifact key of a job's final videos (scoreboards_key is None if it was cut without scoreboards)."""
+    return artifact_key("final_video", video=video_key, audio=audio_key, scoreboards=scoreboards_key,
+                        profile=profile, renditions=VIDEO_RENDITIONS, layout=MP4_LAYOUT, **FINAL_VIDEO_TIMINGS)
+
+def commentary_prompt(year, match_num, match_data):
+    """Build the prompt the commentary is generated from."""
+    match_json_str = json.dumps(match_data, indent=2)
+    return f"""Here is the match data for IPL {year} Match #{match_num}:
+
+{match_json_str}
+
+Please generate an exciting and detailed 1:30 minute cricket commentary summarizing this match."""
+
+def highlight_keys(year, match_num, match_data, profile="standard"):
+    """
+    Get the artifact key of every stage of a highlight (see artifact_cache.py).
     
-    job_id = f"{year}_{match_num}"
+    Returns:
+        {stage: key} for commentary, audio, avatar_video, scoreboards and final_video
+    """
+    keys = {"commentary": artifact_key("commentary", prompt=commentary_prompt(year, match_num, match_data),
+                                       **COMMENTARY_SETTINGS)}
+    keys["audio"] = artifact_key("audio", commentary=keys["commentary"], **SPEECH_SETTINGS)
+    keys["avatar_video"] = artifact_key("avatar_video", audio=keys["audio"], **AVATAR_SETTINGS)
+    keys["scoreboards"] = scoreboard_key(match_data)
+    keys["final_video"] = final_video_key(keys["avatar_video"], keys["audio"], keys["scoreboards"], profile)
+    return keys
+
+def final_videos_current(year, match_num, match_data, profile="standard"):
+    """
+    Check that a highlight's final videos exist and were made from its current inputs.
     
-    # Update existing status instead of reinitializing
-    # (status was already initialized in the /api/generate endpoint)
-    if job_id not in generation_status:
-        generation_status[job_id] = {
-            "status": "starting",
-            "progress": 0,
-            "message": "Initializing...",
-            "video_url": None,
-            "error": None
-        }
+    Videos made before the folder had a manifest count as current (the
+    pipeline adopts them).
+    """
+    match_folder = match_folder_path(year, match_num, match_data)
+    if not all(os.path.exists(path) for path in final_video_paths(match_folder, profile).values()):
+        return False
+    entry = load_manifest(match_folder).get(f"final_video_{profile}")
+    # The key includes the current scoreboards (of however many innings the match
+    # has); a video cut after they failed to render has another key and is redone
+    return entry is None or entry["key"] == highlight_keys(year, match_num, match_data, profile)["final_video"]
+
+@lru_cache(maxsize=256)
+def _content_etag(path, size, mtime_ns):
+    return file_digest(path)[:32]
+
+def file_etag(path):
+    """Strong ETag for a file: its SHA-256, computed once per size and modification time."""
+    stat = os.stat(path)
+    return _content_etag(str(path), stat.st_size, stat.st_mtime_ns)
+
+def download_url(job_id, final_video):
+    """Get the download URL of a job, versioned by the video's ETag so it can be cached forever."""
+    if not os.path.exists(final_video):
+        return f"/api/download/{job_id}"
+    return f"/api/download/{job_id}?v={file_etag(final_video)}"
+
+def stream_fields(job_id, final_video):
+    """Get the job fields pointing at the packaged HLS/DASH stream of a final video (empty if not packaged)."""
+    stream_dir = stream_dir_for(final_video)
+    playlists = packaged_stream(stream_dir)
+    fields = {"stream_dir": str(stream_dir)} if playlists else {}
+    if "hls" in playlists:
+        fields["stream_url"] = f"/api/stream/{job_id}/{playlists['hls']}"
+    if "dash" in playlists:
+        fields["dash_url"] = f"/api/stream/{job_id}/{playlists['dash']}"
+    return fields
+
+def encode_progress(job_id, status, message, start, end, interval=1.0):
+    """
+    Make an ffmpeg progress callback that reports into a job's status.
     
-    try:
-        # Update status
-        generation_status[job_id]["status"] = "starting"
-        generation_status[job_id]["progress"] = 5
-        generation_status[job_id]["message"] = "Setting up..."
-        
-        teams = match_data.get('teams', ['Unknown', 'Unknown'])
-        team_names = "_vs_".join(teams)
-        # Create folder structure: commentaries/year/match_X_TEAM_vs_TEAM
-        match_folder = f"commentaries/{year}/match_{match_num}_{team_names}"
-        os.makedirs(match_folder, exist_ok=True)
+    The encode's percent is mapped onto the [start, end] part of the job's
+    progress bar, and frame/fps/speed are kept in the "encode" field, so a
+    slow encode can be told apart from a stuck one. Scratch space reported
+    by parallel renders goes in the "disk_usage" field. Updates are written
+    at most once per interval seconds.
+    """
+    last_update = [0.0]
+    
+    def report(info):
+        now = time.time()
+        if now - last_update[0] < interval and info["percent"] != 100:
+            return
+        last_update[0] = now
+        percent = info["percent"] or 0
+        speed = f", {info['speed']:.2f}x realtime" if info["speed"] else ""
+        usage = {}
+        if "scratch_bytes" in info:
+            usage["disk_usage"] = {"scratch_bytes": info["scratch_bytes"],
+                                   "scratch_peak_bytes": info["scratch_peak_bytes"]}
+        job_store.update(job_id, status=status, progress=int(start + (end - start) * percent / 100),
+                         message=f"{message} {percent:.0f}% ({info['fps']:.0f} fps{speed})",
+                         encode=dict(info, updated_at=now), **usage)
+    return report
+
+def disk_usage(job, match_folder, final_videos):
+    """
+    Disk usage of a finished job, in bytes: its final videos, its whole
+    match folder, and the peak scratch space of the render (0 when the
+    video was not rendered in parallel mode by this job).
+    """
+    usage = dict(job.get("disk_usage") or {}, scratch_bytes=0)
+    usage.setdefault("scratch_peak_bytes", 0)
+    usage["final_video_bytes"] = sum(os.path.getsize(path) for path in final_videos.values()
+                                     if os.path.exists(path))
+    usage["match_folder_bytes"] = directory_size(match_folder)
+    return usage
+
+def new_job_record(year, match_num, priority=PRIORITY_NORMAL, message="Waiting in queue...", profile="standard"):
+    """Create the initial status record for a queued job."""
+    return {
+        "status": "queued",
+        "progress": 0,
+        "message": message,
+        "video_url": None,
+        "error": None,
+        "year": str(year),
+        "match_number": int(match_num),
+        "priority": priority,
+        "profile": profile,
+        "owner": process_id(),
+        "created_at": datetime.now().isoformat()
+    }
+
+def start_job_record(job_id, record):
+    """
+    Store the record of a job about to start, unless the job is already
+    running here or in another process (worker or batch_generate.py).
+    
+    The check and the write are one job_store.claim(), so two processes cannot
+    both start the same job. The HeyGen render ID of an unfinished earlier
+    attempt is kept so it is not paid for twice.
+    
+    Returns:
+        The stored record, or None if the job is active
+    """
+    def start(previous):
+        fields = dict(record)
+        if previous is not None and previous.get("status") not in TERMINAL_STATUSES:
+            fields["heygen_video_id"] = previous.get("heygen_video_id")
+        return fields
+    return job_store.claim(job_id, process_id(), lambda current: not is_active(current), record=start)
+
+def read_commentary(commentary_file):
+    """Read the commentary text from commentary.txt (without its header)."""
+    with open(commentary_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    parts = content.split("="*80)
+    return parts[1].strip() if len(parts) >= 2 else content
+
+def highlight_pipeline(job_id, year, match_num, match_data, profile, match_folder):
+    """
+    Plan the stages a highlight still needs.
+    
+    Outputs that are current or in the artifact cache are restored first
+    (see artifact_cache.py), and only the stages making the rest are added:
+    
+        commentary -> audio -> upload_audio -> heygen_render -> download_video --+
+        scoreboards -------------------------------------------------------------+-> final_video -> stream
+    
+    Scoreboards only need the match data, so they are rendered while the
+    commentary, audio and HeyGen video are made (see pipeline.py). Stages
+    name the API they call (gemini, elevenlabs, heygen) or "cpu" for local
+    rendering, so PIPELINE_LIMITS can cap each across all running jobs.
+    
+    Returns:
+        (Pipeline, {value name: value} for the restored outputs)
+    """
+    keys = highlight_keys(year, match_num, match_data, profile)
+    teams = match_data.get('teams', ['Unknown', 'Unknown'])
+    commentary_file = f"{match_folder}/commentary.txt"
+    audio_filename = f"{match_folder}/commentary.mp3"
+    video_path = f"{match_folder}/video.mp4"
+    video_url_file = f"{match_folder}/video_url.txt"
+    scoreboard_names = scoreboard_files(match_data)
+    scoreboard_paths = [f"{match_folder}/{name}" for name in scoreboard_names]
+    final_videos = final_video_paths(match_folder, profile)
+    final_video_file = final_videos[VIDEO_RENDITIONS[0]]
+    final_stage = f"final_video_{profile}"
+    final_video_names = [os.path.basename(path) for path in final_videos.values()]
+    
+    def generate_commentary(inputs):
+        job_store.update(job_id, status="generating_commentary", progress=20,
+                         message="Generating AI commentary...")
+        commentary = get_langchain_response(commentary_prompt(year, match_num, match_data))
+        if commentary == FALLBACK_RESPONSE:
+            raise Exception("Commentary generation failed")
         
-        # Step 1: Save match data
-        generation_status[job_id]["status"] = "saving_data"
-        generation_status[job_id]["progress"] = 10
-        generation_status[job_id]["message"] = "Saving match data..."
+        with atomic_write(commentary_file) as f:
+            f.write(f"IPL {year} - Match {match_num}\n")
+            f.write(f"Teams: {' vs '.join(teams)}\n")
+            f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write("="*80 + "\n\n")
+            f.write(commentary)
+            f.write("\n\n" + "="*80 + "\n")
+        artifact_cache.save(match_folder, "commentary", keys["commentary"], ["commentary.txt"])
+        print(f"[DEBUG] Generated new commentary and saved to {commentary_file}")
+        return {"commentary": commentary}
+    
+    def generate_audio(inputs):
+        job_store.update(job_id, status="generating_audio", progress=40,
+                         message="Converting to speech...")
+        audio_path = text_to_speech_file(clean_commentary_text(inputs["commentary"]), audio_filename)
+        artifact_cache.save(match_folder, "audio", keys["audio"], ["commentary.mp3"])
+        print(f"[DEBUG] Generated new audio and saved to {audio_filename}")
+        return {"audio_path": audio_path}
+    
+    def upload_audio(inputs):
+        job_store.update(job_id, status="uploading_audio", progress=60,
+                         message="Uploading audio to HeyGen...")
+        audio_url = upload_audio_file(API_KEY, inputs["audio_path"])
+        if not audio_url:
+            raise Exception("Failed to upload audio to HeyGen")
+        return {"audio_url": audio_url}
+    
+    def render_avatar_video(inputs):
+        # A job resumed after a restart may already have a HeyGen render in progress
+        video_id = (job_store.get(job_id) or {}).get("heygen_video_id")
+        if video_id:
+            print(f"[DEBUG] Resuming HeyGen render {video_id} for job {job_id}")
+        else:
+            job_store.update(job_id, status="generating_video", progress=70,
+                             message="Generating AI video (this may take a few minutes)...")
+            video_title = f"IPL {year} - Match {match_num} - {' vs '.join(teams)}"
+            # Generate video with webhook URL if available
+            video_id = generate_video(API_KEY, DEFAULT_AVATAR_ID, inputs["audio_url"], video_title, WEBHOOK_URL)
+            if not video_id:
+                raise Exception("Failed to start video generation")
+            # Persist the render ID so a restart waits for this render instead of paying for a new one
+            job_store.update(job_id, heygen_video_id=video_id)
         
-        match_data_file = f"{match_folder}/match_data.json"
-        with open(match_data_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                "match_number": match_num,
-                "year": year,
-                "teams": teams,
-                "match_data": match_data,
-                "timestamp": datetime.now().isoformat()
-            }, f, indent=2)
+        # Wait for video completion (webhook first, then polling as fallback)
+        job_store.update(job_id, status="processing_video", progress=80,
+                         message="Waiting for HeyGen video generation (this can take 3-10 minutes via webhook)...")
+        video_url = wait_for_video_with_webhook_fallback(
+            API_KEY, video_id, WEBHOOK_URL,
+            status_callback=lambda message: job_store.update(job_id, message=message)
+        )
+        if not video_url:
+            job_store.update(job_id, heygen_video_id=None)
+            raise Exception("Video generation failed or timed out")
         
-        # Step 2: Generate commentary
-        commentary_file = f"{match_folder}/commentary.txt"
+        with atomic_write(video_url_file) as f:
+            f.write(f"Video URL: {video_url}\n")
+            f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        return {"video_url": video_url}
+    
+    def download_avatar_video(inputs):
+        job_store.update(job_id, status="downloading_video", progress=85,
+                         message="Downloading video...")
+        import requests
+        response = requests.get(inputs["video_url"], stream=True)
+        if response.status_code != 200:
+            raise Exception(f"Failed to download video: HTTP {response.status_code}")
+        with atomic_write(video_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                f.write(chunk)
+        artifact_cache.save(match_folder, "avatar_video", keys["avatar_video"], ["video.mp4", "video_url.txt"])
+        # The render is finished with; a later run that needs a new video must not resume it
+        job_store.update(job_id, heygen_video_id=None)
+        print(f"[DEBUG] Downloaded video to {video_path}")
+        return {"video_path": video_path}
+    
+    def render_scoreboards(inputs):
+        # Runs next to the stages above, so it leaves the job status to them
+        generate_scoreboards_sync(match_folder)
+        # Failed captures are only logged, so check the images: a partial set is
+        # retried by the stage (and by the next run) instead of being cached
+        missing = [name for name in scoreboard_names if not os.path.exists(f"{match_folder}/{name}")]
+        if missing:
+            raise Exception(f"Could not render {', '.join(missing)}")
+        artifact_cache.save(match_folder, "scoreboards", keys["scoreboards"], scoreboard_names)
+        print(f"[DEBUG] Generated new scoreboards in {match_folder}")
+        return {"scoreboards": scoreboard_paths}
+    
+    def combine_final_video(inputs):
+        # A fragmented MP4 can be watched while it is rendering (see download_video)
+        preview = {"preview_url": f"/api/download/{job_id}"} if MP4_LAYOUT == "fragmented" else {}
+        job_store.update(job_id, status="combining_video", progress=95,
+                         message="Creating final video with scoreboards...", **preview)
+        created_videos = combine_video_renditions(
+            match_folder,
+            VIDEO_RENDITIONS,
+            profile=profile,
+            **FINAL_VIDEO_TIMINGS,
+            progress=encode_progress(job_id, "combining_video",
+                                     "Creating final video with scoreboards...", 95, 97)
+        )
+        if not created_videos:
+            raise Exception("Could not create final video with scoreboards")
         
-        if os.path.exists(commentary_file):
-            generation_status[job_id]["status"] = "loading_commentary"
-            generation_status[job_id]["progress"] = 20
-            generation_status[job_id]["message"] = "Loading existing commentary..."
-            
-            # Read existing commentary
-            with open(commentary_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Extract just the commentary text (skip header)
-                parts = content.split("="*80)
-                if len(parts) >= 2:
-                    commentary = parts[1].strip()
-                else:
-                    commentary = content
-            print(f"[DEBUG] Loaded existing commentary from {commentary_file}")
+        # A cut missing scoreboards that failed to render is recorded under its own
+        # key, so the next run retries them (a match with fewer innings needs fewer)
+        have_scoreboards = all(os.path.exists(path) for path in scoreboard_paths)
+        final_key = keys["final_video"] if have_scoreboards else final_video_key(
+            keys["avatar_video"], keys["audio"], None, profile)
+        artifact_cache.save(match_folder, final_stage, final_key, final_video_names)
+        final_video_path = created_videos[VIDEO_RENDITIONS[0]]
+        job_store.update(job_id, message="Final video created successfully!",
+                         final_video=final_video_path, final_videos=created_videos)
+        print(f"[DEBUG] Generated final video: {final_video_path}")
+        return {"final_videos": created_videos}
+    
+    def package_final_stream(inputs):
+        if not inputs["final_videos"]:
+            return
+        packaged = packaged_stream(stream_dir_for(final_video_file))
+        # A final video restored from the cache needs its own stream
+        if final_state != "current" or not set(STREAM_FORMATS) <= set(packaged):
+            job_store.update(job_id, status="packaging_stream", progress=97,
+                             message="Packaging video for streaming...")
+            package_stream(final_video_file,
+                           progress=encode_progress(job_id, "packaging_stream",
+                                                    "Packaging video for streaming...", 97, 99))
+            print(f"[DEBUG] Packaged stream for {final_video_file}")
+    
+    values = {}
+    stages = []
+    final_state = artifact_cache.restore(match_folder, final_stage, keys["final_video"], final_video_names)
+    if final_state:
+        job_store.update(job_id, status="loading_final_video", progress=95,
+                         message="Using existing final video...", final_video=final_video_file,
+                         final_videos=final_videos)
+        print(f"[DEBUG] Using existing final video from {final_video_file}")
+        values["final_videos"] = final_videos
+    else:
+        if not scoreboard_names:
+            print(f"[DEBUG] No innings to draw scoreboards for in {match_folder}")
+            values["scoreboards"] = []
+        elif artifact_cache.restore(match_folder, "scoreboards", keys["scoreboards"], scoreboard_names):
+            print(f"[DEBUG] Using existing scoreboards from {match_folder}")
+            values["scoreboards"] = scoreboard_paths
         else:
-            generation_status[job_id]["status"] = "generating_commentary"
-            generation_status[job_id]["progress"] = 20
-            generation_status[job_id]["message"] = "Generating AI commentary..."
-            
-            match_json_str = json.dumps(match_data, indent=2)
-            prompt = f"""Here is the match data for IPL {year} Match #{match_num}:
-
-{match_json_str}
-
-Please generate an exciting and detailed 1:30 minute cricket commentary summarizing this match."""
-            
-            commentary = get_langchain_response(prompt)
-            
-            # Save commentary
-            with open(commentary_file, 'w', encoding='utf-8') as f:
-                f.write(f"IPL {year} - Match {match_num}\n")
-                f.write(f"Teams: {' vs '.join(teams)}\n")
-                f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("="*80 + "\n\n")
-                f.write(commentary)
-                f.write("\n\n" + "="*80 + "\n")
-            print(f"[DEBUG] Generated new commentary and saved to {commentary_file}")
+            # Retried once: render_scoreboards() fails when a capture left an image missing
+            stages.append(Stage("scoreboards", render_scoreboards, outputs=["scoreboards"], retries=1, optional=True,
+                                resource="cpu"))
         
-        # Step 3: Generate audio
-        audio_filename = f"{match_folder}/commentary.mp3"
-        
-        if os.path.exists(audio_filename):
-            generation_status[job_id]["status"] = "loading_audio"
-            generation_status[job_id]["progress"] = 40
-            generation_status[job_id]["message"] = "Using existing audio file..."
-            audio_path = audio_filename
+        if artifact_cache.restore(match_folder, "audio", keys["audio"], ["commentary.mp3"]):
             print(f"[DEBUG] Using existing audio from {audio_filename}")
+            values["audio_path"] = audio_filename
         else:
-            generation_status[job_id]["status"] = "generating_audio"
-            generation_status[job_id]["progress"] = 40
-            generation_status[job_id]["message"] = "Converting to speech..."
-            
-            cleaned_text = clean_commentary_text(commentary)
-            audio_path = text_to_speech_file(cleaned_text, audio_filename)
-            print(f"[DEBUG] Generated new audio and saved to {audio_filename}")
-        
-        # Step 4: Upload audio (only if we need to generate video)
-        video_path = f"{match_folder}/video.mp4"
-        video_url_file = f"{match_folder}/video_url.txt"
+            if artifact_cache.restore(match_folder, "commentary", keys["commentary"], ["commentary.txt"]):
+                print(f"[DEBUG] Loaded existing commentary from {commentary_file}")
+                values["commentary"] = read_commentary(commentary_file)
+            else:
+                stages.append(Stage("commentary", generate_commentary, outputs=["commentary"], retries=2,
+                                    resource="gemini"))
+            stages.append(Stage("audio", generate_audio, inputs=["commentary"], outputs=["audio_path"], retries=2,
+                                resource="elevenlabs"))
         
-        if os.path.exists(video_path):
-            generation_status[job_id]["status"] = "loading_video"
-            generation_status[job_id]["progress"] = 80
-            generation_status[job_id]["message"] = "Using existing video file..."
-            
-            # Try to read video URL from file
-            video_url = None
-            if os.path.exists(video_url_file):
-                with open(video_url_file, 'r') as f:
-                    lines = f.readlines()
-                    for line in lines:
-                        if line.startswith("Video URL:"):
-                            video_url = line.replace("Video URL:", "").strip()
-                            break
-            
+        if artifact_cache.restore(match_folder, "avatar_video", keys["avatar_video"], ["video.mp4"]):
             print(f"[DEBUG] Using existing video from {video_path}")
+            values["video_path"] = video_path
         else:
-            # Need to generate video - upload audio first
-            generation_status[job_id]["status"] = "uploading_audio"
-            generation_status[job_id]["progress"] = 60
-            generation_status[job_id]["message"] = "Uploading audio to HeyGen..."
-            
-            audio_url = upload_audio_file(API_KEY, audio_path)
-            
-            if not audio_url:
-                raise Exception("Failed to upload audio to HeyGen")
-            
-            # Step 5: Generate video
-            generation_status[job_id]["status"] = "generating_video"
-            generation_status[job_id]["progress"] = 70
-            generation_status[job_id]["message"] = "Generating AI video (this may take a few minutes)..."
-            
-            video_title = f"IPL {year} - Match {match_num} - {' vs '.join(teams)}"
-            
-            # Generate video with webhook URL if available
-            video_id = generate_video(API_KEY, DEFAULT_AVATAR_ID, audio_url, video_title, WEBHOOK_URL)
-            
-            if not video_id:
-                raise Exception("Failed to start video generation")
-            
-            # Step 6: Wait for video completion (webhook first, then polling as fallback)
-            generation_status[job_id]["status"] = "processing_video"
-            generation_status[job_id]["progress"] = 80
-            generation_status[job_id]["message"] = "Waiting for HeyGen video generation (this can take 3-10 minutes via webhook)..."
-            
-            # Create a status callback to update progress during webhook wait
-            def update_webhook_status(message):
-                generation_status[job_id]["message"] = message
-            
-            video_url = wait_for_video_with_webhook_fallback(
-                API_KEY, video_id, WEBHOOK_URL, 
-                status_callback=update_webhook_status
-            )
-            
-            if not video_url:
-                raise Exception("Video generation failed or timed out")
-            
-            # Save video URL
-            with open(video_url_file, 'w') as f:
-                f.write(f"Video URL: {video_url}\n")
-                f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            
-            # Step 7: Download video
-            generation_status[job_id]["status"] = "downloading_video"
-            generation_status[job_id]["progress"] = 85
-            generation_status[job_id]["message"] = "Downloading video..."
-            
-            import requests
-            response = requests.get(video_url, stream=True)
-            if response.status_code == 200:
-                with open(video_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                print(f"[DEBUG] Downloaded video to {video_path}")
+            if (job_store.get(job_id) or {}).get("heygen_video_id"):
+                values["audio_url"] = None  # The render being resumed already has its audio
             else:
-                raise Exception(f"Failed to download video: HTTP {response.status_code}")
+                stages.append(Stage("upload_audio", upload_audio, inputs=["audio_path"], outputs=["audio_url"],
+                                    retries=2, resource="heygen"))
+            # Not retried: every new render costs HeyGen credits
+            stages.append(Stage("heygen_render", render_avatar_video, inputs=["audio_url"], outputs=["video_url"],
+                                resource="heygen"))
+            stages.append(Stage("download_video", download_avatar_video, inputs=["video_url"],
+                                outputs=["video_path"], retries=2))
+        
+        stages.append(Stage("final_video", combine_final_video, inputs=["video_path", "audio_path", "scoreboards"],
+                            outputs=["final_videos"], optional=True, resource="cpu"))
+    
+    if STREAM_FORMATS:
+        # The MP4 download still works without a stream
+        stages.append(Stage("stream", package_final_stream, inputs=["final_videos"], optional=True,
+                            resource="cpu"))
+    return Pipeline(stages, provided=values), values
+
+def generate_highlight_async(year, match_num, match_data, profile="standard"):
+    """Generate highlight asynchronously."""
+    job_id = highlight_job_id(year, match_num, profile)
+    
+    # Update existing status instead of reinitializing
+    # (status was already initialized in the /api/generate endpoint)
+    if job_store.get(job_id) is None:
+        job_store.create(job_id, new_job_record(year, match_num, message="Initializing...", profile=profile))
+    
+    try:
+        # Update status
+        job_store.update(job_id, status="starting", progress=5,
+                         message="Setting up...", owner=process_id())
         
-        # Step 8: Generate scoreboards
-        scoreboard1_path = f"{match_folder}/scoreboard_inning1.png"
-        scoreboard2_path = f"{match_folder}/scoreboard_inning2.png"
-        final_video_file = f"{match_folder}/final_video_with_scoreboards.mp4"
+        teams = match_data.get('teams', ['Unknown', 'Unknown'])
+        # Create folder structure: commentaries/year/match_X_TEAM_vs_TEAM
+        match_folder = match_folder_path(year, match_num, match_data)
+        os.makedirs(match_folder, exist_ok=True)
         
-        # Check if we need scoreboards (only if final video doesn't exist)
-        need_scoreboards = not os.path.exists(final_video_file) and not (os.path.exists(scoreboard1_path) and os.path.exists(scoreboard2_path))
+        # Only one job at a time may work on a match folder (across workers too);
+        # a job that waits here finds the other job's outputs already on disk
+        with match_lock(match_folder):
+            # Step 1: Save match data
+            job_store.update(job_id, status="saving_data", progress=10,
+                             message="Saving match data...")
         
-        if need_scoreboards:
-            generation_status[job_id]["status"] = "generating_scoreboards"
-            generation_status[job_id]["progress"] = 90
-            generation_status[job_id]["message"] = "Generating scoreboard images..."
-            
-            try:
-                generate_scoreboards_sync(match_folder)
-                generation_status[job_id]["message"] = "Scoreboards generated successfully!"
-                print(f"[DEBUG] Generated new scoreboards in {match_folder}")
-            except Exception as scoreboard_error:
-                # Continue even if scoreboards fail
-                generation_status[job_id]["message"] = f"Warning: Scoreboard generation failed: {scoreboard_error}"
-                print(f"Scoreboard generation error: {scoreboard_error}")
-        else:
-            if os.path.exists(scoreboard1_path) and os.path.exists(scoreboard2_path):
-                generation_status[job_id]["status"] = "loading_scoreboards"
-                generation_status[job_id]["progress"] = 90
-                generation_status[job_id]["message"] = "Using existing scoreboard images..."
-                print(f"[DEBUG] Using existing scoreboards from {match_folder}")
+            match_data_file = f"{match_folder}/match_data.json"
+            with atomic_write(match_data_file) as f:
+                json.dump({
+                    "match_number": match_num,
+                    "year": year,
+                    "teams": teams,
+                    "match_data": match_data,
+                    "timestamp": datetime.now().isoformat()
+                }, f, indent=2)
         
-        # Step 9: Combine video with scoreboards
-        # Always check if final video needs to be created
-        if os.path.exists(final_video_file):
-            generation_status[job_id]["status"] = "loading_final_video"
-            generation_status[job_id]["progress"] = 95
-            generation_status[job_id]["message"] = "Using existing final video..."
-            generation_status[job_id]["final_video"] = final_video_file
-            print(f"[DEBUG] Using existing final video from {final_video_file}")
-        else:
-            # Check if we have the required files to create final video
-            if not os.path.exists(video_path):
-                raise Exception("Cannot create final video: base video.mp4 not found")
-                
-            generation_status[job_id]["status"] = "combining_video"
-            generation_status[job_id]["progress"] = 95
-            generation_status[job_id]["message"] = "Creating final video with scoreboards..."
+            # Steps 2-10 run as a graph of stages (see highlight_pipeline())
+            pipeline, values = highlight_pipeline(job_id, year, match_num, match_data, profile, match_folder)
+            stage_reports = {}
+            reports_lock = threading.Lock()
+            job_store.update(job_id, stages={})
             
-            try:
-                final_video_path = combine_video_with_scoreboards(
-                    match_folder,
-                    video_before_scoreboard=6,
-                    scoreboard_duration=5,
-                    fade_duration=1.0
-                )
-                if final_video_path:
-                    generation_status[job_id]["message"] = "Final video created successfully!"
-                    generation_status[job_id]["final_video"] = final_video_path
-                    print(f"[DEBUG] Generated final video: {final_video_path}")
-                else:
-                    generation_status[job_id]["message"] = "Warning: Could not create final video with scoreboards"
-            except Exception as combine_error:
-                # Continue even if combining fails
-                generation_status[job_id]["message"] = f"Warning: Video combining failed: {combine_error}"
-                print(f"Video combining error: {combine_error}")
+            def update_stage(name, report):
+                with reports_lock:
+                    stage_reports[name] = report
+                    fields = {"stages": dict(stage_reports)}
+                if report["status"] == "failed" and pipeline.stages[name].optional:
+                    # The job continues without this stage's outputs
+                    fields["message"] = f"Warning: {name.replace('_', ' ')} failed: {report['error']}"
+                job_store.update(job_id, **fields)
+            
+            pipeline.run(values, on_update=update_stage)
         
-        # Complete
-        generation_status[job_id]["status"] = "complete"
-        generation_status[job_id]["progress"] = 100
-        generation_status[job_id]["message"] = "Complete! Highlight video with scoreboards generated successfully!"
-        # Set video_url to local download endpoint instead of HeyGen URL
-        generation_status[job_id]["video_url"] = f"/api/download/{job_id}"
-        generation_status[job_id]["match_folder"] = match_folder
+            # Complete
+            # Set video_url to local download endpoint instead of HeyGen URL
+            final_videos = final_video_paths(match_folder, profile)
+            final_video_file = final_videos[VIDEO_RENDITIONS[0]]
+            details = {"duration": get_duration(final_video_file)} if os.path.exists(final_video_file) else {}
+            if STREAM_FORMATS and os.path.exists(final_video_file):
+                details.update(stream_fields(job_id, final_video_file))
+            job_store.update(job_id, status="complete", progress=100,
+                             message="Complete! Highlight video with scoreboards generated successfully!",
+                             video_url=download_url(job_id, final_video_file), match_folder=match_folder,
+                             disk_usage=disk_usage(job_store.get(job_id) or {}, match_folder, final_videos),
+                             **details)
         
     except Exception as e:
-        generation_status[job_id]["status"] = "error"
-        generation_status[job_id]["message"] = str(e)
-        generation_status[job_id]["error"] = str(e)
+        job_store.update(job_id, status="error", message=str(e), error=str(e))
+
+def recover_jobs():
+    """
+    Requeue unfinished jobs whose owning process has died (crash or restart).
+
+    Each job resumes from its last completed stage: finished outputs are
+    already on disk, and a HeyGen render that was in progress is picked up
+    through its saved video ID instead of being started again.
+    """
+    me = process_id()
+    for job_id, job in job_store.unfinished().items():
+        if owner_alive(job.get("owner")) or "year" not in job:
+            continue
+        
+        # Only one worker may take over an orphaned job
+        claimed = job_store.claim(job_id, me, lambda current: not owner_alive(current.get("owner")))
+        if claimed is None:
+            continue
+        
+        match_data = catalog.get_match(claimed["year"], claimed["match_number"])
+        if match_data is None:
+            job_store.update(job_id, status="error", message="Match no longer exists", error="Match no longer exists")
+            continue
+        
+        job_store.update(job_id, status="queued", message="Resuming after server restart...")
+        try:
+            scheduler.submit(job_id, generate_highlight_async, claimed["year"], claimed["match_number"],
+                             match_data, claimed.get("profile", "standard"), priority=PRIORITY_HIGH)
+            print(f"[DEBUG] Recovered job {job_id}")
+        except QueueFullError:
+            job_store.update(job_id, status="error", message="Could not resume job: queue is full",
+                             error="Could not resume job: queue is full")
+
+recovered_pid = None
+
+@app.before_request
+def recover_jobs_once():
+    """Run job recovery once in each worker process (after gunicorn forks)."""
+    global recovered_pid
+    if recovered_pid == os.getpid():
+        return
+    with submit_lock:
+        if recovered_pid == os.getpid():
+            return
+        recovered_pid = os.getpid()
+        try:
+            recover_jobs()
+        except Exception as e:
+            print(f"Error recovering jobs: {e}")
 
 @app.route('/')
 def index():
     """Render the main page."""
     years = get_available_years()
-    return render_template('index.html', years=years)
+    # The page loads hls.js lazily, and only if HLS streams are being packaged
+    hls_js = {"url": HLS_JS_URL, "integrity": HLS_JS_INTEGRITY} if "hls" in STREAM_FORMATS else None
+    return render_template('index.html', years=years, hls_js=hls_js)
 
 @app.route('/api/matches/<year>')
 def get_matches(year):
@@ -345,119 +634,256 @@ def generate_highlight():
         if not year or not match_num:
             return jsonify({"error": "Year and match number required"}), 400
         
+        try:
+            profile = get_render_profile(data.get('profile', 'standard'))["name"]
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         # Load match data
-        matches = load_matches(year)
-        if not matches or match_num < 1 or match_num > len(matches):
+        match_data = catalog.get_match(year, match_num)
+        if match_data is None:
             return jsonify({"error": "Invalid match number"}), 400
-        
-        match_data = matches[match_num - 1]
+        # "01" and 1 must get the same job (and folder)
+        match_num = int(match_num)
         
         # Check if video already exists
-        job_id = f"{year}_{match_num}"
-        teams = match_data.get('teams', ['Unknown', 'Unknown'])
-        team_names = "_vs_".join(teams)
-        match_folder = f"commentaries/{year}/match_{match_num}_{team_names}"
+        job_id = highlight_job_id(year, match_num, profile)
+        match_folder = match_folder_path(year, match_num, match_data)
         
-        final_video = f"{match_folder}/final_video_with_scoreboards.mp4"
+        final_videos = final_video_paths(match_folder, profile)
+        final_video = final_videos[VIDEO_RENDITIONS[0]]
         regular_video = f"{match_folder}/video.mp4"
         
-        # Only skip if final video exists (not just regular video)
-        if os.path.exists(final_video):
+        # Only skip if the final video exists (not just regular video) and its inputs are unchanged
+        if final_videos_current(year, match_num, match_data, profile):
             # Final video already exists, return it immediately
-            generation_status[job_id] = {
+            job_store.create(job_id, {
                 "status": "complete",
                 "progress": 100,
                 "message": "Final video already exists!",
-                "video_url": f"/api/download/{job_id}",
-                "match_folder": match_folder
-            }
+                "video_url": download_url(job_id, final_video),
+                "match_folder": match_folder,
+                "profile": profile,
+                "final_video": final_video,
+                "final_videos": final_videos,
+                **stream_fields(job_id, final_video)
+            })
             return jsonify({"job_id": job_id, "status": "already_exists", "message": "Final video already exists!"})
         
         # If only regular video exists but not final video, we'll regenerate scoreboards and final video
         
-        # Initialize status BEFORE starting thread to avoid race condition
-        generation_status[job_id] = {
-            "status": "initializing",
-            "progress": 0,
-            "message": "Starting generation...",
-            "video_url": None,
-            "error": None
-        }
-        
-        print(f"[DEBUG] Initialized status for job {job_id}")
+        priority = PRIORITIES.get(str(data.get('priority', 'normal')).lower(), PRIORITY_NORMAL)
         
-        # Start generation in background thread
-        thread = threading.Thread(target=generate_highlight_async, args=(year, match_num, match_data))
-        thread.daemon = True
-        thread.start()
+        with submit_lock:
+            # Single-flight: attach to the job if this match is already queued or running,
+            # here or in another worker process
+            # Initialize status BEFORE queueing to avoid race condition
+            if (scheduler.is_active(job_id)
+                    or start_job_record(job_id, new_job_record(year, match_num, priority, profile=profile)) is None):
+                print(f"[DEBUG] Attached to in-flight job {job_id}")
+                return jsonify({"job_id": job_id, "status": "attached",
+                                "queue_position": scheduler.position(job_id)})
+            
+            try:
+                position = scheduler.submit(job_id, generate_highlight_async, year, match_num, match_data,
+                                            profile, priority=priority)
+            except QueueFullError as e:
+                job_store.delete(job_id)
+                return (jsonify({"error": "Server is busy, please try again later", "retry_after": e.retry_after}),
+                        429, {"Retry-After": str(e.retry_after)})
         
-        print(f"[DEBUG] Started background thread for job {job_id}")
+        print(f"[DEBUG] Queued job {job_id} at position {position}")
         
-        return jsonify({"job_id": job_id, "status": "started"})
+        return jsonify({"job_id": job_id, "status": "queued", "queue_position": position})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def status_payload(job_id, status):
+    """Add live queue information to a job record before sending it to a client."""
+    if status.get("status") == "queued":
+        position = scheduler.position(job_id)
+        if position is not None:
+            status["queue_position"] = position
+            status["message"] = f"Waiting in queue (position {position})..."
+    return status
+
+def existing_video_status(job_id):
+    """
+    Build a complete status for a job with no record whose final video is on disk
+    (from a previous generation, or made by another server).
+    
+    Returns:
+        Status dictionary, or None if there is no up-to-date final video
+    """
+    try:
+        year, match_num, profile = parse_job_id(job_id)
+        match_data = catalog.get_match(year, match_num)
+        if match_data is not None and final_videos_current(year, match_num, match_data, profile):
+            match_folder = match_folder_path(year, match_num, match_data)
+            final_videos = final_video_paths(match_folder, profile)
+            final_video = final_videos[VIDEO_RENDITIONS[0]]
+            return {
+                "status": "complete",
+                "progress": 100,
+                "message": "Final video already exists!",
+                "video_url": download_url(job_id, final_video),
+                "match_folder": match_folder,
+                "profile": profile,
+                "final_video": final_video,
+                "final_videos": final_videos,
+                **stream_fields(job_id, final_video)
+            }
+    except Exception as e:
+        print(f"Error checking existing video: {e}")
+    return None
+
 @app.route('/api/status/<job_id>')
 def get_status(job_id):
     """Get generation status."""
-    print(f"[DEBUG] Status requested for job {job_id}")
-    print(f"[DEBUG] Current jobs in status: {list(generation_status.keys())}")
+    status = job_store.get(job_id)
+    if status is not None:
+        return jsonify(status_payload(job_id, status))
     
-    if job_id in generation_status:
-        return jsonify(generation_status[job_id])
-    else:
-        # Check if video already exists from a previous generation
-        try:
-            year, match_num = job_id.split('_')
-            matches = load_matches(year)
-            if matches and int(match_num) <= len(matches):
-                match_data = matches[int(match_num) - 1]
-                teams = match_data.get('teams', ['Unknown', 'Unknown'])
-                team_names = "_vs_".join(teams)
-                match_folder = f"commentaries/{year}/match_{match_num}_{team_names}"
-                
-                # Check if final video exists (not just regular video)
-                final_video = f"{match_folder}/final_video_with_scoreboards.mp4"
-                
-                if os.path.exists(final_video):
-                    # Return completed status for existing final video
-                    return jsonify({
-                        "status": "complete",
-                        "progress": 100,
-                        "message": "Final video already exists!",
-                        "video_url": f"/api/download/{job_id}",
-                        "match_folder": match_folder
-                    })
-        except Exception as e:
-            print(f"Error checking existing video: {e}")
-        
-        return jsonify({"error": "Job not found"}), 404
+    # Check if video already exists from a previous generation
+    status = existing_video_status(job_id)
+    if status is not None:
+        return jsonify(status)
+    return jsonify({"error": "Job not found"}), 404
+
+@app.route('/api/events/<job_id>')
+def job_events(job_id):
+    """
+    Stream status changes of a job as Server-Sent Events until it finishes.
+    
+    Every open stream holds a server thread, so at most SSE_MAX_STREAMS are
+    served per worker process; past that the request gets a 503 and the page
+    polls /api/status instead.
+    """
+    if job_store.get(job_id) is None:
+        status = existing_video_status(job_id)
+        if status is None:
+            return jsonify({"error": "Job not found"}), 404
+        # Same answer as /api/status, as a single event
+        return Response(f"event: status\ndata: {json.dumps(status)}\n\n", mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache"})
+    
+    if not open_streams.acquire(blocking=False):
+        return (jsonify({"error": "Too many status streams, poll /api/status instead"}), 503,
+                {"Retry-After": "2"})
+    
+    def stream():
+        version = None
+        last_payload = None
+        while True:
+            # Wake up regularly while queued, since the queue position changes
+            # without the job itself being updated
+            timeout = 2 if last_payload and last_payload.get("status") == "queued" else 15
+            status = job_store.wait_for_change(job_id, version, timeout=timeout)
+            if status is None:
+                yield f"event: status\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                return
+            
+            version = status.get("version")
+            payload = status_payload(job_id, status)
+            if payload != last_payload:
+                yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+                last_payload = payload
+            else:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+            
+            if payload.get("status") in TERMINAL_STATUSES:
+                return
+    
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Give the slot back when the stream ends or the client disconnects
+    response.call_on_close(open_streams.release)
+    return response
 
 @app.route('/api/download/<job_id>')
 def download_video(job_id):
-    """Download the final video."""
-    if job_id not in generation_status:
-        return jsonify({"error": "Job not found"}), 404
+    """
+    Download the final video (?rendition=vertical|square|landscape picks one of VIDEO_RENDITIONS).
     
-    status = generation_status[job_id]
+    The file is located on disk from the job ID, so any worker can serve it,
+    with or without a job record. Range requests and If-None-Match/If-Range
+    are answered against a strong ETag (the file's SHA-256). URLs carrying
+    ?v=<etag> can never point at other content and are cached for a year.
     
-    if status.get("status") != "complete":
-        return jsonify({"error": "Video not ready yet"}), 400
+    With MP4_LAYOUT=fragmented, a video that is still rendering is streamed
+    as it is written (no Range or caching until it is complete).
+    """
+    rendition = request.args.get('rendition')
+    if rendition is not None and rendition not in RENDITIONS:
+        return jsonify({"error": f"Unknown rendition: {rendition}"}), 400
     
-    match_folder = status.get("match_folder")
-    if not match_folder:
-        return jsonify({"error": "Match folder not found"}), 404
+    try:
+        year, match_num, profile = parse_job_id(job_id)
+        match_data = catalog.get_match(year, match_num)
+        name = final_video_name(profile, rendition or VIDEO_RENDITIONS[0])
+    except ValueError:
+        return jsonify({"error": "Job not found"}), 404
+    if match_data is None:
+        return jsonify({"error": "Job not found"}), 404
+    match_folder = match_folder_path(year, match_num, match_data)
     
-    # Try final video first, fallback to regular video
-    final_video = f"{match_folder}/final_video_with_scoreboards.mp4"
-    regular_video = f"{match_folder}/video.mp4"
+    # Final videos are written atomically, so one on disk is always complete
+    video = f"{match_folder}/{name}"
+    download_name = f"ipl_highlight_{job_id}_{rendition}.mp4" if rendition else f"ipl_highlight_{job_id}.mp4"
+    if not os.path.exists(video):
+        status = job_store.get(job_id)
+        if status is not None and status.get("status") != "complete":
+            partial = None
+            if MP4_LAYOUT == "fragmented" and status.get("status") == "combining_video":
+                # ffmpeg creates its output a moment after the job enters this stage;
+                # until then the page asks again on its next status update
+                partial = partial_output(video)
+            if partial:
+                # Held for the whole render, so it counts against the stream cap
+                if not open_streams.acquire(blocking=False):
+                    return (jsonify({"error": "Too many open streams, try again shortly"}), 503,
+                            {"Retry-After": "2"})
+                response = Response(stream_with_context(follow_file(partial)), mimetype='video/mp4',
+                                    headers={"Cache-Control": "no-store"})
+                response.call_on_close(open_streams.release)
+                return response
+            return jsonify({"error": "Video not ready yet"}), 400
+        # A finished job whose combine step failed still has the avatar video
+        regular_video = f"{match_folder}/video.mp4"
+        if status is None or rendition is not None or not os.path.exists(regular_video):
+            return jsonify({"error": "Video file not found"}), 404
+        video = regular_video
     
-    if os.path.exists(final_video):
-        return send_file(final_video, mimetype='video/mp4', as_attachment=False, download_name=f"ipl_highlight_{job_id}.mp4")
-    elif os.path.exists(regular_video):
-        return send_file(regular_video, mimetype='video/mp4', as_attachment=False, download_name=f"ipl_highlight_{job_id}.mp4")
-    else:
-        return jsonify({"error": "Video file not found"}), 404
+    etag = file_etag(video)
+    versioned = request.args.get('v') == etag
+    response = send_file(video, mimetype='video/mp4', as_attachment=False, download_name=download_name,
+                         conditional=True, etag=etag, max_age=31536000 if versioned else 0)
+    response.cache_control.public = True
+    if versioned:
+        response.cache_control.immutable = True
+    return response
+
+@app.route('/api/stream/<job_id>/<path:filename>')
+def stream_file(job_id, filename):
+    """Serve the HLS/DASH playlists and segments of a packaged highlight."""
+    status = job_store.get(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    stream_dir = status.get("stream_dir")
+    if not stream_dir:
+        return jsonify({"error": "No stream for this job"}), 404
+    
+    # Playlists are always revalidated; segments only change if the video is regenerated
+    is_playlist = filename.endswith((".m3u8", ".mpd"))
+    return send_from_directory(stream_dir, filename, mimetype=STREAM_MIMETYPES.get(Path(filename).suffix),
+                               max_age=0 if is_playlist else 3600)
+
+@app.route('/api/rate_limits')
+def rate_limits():
+    """Get live API rate limiter metrics (queued, in-flight and throttled calls) of this worker process."""
+    return jsonify({"pid": os.getpid(), "providers": rate_limit_metrics()})
 
 @app.errorhandler(404)
 def not_found(error):